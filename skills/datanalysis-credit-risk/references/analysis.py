@@ -5,11 +5,8 @@ import pandas as pd
 import numpy as np
 import toad
 from typing import List, Dict, Tuple
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from datetime import datetime
 import lightgbm as lgb
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score
 from joblib import Parallel, delayed
 
@@ -17,7 +14,7 @@ from joblib import Parallel, delayed
 def drop_abnormal_ym(data: pd.DataFrame, min_ym_bad_sample: int = 1,
                      min_ym_sample: int = 500) -> tuple:
     """篩選異常月份 - 全域統計，非按機構"""
-    stat = data.groupby('new_date_ym').agg(
+    stat = data.groupby('new_date_ym', observed=True).agg(
         bad_cnt=('new_target', 'sum'),
         total=('new_target', 'count')
     ).reset_index()
@@ -76,95 +73,45 @@ def drop_lowiv_features(data: pd.DataFrame, features: List[str],
         iv_detail: IV 明細 (每個特徵在每個機構及整體的 IV 值)
         iv_process: IV 處理表 (不符合條件的特徵)
     """
-    from references.func import calculate_iv
-    from joblib import Parallel, delayed
+    from references.func import calculate_org_iv
 
     orgs = sorted(data['new_org'].unique())
 
     print(f"   IV 計算：特徵數量={len(features)}，機構數量={len(orgs)}")
 
-    # 一次計算所有機構的 IV 值
-    def _calc_org_iv(org):
-        org_data = data[data['new_org'] == org]
-        org_iv = calculate_iv(org_data, features, n_jobs=1)
-        if len(org_iv) > 0:
-            org_iv = org_iv.rename(columns={'IV': 'IV值'})
-            org_iv['機構'] = org
-            return org_iv
-        return None
-
-    # 計算整體 IV
-    print(f"   正在計算整體 IV...")
-    iv_overall = calculate_iv(data, features, n_jobs=n_jobs)
+    # 每個特徵只分箱一次，同時得到整體及所有機構的 IV 值
+    print(f"   正在計算整體及 {len(orgs)} 個機構的 IV 值...")
+    iv_overall, iv_by_org = calculate_org_iv(data, features, n_jobs=n_jobs)
     print(f"   整體 IV 計算結果：{len(iv_overall)} 個特徵")
     if len(iv_overall) == 0:
         print(f"   警告：整體 IV 計算結果為空，返回空表")
         return data, pd.DataFrame(columns=['變數', 'IV值', '機構', '類型']), pd.DataFrame(columns=['變數', '整體IV', '低IV機構數', '處理原因'])
     iv_overall = iv_overall.rename(columns={'IV': 'IV值'})
-
-    # 並行計算所有機構的 IV 值
-    print(f"   正在並行計算 {len(orgs)} 個機構的 IV 值...")
-    iv_by_org_results = Parallel(n_jobs=n_jobs, verbose=0)(
-        delayed(_calc_org_iv)(org) for org in orgs
-    )
-    iv_by_org = [r for r in iv_by_org_results if r is not None]
-    iv_by_org = pd.concat(iv_by_org, ignore_index=True) if iv_by_org else pd.DataFrame(columns=['變數', 'IV值', '機構'])
+    iv_by_org = iv_by_org.rename(columns={'IV': 'IV值'})
     print(f"   機構 IV 彙總：{len(iv_by_org)} 筆記錄")
 
     # 轉換為寬格式：特徵、整體、org1, org2, ..., orgn
-    iv_detail_dict = {'變數': []}
-    iv_detail_dict['整體'] = []
-
-    for org in orgs:
-        iv_detail_dict[org] = []
-
-    # 獲取所有特徵
-    all_vars = set(iv_overall['變數'].tolist())
-    if len(iv_by_org) > 0:
-        all_vars.update(iv_by_org['變數'].tolist())
-    all_vars = sorted(all_vars)
-
-    for var in all_vars:
-        iv_detail_dict['變數'].append(var)
-
-        # 整體 IV
-        var_overall = iv_overall[iv_overall['變數'] == var]
-        if len(var_overall) > 0:
-            iv_detail_dict['整體'].append(var_overall['IV值'].values[0])
-        else:
-            iv_detail_dict['整體'].append(None)
-
-        # 各機構 IV
-        for org in orgs:
-            var_org = iv_by_org[iv_by_org['機構'] == org]
-            var_org = var_org[var_org['變數'] == var]
-            if len(var_org) > 0:
-                iv_detail_dict[org].append(var_org['IV值'].values[0])
-            else:
-                iv_detail_dict[org].append(None)
-
-    iv_detail = pd.DataFrame(iv_detail_dict)
+    all_vars = sorted(set(iv_overall['變數']) | set(iv_by_org['變數']))
+    iv_detail = pd.DataFrame({'變數': all_vars})
+    iv_detail['整體'] = iv_detail['變數'].map(iv_overall.set_index('變數')['IV值'])
+    org_wide = iv_by_org.pivot(index='變數', columns='機構', values='IV值')
+    org_wide = org_wide.reindex(index=all_vars, columns=orgs)
+    iv_detail = pd.concat([iv_detail, org_wide.reset_index(drop=True)], axis=1)
     # 按整體 IV 降序排序
     iv_detail = iv_detail.sort_values('整體', ascending=False)
     iv_detail = iv_detail.reset_index(drop=True)
 
     # 標記不符合條件的特徵
-    # 1. 整體 IV 低於閾值
-    iv_overall_low = iv_overall[iv_overall['IV值'] < overall_iv_threshold]['變數'].tolist()
-
-    # 2. 單一機構 IV 低於閾值的機構數量
-    if len(iv_by_org) > 0:
-        iv_by_org_low = iv_by_org[iv_by_org['IV值'] < org_iv_threshold].groupby('變數').size().reset_index()
-        iv_by_org_low.columns = ['變數', '低IV機構數']
-    else:
-        iv_by_org_low = pd.DataFrame(columns=['變數', '低IV機構數'])
-
-    # 獲取每個特徵的低 IV 機構清單
-    low_iv_orgs_dict = {}
-    if len(iv_by_org) > 0:
-        for var in iv_by_org['變數'].unique():
-            var_orgs = iv_by_org[(iv_by_org['變數'] == var) & (iv_by_org['IV值'] < org_iv_threshold)]['機構'].tolist()
-            low_iv_orgs_dict[var] = var_orgs
+    # 1. 整體 IV
+    overall_iv_dict = dict(zip(iv_overall['變數'], iv_overall['IV值']))
+
+    # 2. 單一機構 IV 低於閾值的機構數量及機構清單
+    low_iv = iv_by_org[iv_by_org['IV值'] < org_iv_threshold]
+    low_iv_orgs_dict = low_iv.groupby('變數')['機構'].agg(list).to_dict()
+    iv_by_org_low = pd.DataFrame({
+        '變數': list(low_iv_orgs_dict),
+        '低IV機構數': [len(v) for v in low_iv_orgs_dict.values()]
+    })
 
     # 3. 標記需要處理的特徵
     iv_process = []
@@ -183,14 +130,14 @@ def drop_lowiv_features(data: pd.DataFrame, features: List[str],
         reasons = []
 
         # 檢查整體 IV
-        var_overall_iv = iv_overall[iv_overall['變數'] == var]['IV值'].values
-        if len(var_overall_iv) > 0 and var_overall_iv[0] < overall_iv_threshold:
-            reasons.append(f'整體 IV {var_overall_iv[0]:.4f} 小於閾值 {overall_iv_threshold}')
+        var_overall_iv = overall_iv_dict.get(var)
+        if var_overall_iv is not None and var_overall_iv < overall_iv_threshold:
+            reasons.append(f'整體 IV {var_overall_iv:.4f} 小於閾值 {overall_iv_threshold}')
 
         # 檢查機構 IV
-        var_org_low = iv_by_org_low[iv_by_org_low['變數'] == var]
-        if len(var_org_low) > 0 and var_org_low['低IV機構數'].values[0] >= max_org_threshold:
-            reasons.append(f'在 {var_org_low["低IV機構數"].values[0]} 個機構中 IV 小於閾值 {org_iv_threshold}')
+        var_org_low = len(low_iv_orgs_dict.get(var, []))
+        if var_org_low > 0 and var_org_low >= max_org_threshold:
+            reasons.append(f'在 {var_org_low} 個機構中 IV 小於閾值 {org_iv_threshold}')
 
         if reasons:
             iv_process.append({
@@ -211,7 +158,8 @@ def drop_lowiv_features(data: pd.DataFrame, features: List[str],
 
 
 def drop_highcorr_features(data: pd.DataFrame, features: List[str],
-                           threshold: float = 0.8, gain_dict: dict = None, top_n_keep: int = 20) -> tuple:
+                           threshold: float = 0.8, gain_dict: dict = None, top_n_keep: int = 20,
+                           corr_dtype: str = 'float64', block_size: int = 1024) -> tuple:
     """剔除高相關性特徵 - 基於原始 gain，一次剔除一個特徵
 
     參數:
@@ -220,11 +168,15 @@ def drop_highcorr_features(data: pd.DataFrame, features: List[str],
         threshold: 相關性閾值
         gain_dict: 特徵到原始 gain 的映射字典
         top_n_keep: 按原始 gain 排名保留前 N 個特徵
+        corr_dtype: 相關性矩陣的精度，'float32' 可減半記憶體
+        block_size: 分塊計算相關性矩陣時每塊的欄數
 
     返回:
         data: 剔除後的資料
         dropped_info: 剔除資訊
     """
+    from references.func import calculate_corr
+
     if gain_dict is None:
         gain_dict = {}
 
@@ -252,59 +204,50 @@ def drop_highcorr_features(data: pd.DataFrame, features: List[str],
 
     dropped_info = []
 
-    # 迴圈剔除直到沒有高相關性特徵對
-    while True:
-        # 重新計算相關性矩陣 (僅針對當前剩餘特徵)
-        current_features = [f for f in current_features if f in data.columns]
-        if len(current_features) < 2:
-            break
-
-        corr = data[current_features].corr().abs()
-        upper = corr.where(np.triu(np.ones(corr.shape), k=1).astype(bool))
-
-        # 尋找所有高相關性特徵對
-        high_corr_pairs = []
-        for i, col1 in enumerate(upper.columns):
-            for col2 in upper.columns[i+1:]:
-                corr_val = upper.loc[col1, col2]
-                if pd.notna(corr_val) and corr_val > threshold:
-                    high_corr_pairs.append((col1, col2, corr_val))
-
-        if not high_corr_pairs:
-            break
-
-        # 對於每一對高相關性特徵，選擇原始 gain 較小的特徵作為剔除候選
-        candidates = set()
-        for col1, col2, corr_val in high_corr_pairs:
-            # 跳過前 N 個保留特徵
-            if col1 in top_features and col2 in top_features:
-                continue
-
-            gain1 = gain_dict.get(col1, 0)
-            gain2 = gain_dict.get(col2, 0)
-
-            # 選擇原始 gain 較小的特徵
-            if gain1 <= gain2:
-                candidates.add(col1)
-            else:
-                candidates.add(col2)
-
-        if not candidates:
-            break
-
-        # 從候選特徵中選擇原始 gain 最小的一個進行剔除
-        candidates_list = list(candidates)
-        candidates_with_gain = [(c, gain_dict.get(c, 0)) for c in candidates_list]
-        candidates_with_gain.sort(key=lambda x: x[1])
-        to_drop = candidates_with_gain[0][0]
-
-        # 尋找與該特徵高度相關的所有特徵
-        related_vars = []
-        for col1, col2, corr_val in high_corr_pairs:
-            if col1 == to_drop:
-                related_vars.append((col2, corr_val))
-            elif col2 == to_drop:
-                related_vars.append((col1, corr_val))
+    if len(current_features) < 2:
+        return data, pd.DataFrame(dropped_info)
+
+    # 相關性矩陣只計算一次；剔除特徵後成對相關性不變，只需將其遮蔽
+    corr = calculate_corr(data, current_features, dtype=corr_dtype, block_size=block_size).to_numpy()
+    gains = np.array([gain_dict.get(f, 0) for f in current_features], dtype=float)
+    is_top = np.array([f in top_features for f in current_features])
+
+    # 尋找所有高相關性特徵對 (上三角，NaN 比較結果為 False)
+    with np.errstate(invalid='ignore'):
+        pairs = np.argwhere(np.triu(corr > threshold, k=1))
+    left, right = pairs[:, 0], pairs[:, 1]
+    pair_corr = corr[left, right]
+
+    # 對於每一對高相關性特徵，選擇原始 gain 較小的特徵作為剔除候選；跳過前 N 個保留特徵
+    pair_candidate = np.where(gains[left] <= gains[right], left, right)
+    pair_eligible = ~(is_top[left] & is_top[right])
+
+    # 逐一剔除候選中原始 gain 最小者 (相同 gain 取順序在前者)：剔除只會移除特徵對，
+    # 候選集合只減不增，因此剔除順序即為按 (gain, 順序) 升序，且每個候選在輪到時
+    # 其配對特徵 (排名較後) 必定仍存在 —— 最終剔除集合即為所有候選，無需反覆重算
+    n_features = len(current_features)
+    rank = np.empty(n_features, dtype=np.int64)
+    rank[np.lexsort((np.arange(n_features), gains))] = np.arange(n_features)
+    is_dropped = np.zeros(n_features, dtype=bool)
+    is_dropped[pair_candidate[pair_eligible]] = True
+    drop_order = np.flatnonzero(is_dropped)[np.argsort(rank[is_dropped], kind='stable')]
+
+    # 每個特徵的所有高相關配對 (按特徵順序)，用於記錄相關變數
+    ends = np.concatenate([left, right])
+    partners = np.concatenate([right, left])
+    partner_corr = np.concatenate([pair_corr, pair_corr])
+    order = np.lexsort((partners, ends))
+    ends, partners, partner_corr = ends[order], partners[order], partner_corr[order]
+    bounds = np.searchsorted(ends, np.arange(n_features + 1))
+
+    for to_drop_idx in drop_order:
+        to_drop = current_features[to_drop_idx]
+
+        # 尋找剔除當下仍與該特徵高度相關的所有特徵：排名較後者必定存在，排名較前者須未被剔除
+        lo, hi = bounds[to_drop_idx], bounds[to_drop_idx + 1]
+        other, other_corr = partners[lo:hi], partner_corr[lo:hi]
+        present = (rank[other] > rank[to_drop_idx]) | ~is_dropped[other]
+        related_vars = [(current_features[j], c) for j, c in zip(other[present], other_corr[present])]
 
         # 記錄剔除資訊
         # 相關變數欄位：顯示特徵名稱和相似度值 (相關性值)
@@ -319,12 +262,11 @@ def drop_highcorr_features(data: pd.DataFrame, features: List[str],
             '去除條件': gain_str
         })
 
-        # 從資料中刪除該特徵
-        data = data.drop(columns=[to_drop], errors='ignore')
-        current_features.remove(to_drop)
-
         print(f"   已剔除特徵：{to_drop} (原始 gain={gain_dict.get(to_drop, 0):.2f})")
 
+    # 從資料中一次刪除所有剔除的特徵
+    data = data.drop(columns=[current_features[i] for i in drop_order], errors='ignore')
+
     # 轉換為 DataFrame 並按原始 gain 降序排序
     dropped_df = pd.DataFrame(dropped_info)
     if len(dropped_df) > 0:
@@ -334,196 +276,297 @@ def drop_highcorr_features(data: pd.DataFrame, features: List[str],
     return data, dropped_df
 
 
+_NULL_CHECK_EVERY = 5
+# 程序內快取：暫存檔路徑 -> (已分箱 Dataset, 真實標籤)
+_NULL_DATASET_CACHE = {}
+
+
+def _null_dataset(path: str):
+    """載入共用的已分箱 lgb.Dataset；每個程序只載入一次，後續擬合直接重用"""
+    if path not in _NULL_DATASET_CACHE:
+        _NULL_DATASET_CACHE.clear()
+        dataset = lgb.Dataset(path, params={'verbose': -1}).construct()
+        _NULL_DATASET_CACHE[path] = (dataset, dataset.get_label().copy())
+    return _NULL_DATASET_CACHE[path]
+
+
+def _calc_null_gain(args) -> np.ndarray:
+    """以 seed 打亂標籤，在共用 Dataset 上擬合一次並返回各特徵 gain"""
+    path, lgb_params, num_boost_round, seed = args
+    dataset, label = _null_dataset(path)
+    dataset.set_label(np.random.default_rng(seed).permutation(label))
+    booster = lgb.train(lgb_params, dataset, num_boost_round=num_boost_round)
+    return booster.feature_importance(importance_type='gain')
+
+
 def drop_highnoise_features(data: pd.DataFrame, features: List[str],
-                           n_estimators: int = 100, max_depth: int = 5, gain_threshold: float = 50) -> tuple:
-    """Null Importance 移除高雜訊特徵"""
+                            n_estimators: int = 100, max_depth: int = 5,
+                            confidence: float = 0.95, n_rounds: int = 50,
+                            min_rounds: int = 10, tol: float = 0.05,
+                            n_jobs: int = 4, random_state: int = 42) -> tuple:
+    """Null Importance 移除高雜訊特徵
+
+    特徵矩陣只分箱一次建立共用的 lgb.Dataset，真實標籤與各輪打亂標籤的模型都重用它；
+    打亂輪次以固定種子 (random_state + 輪次) 在程序池中分批執行，結果可重現。
+    每批結束後檢查打亂 gain 分佈的信賴區間上界，相對變化小於 tol 且去留判定不變時提前停止。
+    原始 gain 不高於打亂 gain 信賴區間上界的特徵視為雜訊。
+
+    參數:
+        confidence: 打亂 gain 分佈的信賴水準
+        n_rounds: 打亂輪數上限
+        min_rounds: 提前停止前至少執行的打亂輪數
+        tol: 信賴區間上界的相對變化容忍度
+    """
+    import os
+    import shutil
+    import tempfile
+
+    columns = ['變數', '原始gain', '反轉後gain', '反轉後gain下界', '反轉後gain上界', 'p值']
     # 檢查特徵列表是否為空
     if len(features) == 0:
         print("   無特徵可處理")
-        return data, pd.DataFrame(columns=['變數', '原始gain', '反轉後gain'])
+        return data, pd.DataFrame(columns=columns)
 
     # 檢查資料是否充足
     if len(data) < 1000:
         print(f"   資料量不足 ({len(data)} 行)，跳過 Null Importance")
-        return data, pd.DataFrame(columns=['變數', '原始gain', '反轉後gain'])
-
-    X = data[features].copy()
-    Y = data['new_target'].copy()
-
-    # 檢查 X 是否為空或包含 NaN
-    if X.shape[1] == 0:
-        print("   特徵資料為空，跳過 Null Importance")
-        return data, pd.DataFrame(columns=['變數', '原始gain', '反轉後gain'])
-
-    # 填補 NaN
-    X = X.fillna(0)
+        return data, pd.DataFrame(columns=columns)
 
-    # 打亂標籤
-    Y_permuted = Y.copy()
-    for _ in range(20):
-        Y_permuted = np.random.permutation(Y_permuted)
-
-    clf = lgb.LGBMClassifier(
-        objective='binary', boosting_type='gbdt', learning_rate=0.05,
-        max_depth=max_depth, min_child_samples=2000, min_child_weight=20,
-        n_estimators=n_estimators, num_leaves=2**max_depth - 1, n_jobs=-1, verbose=-1
-    )
-
-    clf_permuted = lgb.LGBMClassifier(
-        objective='binary', boosting_type='gbdt', learning_rate=0.05,
-        max_depth=max_depth, min_child_samples=2000, min_child_weight=20,
-        n_estimators=n_estimators, num_leaves=2**max_depth - 1, n_jobs=-1, verbose=-1
-    )
-
-    results, results_permuted = [], []
+    lgb_params = {
+        'objective': 'binary', 'boosting_type': 'gbdt', 'learning_rate': 0.05,
+        'max_depth': max_depth, 'min_child_samples': 2000, 'min_child_weight': 20,
+        'num_leaves': 2**max_depth - 1, 'bagging_fraction': 0.7, 'bagging_freq': 1,
+        'num_threads': 1 if n_jobs != 1 else 0, 'verbose': -1,
+    }
+    lower_q, upper_q = (1 - confidence) / 2, (1 + confidence) / 2
 
     print("正在進行 Null Importance 計算...")
-    for i in range(2):
-        random_n = np.random.randint(30)
+    # 缺失值交由 LightGBM 原生處理，不再複製整份特徵矩陣填 0
+    X = data[features].to_numpy(dtype=np.float32, na_value=np.nan)
+    y = data['new_target'].to_numpy()
+    dataset = lgb.Dataset(X, label=y, feature_name=[str(f) for f in features],
+                          params={'verbose': -1}, free_raw_data=True).construct()
+
+    tmp_dir = tempfile.mkdtemp(prefix='null_imp_')
+    path = os.path.join(tmp_dir, 'train.bin')
+    _NULL_DATASET_CACHE.clear()
+    _NULL_DATASET_CACHE[path] = (dataset, y.astype(np.float32))
+    try:
+        # 真實標籤：兩個種子 (與打亂輪次相同的抽樣方式) 取平均
+        real_gains = []
+        for i in range(2):
+            booster = lgb.train(dict(lgb_params, seed=random_state - 1 - i, num_threads=0),
+                                dataset, num_boost_round=n_estimators)
+            real_gains.append(booster.feature_importance(importance_type='gain'))
+            print(f"  第 {i+1} 輪真實標籤模型：train_auc={roc_auc_score(y, booster.predict(X)):.3f}")
+        gain_real = np.mean(real_gains, axis=0)
+
+        if n_jobs != 1:
+            dataset.save_binary(path)
+        # 每 _NULL_CHECK_EVERY 輪檢查一次穩定性；檢查點與程序數無關，結果不受 n_jobs 影響
+        n_workers = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+        batch = -(-max(n_workers, 1) // _NULL_CHECK_EVERY) * _NULL_CHECK_EVERY
+        null_gains, checked, prev_upper, prev_noise = [], 0, None, None
+        with Parallel(n_jobs=n_jobs, verbose=0) as parallel:
+            while checked < n_rounds:
+                seeds = range(random_state + len(null_gains),
+                              random_state + min(len(null_gains) + batch, n_rounds))
+                null_gains.extend(parallel(
+                    delayed(_calc_null_gain)((path, dict(lgb_params, seed=seed), n_estimators, seed))
+                    for seed in seeds
+                ))
+                stopped = False
+                while checked < len(null_gains):
+                    checked = min(checked + _NULL_CHECK_EVERY, len(null_gains))
+                    upper = np.quantile(null_gains[:checked], upper_q, axis=0)
+                    noise = gain_real <= upper
+                    if checked >= min_rounds and prev_upper is not None:
+                        # 以整體打亂 gain 水準作為分母下限，避免幾乎不被使用的特徵放大相對變化
+                        scale = np.abs(prev_upper) + np.mean(null_gains[:checked])
+                        shift = np.abs(upper - prev_upper) / np.maximum(scale, 1e-12)
+                        if (noise == prev_noise).all() and shift.max() <= tol:
+                            print(f"  打亂 gain 分佈已穩定，於第 {checked} 輪提前停止")
+                            stopped = True
+                            break
+                    prev_upper, prev_noise = upper, noise
+                if stopped:
+                    null_gains = null_gains[:checked]
+                    break
+    finally:
+        _NULL_DATASET_CACHE.clear()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    null_gains = np.asarray(null_gains)
+    print(f"  打亂輪數：{len(null_gains)}，信賴水準：{confidence:.0%}")
+
+    # 列出所有特徵的原始增益、打亂後增益均值及其信賴區間
+    dropped_info = pd.DataFrame({
+        '變數': features,
+        '原始gain': gain_real,
+        '反轉後gain': null_gains.mean(axis=0),
+        '反轉後gain下界': np.quantile(null_gains, lower_q, axis=0),
+        '反轉後gain上界': np.quantile(null_gains, upper_q, axis=0),
+        # 經驗 p 值：打亂 gain 不低於原始 gain 的比例
+        'p值': ((null_gains >= gain_real).sum(axis=0) + 1) / (len(null_gains) + 1),
+    })
+    # 添加狀態欄位，將剔除的特徵標記為 '去除'，保留的標記為 '保留'
+    dropped_info['狀態'] = np.where(dropped_info['原始gain'] <= dropped_info['反轉後gain上界'], '去除', '保留')
+    noise_features = dropped_info.loc[dropped_info['狀態'] == '去除', '變數'].tolist()
+    # 按原始增益降序排序
+    dropped_info = dropped_info.sort_values('原始gain', ascending=False, kind='stable')
+    dropped_info = dropped_info.reset_index(drop=True)
+    # 添加原始增益排名欄位
+    dropped_info['原始gain排名'] = range(1, len(dropped_info) + 1)
 
-        X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.3, random_state=random_n)
+    data = data.drop(columns=[c for c in noise_features if c in data.columns])
 
-        # 檢查訓練資料是否有效
-        if X_train.shape[0] == 0 or X_test.shape[0] == 0:
-            print(f"  第 {i+1} 輪：資料切分失敗，跳過")
-            continue
+    print(f"  已剔除 {len(noise_features)} 個雜訊特徵")
+    return data, dropped_info
 
-        clf.fit(X_train, y_train)
 
-        X_train_, X_test_, y_train_, y_test_ = train_test_split(X, Y_permuted, test_size=0.3, random_state=random_n)
+_PSI_QUANTILES = np.linspace(0, 1, 11)
 
-        if X_train_.shape[0] == 0 or X_test_.shape[0] == 0:
-            print(f"  第 {i+1} 輪：打亂後資料切分失敗，跳過")
-            continue
 
-        clf_permuted.fit(X_train_, y_train_)
+def _lerp(a, b, t):
+    """與 numpy 'linear' 分位數相同的內插方式，確保分箱邊界與 pd.qcut 一致"""
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
 
-        imp_real = pd.DataFrame({
-            'feature': clf.booster_.feature_name(),
-            'gain': clf.booster_.feature_importance(importance_type='gain')
-        })
-        imp_perm = pd.DataFrame({
-            'feature': clf_permuted.booster_.feature_name(),
-            'gain': clf_permuted.booster_.feature_importance(importance_type='gain')
-        })
 
-        results.append(imp_real)
-        results_permuted.append(imp_perm)
+def _psi_bin_pct(sorted_vals, edges):
+    """以累計計數求各分箱占比 (最後一箱為 NaN 箱)
 
-        train_auc = roc_auc_score(y_train, clf.predict_proba(X_train)[:, 1])
-        test_auc = roc_auc_score(y_test, clf.predict_proba(X_test)[:, 1])
-        print(f"  第 {i+1} 輪：train_auc={train_auc:.3f}, test_auc={test_auc:.3f}")
+    sorted_vals: 逐欄排序 (NaN 置尾) 的矩陣 (列 × 特徵)
+    edges: 分箱邊界 (邊界 × 特徵)；第一箱為 <= edges[0]，其餘為 (edges[i-1], edges[i]]
+    """
+    n_rows = sorted_vals.shape[0]
+    cum = np.empty(edges.shape, dtype=np.int64)
+    for j in range(sorted_vals.shape[1]):
+        cum[:, j] = np.searchsorted(sorted_vals[:, j], edges[:, j], side='right')
+    nan_counts = np.isnan(sorted_vals).sum(axis=0)
+    counts = np.vstack([np.diff(cum, axis=0, prepend=0), nan_counts])
+    return counts / n_rows
 
-    # 檢查是否有有效的結果
-    if len(results) == 0 or len(results_permuted) == 0:
-        print("   無有效的訓練結果，跳過 Null Importance")
-        return data, pd.DataFrame(columns=['變數', '原始gain', '反轉後gain'])
 
-    imp_real_avg = pd.concat(results).groupby('feature')['gain'].mean().reset_index()
-    imp_perm_avg = pd.concat(results_permuted).groupby('feature')['gain'].mean().reset_index()
+def _calc_month_pair_psi(args):
+    """計算單個機構單一月份對所有特徵的 PSI - NaN 作為獨立分箱
 
-    comparison = imp_real_avg.merge(imp_perm_avg, on='feature', suffixes=('_real', '_perm'))
-    comparison['gain_real'] = comparison['gain_real'].fillna(0)
-    comparison['gain_perm'] = comparison['gain_perm'].fillna(0)
+    source 為 np.save 產生的 .npy 路徑 (以 memmap 唯讀開啟，程序間共用頁面快取) 或記憶體中的矩陣；
+    矩陣已按 (機構, 月份) 排序，train_rows / test_rows 為該月份的連續列範圍。
+    返回每個特徵的 PSI，無法計算者為 NaN。
+    """
+    source, train_rows, test_rows, min_sample = args
+    matrix = np.load(source, mmap_mode='r') if isinstance(source, str) else source
 
-    # 使用增益值打亂前後的絕對差值小於 50 作為條件
-    comparison['gain_diff'] = (comparison['gain_real'] - comparison['gain_perm']).abs()
-    noise_features = comparison[comparison['gain_diff'] < gain_threshold]['feature'].tolist()
+    # 逐欄排序 (NaN 置尾)，之後以二分搜尋計算分箱與分位數
+    train = np.sort(matrix[slice(*train_rows)], axis=0)
+    test = np.sort(matrix[slice(*test_rows)], axis=0)
+    train_nonan = (~np.isnan(train)).sum(axis=0)
+    test_nonan = (~np.isnan(test)).sum(axis=0)
 
-    # 列出所有特徵的原始增益和打亂後增益
-    dropped_info = pd.DataFrame({
-        '變數': comparison['feature'].values,
-        '原始gain': comparison['gain_real'].values,
-        '反轉後gain': comparison['gain_perm'].values
-    })
-    # 添加狀態欄位，將剔除的特徵標記為 '去除'，保留的標記為 '保留'
-    dropped_info['狀態'] = dropped_info.apply(
-        lambda x: '去除' if np.abs(x['原始gain'] - x['反轉後gain']) < gain_threshold else '保留', axis=1
-    )
-    # 按原始增益降序排序
-    dropped_info = dropped_info.sort_values('原始gain', ascending=False)
-    dropped_info = dropped_info.reset_index(drop=True)
-    # 添加原始增益排名欄位
-    dropped_info['原始gain排名'] = range(1, len(dropped_info) + 1)
+    psi = np.full(matrix.shape[1], np.nan)
+    valid = (train_nonan >= min_sample) & (test_nonan >= min_sample) & (train_nonan > 0)
+    if not valid.any():
+        return psi
 
-    data = data.drop(columns=[c for c in noise_features if c in data.columns])
+    train, test, n_valid = train[:, valid], test[:, valid], train_nonan[valid]
 
-    print(f"  已剔除 {len(noise_features)} 個雜訊特徵")
-    return data, dropped_info
+    # 基於非 NaN 資料進行等頻分箱 (10 箱)，等同 pd.qcut；重複邊界形成空箱，不影響 PSI
+    pos = _PSI_QUANTILES[:, None] * (n_valid - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n_valid - 1)
+    edges = _lerp(np.take_along_axis(train, lo, axis=0),
+                  np.take_along_axis(train, hi, axis=0), pos - lo)
 
+    train_pct = _psi_bin_pct(train, edges)
+    test_pct = _psi_bin_pct(test, edges)
 
-def _calc_single_psi(args):
-    """計算單個機構和單個特徵的 PSI - NaN 作為獨立分箱"""
-    org, train_month, test_month, train_n, test_n, f, data_ref, min_sample = args
+    # 避免 0 值
+    train_pct = np.where(train_pct == 0, 1e-6, train_pct)
+    test_pct = np.where(test_pct == 0, 1e-6, test_pct)
 
-    try:
-        org_data = data_ref[data_ref['new_org'] == org]
-        train_data = org_data[org_data['new_date_ym'] == train_month]
-        test_data = org_data[org_data['new_date_ym'] == test_month]
-
-        # 獲取資料
-        train_vals = train_data[f].values
-        test_vals = test_data[f].values
-
-        # 標記 NaN
-        train_nan_mask = pd.isna(train_vals)
-        test_nan_mask = pd.isna(test_vals)
-
-        # 用於分箱的非 NaN 值
-        train_nonan = train_vals[~train_nan_mask]
-        test_nonan = test_vals[~test_nan_mask]
-
-        if len(train_nonan) < min_sample or len(test_nonan) < min_sample:
-            return {
-                '機構': org, '日期': f"{train_month}->{test_month}",
-                '變數': f, 'PSI': None, '有效計算': 0,
-                '樣本數': train_n
-            }
-
-        # 基於非 NaN 資料進行分箱 (10 箱)
-        try:
-            bins = pd.qcut(train_nonan, q=10, duplicates='drop', retbins=True)[1]
-        except Exception:
-            bins = pd.cut(train_nonan, bins=10, retbins=True)[1]
-
-        # 計算各分箱占比 (包含 NaN 箱)
-        train_counts = []
-        test_counts = []
-
-        for i in range(len(bins)):
-            if i == 0:
-                train_counts.append((~train_nan_mask & (train_vals <= bins[i])).sum())
-                test_counts.append((~test_nan_mask & (test_vals <= bins[i])).sum())
-            else:
-                train_counts.append((~train_nan_mask & (train_vals > bins[i-1]) & (train_vals <= bins[i])).sum())
-                test_counts.append((~test_nan_mask & (test_vals > bins[i-1]) & (test_vals <= bins[i])).sum())
-
-        # NaN 箱
-        train_counts.append(train_nan_mask.sum())
-        test_counts.append(test_nan_mask.sum())
+    psi[valid] = np.sum((test_pct - train_pct) * np.log(test_pct / train_pct), axis=0)
+    return psi
 
-        # 轉換為占比
-        train_pct = np.array(train_counts) / len(train_vals)
-        test_pct = np.array(test_counts) / len(test_vals)
 
-        # 避免 0 值
-        train_pct = np.where(train_pct == 0, 1e-6, train_pct)
-        test_pct = np.where(test_pct == 0, 1e-6, test_pct)
+def _calc_psi_table(data: pd.DataFrame, features: List[str], min_sample: int,
+                    n_jobs: int = 4) -> pd.DataFrame:
+    """按機構逐月計算所有特徵的 PSI
 
-        # 計算 PSI
-        psi = np.sum((test_pct - train_pct) * np.log(test_pct / train_pct))
+    僅按 (機構, 月份) 分組一次，將特徵欄位依分組順序寫入單一 float64 矩陣，
+    每個任務為一個 (機構, 月份對)，一次向量化計算該月份對的所有特徵。
+    多程序時矩陣寫入暫存 .npy 並以 memmap 傳遞給各程序，不再序列化整份 DataFrame。
 
-        return {
-            '機構': org, '日期': f"{train_month}->{test_month}",
-            '變數': f, 'PSI': round(psi, 4), '有效計算': 1,
-            '樣本數': train_n
-        }
-    except Exception as e:
-        return {
-            '機構': org, '日期': f"{train_month}->{test_month}",
-            '變數': f, 'PSI': None, '有效計算': 0,
-            '樣本數': train_n
-        }
+    返回:
+        PSI 記錄 (機構、日期、變數、PSI、有效計算、樣本數)，每個 (機構, 月份對, 特徵) 一行
+    """
+    import os
+    import shutil
+    import tempfile
+
+    # 非數值特徵無法分箱，一律視為無效計算
+    numeric = [f for f in features if pd.api.types.is_numeric_dtype(data[f])]
+    numeric_pos = [i for i, f in enumerate(features) if f in set(numeric)]
+
+    groups = data.groupby(['new_org', 'new_date_ym'], sort=True, observed=True).indices
+    order, bounds, start = [], {}, 0
+    for key, idx in groups.items():
+        order.append(idx)
+        bounds[key] = (start, start + len(idx))
+        start += len(idx)
+
+    tasks, meta = [], []
+    keys = list(bounds)
+    for prev, cur in zip(keys[:-1], keys[1:]):
+        if prev[0] != cur[0]:
+            continue
+        org, train_month, test_month = cur[0], prev[1], cur[1]
+        tasks.append((bounds[prev], bounds[cur]))
+        meta.append((org, f"{train_month}->{test_month}", bounds[prev][1] - bounds[prev][0]))
+
+    print(f"   PSI 計算：{len(tasks)} 個機構月份對 × {len(features)} 個特徵，使用 {n_jobs} 個程序")
+    if len(tasks) == 0:
+        return pd.DataFrame(columns=['機構', '日期', '變數', 'PSI', '有效計算', '樣本數'])
+
+    order = np.concatenate(order)
+    shape = (len(order), len(numeric))
+    use_memmap = n_jobs != 1 and len(tasks) > 1
+    tmp_dir = tempfile.mkdtemp(prefix='psi_') if use_memmap else None
+    try:
+        if use_memmap:
+            source = os.path.join(tmp_dir, 'matrix.npy')
+            matrix = np.lib.format.open_memmap(source, mode='w+', dtype=np.float64, shape=shape)
+        else:
+            matrix = source = np.empty(shape, dtype=np.float64)
+        for j, f in enumerate(numeric):
+            matrix[:, j] = data[f].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        if use_memmap:
+            matrix.flush()
+            del matrix
+
+        results = Parallel(n_jobs=n_jobs, verbose=0)(
+            delayed(_calc_month_pair_psi)((source, train_rows, test_rows, min_sample))
+            for train_rows, test_rows in tasks
+        )
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    psi = np.full((len(tasks), len(features)), np.nan)
+    if numeric_pos:
+        psi[:, numeric_pos] = np.vstack(results)
+    valid = ~np.isnan(psi)
+
+    n_feat = len(features)
+    task_orgs, task_dates, task_n = zip(*meta)
+    return pd.DataFrame({
+        '機構': np.repeat(np.array(task_orgs, dtype=object), n_feat),
+        '日期': np.repeat(np.array(task_dates, dtype=object), n_feat),
+        '變數': np.tile(np.array(features, dtype=object), len(tasks)),
+        'PSI': np.round(psi, 4).ravel(),
+        '有效計算': valid.astype(int).ravel(),
+        '樣本數': np.repeat(np.array(task_n), n_feat),
+    })
 
 
 def drop_highpsi_features(data: pd.DataFrame, features: List[str],
@@ -531,7 +574,7 @@ def drop_highpsi_features(data: pd.DataFrame, features: List[str],
                          max_orgs: int = 4, min_sample_per_month: int = 100, n_jobs: int = 4) -> tuple:
     """剔除高 PSI 特徵 - 按機構 + 逐月版本
 
-    特徵層級多程序，機構層級迴圈，機構內特徵並行計算
+    按 (機構, 月份) 分組一次，月份對層級多程序，月份對內所有特徵向量化計算
 
     參數:
         psi_threshold: PSI 閾值，高於此值則視為不穩定
@@ -546,33 +589,8 @@ def drop_highpsi_features(data: pd.DataFrame, features: List[str],
     """
     orgs = data['new_org'].unique()
 
-    # 建立任務列表：每個機構、每對月份、每個特徵
-    tasks = []
-    for org in orgs:
-        org_data = data[data['new_org'] == org]
-        months = sorted(org_data['new_date_ym'].unique())
-
-        if len(months) < 2:
-            continue
-
-        for i in range(len(months) - 1):
-            train_month = months[i]
-            test_month = months[i + 1]
-
-            train_data = org_data[org_data['new_date_ym'] == train_month]
-            test_data = org_data[org_data['new_date_ym'] == test_month]
-
-            train_n = len(train_data)
-            test_n = len(test_data)
-
-            for f in features:
-                tasks.append((org, train_month, test_month, train_n, test_n, f, data, min_sample_per_month))
-
-    # 多程序計算 PSI (特徵層級並行)
-    print(f"   PSI 計算：{len(tasks)} 個任務，使用 {n_jobs} 個程序")
-    results = Parallel(n_jobs=n_jobs, verbose=0)(delayed(_calc_single_psi)(task) for task in tasks)
-
-    psi_df = pd.DataFrame(results)
+    # 按 (機構, 月份) 分組一次，逐月份對向量化計算所有特徵 (月份對層級並行)
+    psi_df = _calc_psi_table(data, features, min_sample_per_month, n_jobs=n_jobs)
 
     if len(psi_df) == 0:
         return data, pd.DataFrame(columns=['變數', '機構', '月份', 'PSI值']), pd.DataFrame(columns=['變數', '處理原因'])
@@ -594,51 +612,19 @@ def drop_highpsi_features(data: pd.DataFrame, features: List[str],
     # 按特徵、機構、月份升序排序
     psi_detail = psi_detail.sort_values(['變數', '機構', '月份'], ascending=[True, True, True])
 
-    # 獲取所有機構和月份
-    all_orgs = sorted(psi_detail['機構'].unique())
-    all_vars = sorted(psi_detail['變數'].unique())
-
     # 構建完整的 PSI 明細表 (包含初始月，PSI 值為 0)
-    psi_detail_list = []
-    for org in all_orgs:
-        org_data = psi_detail[psi_detail['機構'] == org]
-        if len(org_data) == 0:
-            continue
-
-        # 獲取該機構的所有月份
-        months = sorted(org_data['月份'].unique())
-
-        for var in all_vars:
-            var_data = org_data[org_data['變數'] == var]
-            if len(var_data) == 0:
-                continue
-
-            # 初始月 PSI 值為 0
-            psi_detail_list.append({
-                '機構': org,
-                '變數': var,
-                '月份': months[0],
-                'PSI值': 0.0
-            })
-
-            # 後續月份 PSI 值為計算結果
-            for i in range(1, len(months)):
-                month = months[i]
-                var_month_data = var_data[var_data['月份'] == month]
-                if len(var_month_data) > 0:
-                    psi_value = var_month_data['PSI值'].values[0]
-                else:
-                    psi_value = 0.0
-                psi_detail_list.append({
-                    '機構': org,
-                    '變數': var,
-                    '月份': month,
-                    'PSI值': psi_value
-                })
-
-    psi_detail = pd.DataFrame(psi_detail_list)
-    psi_detail = psi_detail[['機構', '變數', '月份', 'PSI值']]
-    psi_detail = psi_detail.reset_index(drop=True)
+    # 每個 (機構, 變數) 展開為該機構出現過的所有月份，缺少的月份補 0
+    org_months = psi_detail[['機構', '月份']].drop_duplicates()
+    org_vars = psi_detail[['機構', '變數']].drop_duplicates()
+    full = org_vars.merge(org_months, on='機構')
+    full = full.merge(psi_detail[['機構', '變數', '月份', 'PSI值']], on=['機構', '變數', '月份'], how='left')
+    full['PSI值'] = full['PSI值'].fillna(0.0)
+
+    # 初始月 PSI 值為 0
+    first_month = full.groupby('機構')['月份'].transform('min')
+    full.loc[full['月份'] == first_month, 'PSI值'] = 0.0
+
+    psi_detail = full[['機構', '變數', '月份', 'PSI值']]
     # 按特徵、機構、月份升序排序
     psi_detail = psi_detail.sort_values(['變數', '機構', '月份'], ascending=[True, True, True])
     psi_detail = psi_detail.reset_index(drop=True)
@@ -796,7 +782,8 @@ def psi_distribution_by_org(psi_detail: pd.DataFrame, oos_orgs: list = None, psi
 
 def value_ratio_distribution_by_org(data: pd.DataFrame, features: List[str],
                                      oos_orgs: list = None,
-                                     value_bins: list = [0, 0.15, 0.35, 0.65, 0.95, 1.0]) -> pd.DataFrame:
+                                     value_bins: list = [0, 0.15, 0.35, 0.65, 0.95, 1.0],
+                                     chunk_size: int = None) -> pd.DataFrame:
     """統計每個機構在不同有值率區間的特徵數量和占比
 
     參數:
@@ -804,10 +791,13 @@ def value_ratio_distribution_by_org(data: pd.DataFrame, features: List[str],
         features: 特徵列表
         oos_orgs: 貸外機構清單
         value_bins: 有值率區間邊界 [0, 0.15, 0.35, 0.65, 0.95, 1.0]
+        chunk_size: 分塊處理的每塊列數，預設自動決定
 
     返回:
         有值率分佈統計表
     """
+    from references.func import missing_profile
+
     if oos_orgs is None:
         oos_orgs = []
 
@@ -819,29 +809,27 @@ def value_ratio_distribution_by_org(data: pd.DataFrame, features: List[str],
     # 獲取所有機構
     orgs = data['new_org'].unique()
 
-    for org in orgs:
-        org_data = data[data['new_org'] == org]
+    # 單次掃描計算所有機構、所有特徵的有值率 (非 NaN 占比)
+    features = [f for f in features if f in data.columns]
+    _, value_counts, row_counts = missing_profile(data, features, chunk_size=chunk_size)
+    value_counts = value_counts.reindex(orgs, fill_value=0)
+    row_counts = row_counts.reindex(orgs, fill_value=0)
+    ratios = value_counts.div(row_counts.where(row_counts > 0), axis=0).fillna(0).to_numpy()
 
+    for k, org in enumerate(orgs):
         # 判斷機構類型
         org_type = '貸外' if org in oos_orgs else '建模'
 
-        # 計算每個特徵的有值率 (非 NaN 占比)
-        value_ratios = {}
-        for f in features:
-            if f in org_data.columns:
-                non_null_count = org_data[f].notna().sum()
-                total_count = len(org_data)
-                value_ratios[f] = non_null_count / total_count if total_count > 0 else 0
-
         # 統計各區間特徵數量
+        value_ratios = ratios[k]
         total_vars = len(value_ratios)
         for i in range(len(value_bins) - 1):
             lower = value_bins[i]
             upper = value_bins[i + 1]
             if upper == 1.0:
-                count = sum(1 for v in value_ratios.values() if lower <= v <= upper)
+                count = int(((value_ratios >= lower) & (value_ratios <= upper)).sum())
             else:
-                count = sum(1 for v in value_ratios.values() if lower <= v < upper)
+                count = int(((value_ratios >= lower) & (value_ratios < upper)).sum())
             ratio = count / total_vars if total_vars > 0 else 0
             result.append({
                 '機構': org,
@@ -862,25 +850,12 @@ def calculate_iv_by_org(data: pd.DataFrame, features: List[str],
         iv_by_org: 分機構 IV 明細
         iv_overall: 整體 IV
     """
-    from references.func import calculate_iv
-
-    orgs = data['new_org'].unique()
+    from references.func import calculate_org_iv
 
-    # 整體 IV
-    iv_overall = calculate_iv(data, features, n_jobs=n_jobs)
+    # 每個特徵分箱一次，同時計算整體及分機構 IV
+    iv_overall, iv_by_org = calculate_org_iv(data, features, n_jobs=n_jobs)
     iv_overall['類型'] = '整體'
-
-    # 分機構 IV
-    iv_by_org = []
-    for org in orgs:
-        org_data = data[data['new_org'] == org]
-        org_iv = calculate_iv(org_data, features, n_jobs=1)  # 單機構單程序計算
-        if len(org_iv) > 0:  # 僅添加非空結果
-            org_iv['機構'] = org
-            org_iv['類型'] = '分機構'
-            iv_by_org.append(org_iv)
-
-    iv_by_org = pd.concat(iv_by_org, ignore_index=True) if iv_by_org else pd.DataFrame(columns=['變數', 'IV', '機構', '類型'])
+    iv_by_org['類型'] = '分機構'
 
     return iv_by_org, iv_overall
 
@@ -897,33 +872,8 @@ def calculate_psi_detail(data: pd.DataFrame, features: List[str],
     """
     orgs = data['new_org'].unique()
 
-    # 建立任務
-    tasks = []
-    for org in orgs:
-        org_data = data[data['new_org'] == org]
-        months = sorted(org_data['new_date_ym'].unique())
-
-        if len(months) < 2:
-            continue
-
-        for i in range(len(months) - 1):
-            train_month = months[i]
-            test_month = months[i + 1]
-
-            train_data = org_data[org_data['new_date_ym'] == train_month]
-            test_data = org_data[org_data['new_date_ym'] == test_month]
-
-            train_n = len(train_data)
-            test_n = len(test_data)
-
-            for f in features:
-                tasks.append((org, train_month, test_month, train_n, test_n, f, data, min_sample))
-
-    # 多程序計算
-    print(f"   PSI 計算：{len(tasks)} 個任務，使用 {n_jobs} 個程序")
-    results = Parallel(n_jobs=n_jobs, verbose=0)(delayed(_calc_single_psi)(task) for task in tasks)
-
-    psi_df = pd.DataFrame(results)
+    # 按 (機構, 月份) 分組一次，逐月份對向量化計算所有特徵 (月份對層級並行)
+    psi_df = _calc_psi_table(data, features, min_sample, n_jobs=n_jobs)
 
     if len(psi_df) == 0:
         return data, pd.DataFrame(columns=['變數', '機構數', '不穩定機構數', '原因']), pd.DataFrame(columns=['變數', '機構數', '不穩定機構數', '是否剔除', '去除條件'])
@@ -992,24 +942,16 @@ def export_cleaning_report(filepath: str, steps: list,
         psi_distribution: PSI 分佈統計表
         value_ratio_distribution: 有值率分佈統計表
     """
-    from openpyxl import load_workbook
-
-    try:
-        wb = load_workbook(filepath)
-    except Exception:
-        wb = Workbook()
-        wb.remove(wb.active)
-
-    # 彙總工作表 - 僅顯示真實的過濾步驟
-    if '彙總' in wb.sheetnames:
-        del wb['彙總']
-    ws = wb.create_sheet('彙總', 0)
-    ws['A1'] = '資料清洗報告'
-    ws['A2'] = f'生成時間：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
-    ws['A4'] = '步驟'
-    ws['B4'] = '操作內容'
-    ws['C4'] = '操作結果'
-    ws['D4'] = '條件'
+    from references.func import ReportWriter
+
+    # 彙總工作表 - 僅顯示真實的過濾步驟 (內容不多，先收集為列再一次寫入)
+    summary_rows = [
+        ['資料清洗報告'],
+        [f'生成時間：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'],
+        # 添加備註：每個步驟獨立執行
+        ['註：每個過濾步驟皆為獨立執行，不會刪除資料，僅記錄不符合條件的特徵統計'],
+        ['步驟', '操作內容', '操作結果', '條件'],
+    ]
 
     # 僅顯示真實的過濾步驟 (排除明細和分佈統計)
     filter_steps = [
@@ -1029,9 +971,6 @@ def export_cleaning_report(filepath: str, steps: list,
     # 僅顯示參數標準的步驟 (無操作結果)
     show_param_only_steps = ['機構樣本統計', '缺失率明細']
 
-    # 添加備註：每個步驟獨立執行
-    ws['A3'] = '註：每個過濾步驟皆為獨立執行，不會刪除資料，僅記錄不符合條件的特徵統計'
-
     # 獲取參數，未提供則使用預設值
     if params is None:
         params = {}
@@ -1045,7 +984,7 @@ def export_cleaning_report(filepath: str, steps: list,
     psi_threshold = params.get('psi_threshold', 0.1)
     max_months_ratio = params.get('max_months_ratio', 1/3)
     max_orgs = params.get('max_orgs', 4)
-    gain_threshold = params.get('gain_threshold', 50)
+    noise_confidence = params.get('noise_confidence', 0.95)
 
     step_num = 1
     for name, df in steps:
@@ -1058,8 +997,6 @@ def export_cleaning_report(filepath: str, steps: list,
 
         # 僅顯示參數標準步驟 (無操作結果)
         if name in show_param_only_steps:
-            ws.cell(4+step_num, 1, step_num)
-            ws.cell(4+step_num, 2, display_name)
             result = ''
             # 條件：顯示參數標準
             if name == '機構樣本統計':
@@ -1068,13 +1005,10 @@ def export_cleaning_report(filepath: str, steps: list,
                 condition = '計算每個特徵的缺失率'
             else:
                 condition = ''
-            ws.cell(4+step_num, 3, result)
-            ws.cell(4+step_num, 4, condition)
+            summary_rows.append([step_num, display_name, result, condition])
             step_num += 1
         # 顯示需要顯示剔除數量的步驟
         elif name in show_drop_count_steps:
-            ws.cell(4+step_num, 1, step_num)
-            ws.cell(4+step_num, 2, display_name)
             if df is not None and len(df) > 0:
                 if name == '分離OOS資料':
                     # 特殊處理：顯示 OOS 和建模樣本數量
@@ -1093,12 +1027,9 @@ def export_cleaning_report(filepath: str, steps: list,
             else:
                 result = '空'
                 condition = ''
-            ws.cell(4+step_num, 3, result)
-            ws.cell(4+step_num, 4, condition)
+            summary_rows.append([step_num, display_name, result, condition])
             step_num += 1
         elif name in filter_steps:
-            ws.cell(4+step_num, 1, step_num)
-            ws.cell(4+step_num, 2, display_name)
 
             # 生成操作結果和條件
             if df is not None and len(df) > 0:
@@ -1141,7 +1072,7 @@ def export_cleaning_report(filepath: str, steps: list,
                     else:
                         result = f'已剔除 {len(df)}'
                     # 條件：參數標準
-                    condition = f'增益值在打亂前後的絕對差值小於 {gain_threshold} 的特徵將被識別為雜訊並剔除 (獨立執行)'
+                    condition = f'原始增益值不高於打亂標籤後增益值 {noise_confidence:.0%} 信賴區間上界的特徵將被識別為雜訊並剔除 (獨立執行)'
                 elif name == 'Step10-高相關性剔除':
                     # 操作結果：剔除特徵數量
                     if '變數' in df.columns:
@@ -1159,8 +1090,7 @@ def export_cleaning_report(filepath: str, steps: list,
                 result = '空'
                 condition = ''
 
-            ws.cell(4+step_num, 3, result)
-            ws.cell(4+step_num, 4, condition)
+            summary_rows.append([step_num, display_name, result, condition])
             step_num += 1
 
     # 計算總剔除特徵數 (取各步驟剔除特徵的聯集)
@@ -1177,10 +1107,9 @@ def export_cleaning_report(filepath: str, steps: list,
 
     # 添加最後一行統計
     final_step_num = step_num
-    ws.cell(4+final_step_num, 1, final_step_num)
-    ws.cell(4+final_step_num, 2, '最終剔除特徵統計')
-    ws.cell(4+final_step_num, 3, f'累計剔除 {len(all_dropped_vars)} 個特徵 (各步驟聯集)')
-    ws.cell(4+final_step_num, 4, '每個步驟獨立執行，最終剔除特徵為各步驟剔除特徵的聯集')
+    summary_rows.append([final_step_num, '最終剔除特徵統計',
+                         f'累計剔除 {len(all_dropped_vars)} 個特徵 (各步驟聯集)',
+                         '每個步驟獨立執行，最終剔除特徵為各步驟剔除特徵的聯集'])
 
     # 各步驟明細 (按步驟順序建立工作表)
     # 定義工作表建立順序
@@ -1191,33 +1120,17 @@ def export_cleaning_report(filepath: str, steps: list,
         'Step9-null importance處理', 'Step10-高相關性剔除'
     ]
 
-    # 按順序建立工作表
-    for sheet_name in sheet_order:
-        # 從 steps 中尋找對應的 DataFrame
-        df = None
-        for name, step_df in steps:
-            if name == sheet_name:
-                df = step_df
-                break
-
-        if df is not None:
-            if sheet_name in wb.sheetnames:
-                del wb[sheet_name]
-            ws_detail = wb.create_sheet(sheet_name)
-
-            for j, col in enumerate(df.columns):
-                ws_detail.cell(1, j+1, col)
-
-            for i, row in df.iterrows():
-                for j, val in enumerate(row):
-                    # 直接寫入值，避免字元轉義問題
-                    ws_detail.cell(i+2, j+1, val if val is not None else '')
-
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_font = Font(color="FFFFFF", bold=True)
-            for cell in ws_detail[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-
-    wb.save(filepath)
+    # 以串流方式寫出：彙總、既有檔案中的其他工作表、各步驟明細，最後一次儲存
+    step_frames = {}
+    for name, step_df in steps:
+        step_frames.setdefault(name, step_df)
+
+    with ReportWriter(filepath) as writer:
+        writer.write_rows('彙總', summary_rows)
+        writer.copy_existing(skip={'彙總', *sheet_order})
+        for sheet_name in sheet_order:
+            df = step_frames.get(sheet_name)
+            if df is not None:
+                writer.write_sheet(sheet_name, df)
+
     print(f"報告已儲存：{filepath}")
@@ -14,53 +14,152 @@ except:
     HAS_OPENPYXL = False
 
 
-def get_dataset(data_pth: str, date_colName: str, y_colName: str, 
+# 副檔名對應的讀取格式
+_DATA_FORMATS = {
+    '.parquet': 'parquet', '.pq': 'parquet',
+    '.csv': 'csv', '.txt': 'csv',
+    '.xlsx': 'excel', '.xls': 'excel',
+    '.pkl': 'pickle', '.pickle': 'pickle',
+}
+
+
+def _data_format(data_pth: str) -> str:
+    """依副檔名決定讀取格式"""
+    import os
+
+    ext = os.path.splitext(str(data_pth))[1].lower()
+    if ext not in _DATA_FORMATS:
+        raise ValueError(f"不支援的資料格式：{ext or data_pth}，支援 {', '.join(sorted(_DATA_FORMATS))}")
+    return _DATA_FORMATS[ext]
+
+
+def _iter_raw_chunks(data_pth: str, fmt: str, keep_col, data_encode: str, chunksize: int = None):
+    """按格式讀取資料，keep_col(欄位名稱) 為 True 的欄位才會被讀取
+
+    parquet 僅讀取所需欄位並按 row group 批次串流；csv 使用 chunksize 串流；
+    xlsx 與 pkl 無法串流，整份讀入後按 chunksize 切塊。
+    """
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(data_pth)
+        columns = [c for c in pf.schema_arrow.names if keep_col(c)]
+        if chunksize is None:
+            yield pf.read(columns=columns).to_pandas()
+        else:
+            for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+                yield batch.to_pandas()
+        return
+
+    if fmt == 'csv':
+        reader = pd.read_csv(data_pth, encoding=data_encode, usecols=keep_col, chunksize=chunksize)
+        if chunksize is None:
+            yield reader
+        else:
+            yield from reader
+        return
+
+    if fmt == 'excel':
+        data = pd.read_excel(data_pth, usecols=keep_col)
+    else:
+        data = pd.read_pickle(data_pth)
+        data = data[[c for c in data.columns if keep_col(c)]]
+    if chunksize is None:
+        yield data
+    else:
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize]
+
+
+def _downcast(data: pd.DataFrame) -> pd.DataFrame:
+    """將數值欄位轉為最小的資料型態；浮點數僅在轉為 float32 不失真時才轉換"""
+    updates = {}
+    for col in data.columns:
+        values = data[col]
+        if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            updates[col] = pd.to_numeric(values, downcast='integer')
+        elif values.dtype == np.float64:
+            as_f32 = values.to_numpy().astype(np.float32)
+            if np.array_equal(as_f32.astype(np.float64), values.to_numpy(), equal_nan=True):
+                updates[col] = as_f32
+    return data.assign(**updates) if updates else data
+
+
+def _clean_chunk(chunk: pd.DataFrame, y_colName: str, miss_vals: List[int],
+                 downcast: bool) -> pd.DataFrame:
+    """單一資料塊的清理：異常值替換為 NaN、過濾標籤、數值型態縮減"""
+    chunk = chunk.mask(chunk.isin(miss_vals))
+    chunk = chunk[chunk[y_colName].isin([0, 1])]
+    if downcast:
+        chunk = _downcast(chunk)
+    return chunk
+
+
+def get_dataset(data_pth: str, date_colName: str, y_colName: str,
                 org_colName: str, data_encode: str, key_colNames: List[str],
                 drop_colNames: List[str] = None,
-                miss_vals: List[int] = None) -> pd.DataFrame:
+                miss_vals: List[int] = None,
+                usecols: List[str] = None,
+                chunksize: int = None,
+                downcast: bool = True) -> pd.DataFrame:
     """載入並格式化資料
-    
+
     參數:
-        data_pth: 資料檔案路徑
+        data_pth: 資料檔案路徑，依副檔名選擇讀取方式 (parquet/csv/xlsx/pkl)
         date_colName: 日期欄位名稱
         y_colName: 標籤欄位名稱
         org_colName: 機構欄位名稱
-        data_encode: 資料編碼
+        data_encode: 資料編碼 (csv)
         key_colNames: 主鍵欄位 (用於去重)
-        drop_colNames: 需剔除的欄位
+        drop_colNames: 需剔除的欄位，讀取時即略過
         miss_vals: 需替換為 NaN 的異常值清單，預設為 [-1, -999, -1111]
+        usecols: 僅讀取的欄位 (日期、標籤、機構及主鍵欄位會自動加入)，預設讀取全部
+        chunksize: 分塊讀取的列數；設定後逐塊替換異常值、過濾標籤並縮減型態，
+            僅保留清理後的資料，適用於超出記憶體的大型檔案
+        downcast: 是否將數值欄位轉為最小的資料型態
     """
+    from pandas.api.types import union_categoricals
+
     if drop_colNames is None:
         drop_colNames = []
     if miss_vals is None:
         miss_vals = [-1, -999, -1111]
-    
-    # 支援多種格式讀取
-    for fmt, reader in [('parquet', pd.read_parquet), ('csv', pd.read_csv), 
-                         ('xlsx', pd.read_excel), ('pkl', pd.read_pickle)]:
-        try:
-            data = reader(data_pth)
-            break
-        except:
-            continue
-    
-    # 將異常值替換為 NaN
-    data.replace({v: np.nan for v in miss_vals}, inplace=True)
-    
-    # 去重與過濾
-    data = data[data[y_colName].isin([0, 1])]
+
+    required = {date_colName, y_colName, org_colName, *key_colNames}
+    drop_set = set(drop_colNames) - required
+    wanted = None if usecols is None else set(usecols) | required
+
+    def keep_col(col):
+        return col not in drop_set and (wanted is None or col in wanted)
+
+    fmt = _data_format(data_pth)
+    chunks = [_clean_chunk(chunk, y_colName, miss_vals, downcast)
+              for chunk in _iter_raw_chunks(data_pth, fmt, keep_col, data_encode, chunksize)]
+
+    if len(chunks) == 1:
+        data = chunks[0]
+    else:
+        # 機構欄位逐塊轉為共用類別的 category，合併時不會退回 object
+        orgs = union_categoricals([c[org_colName].astype('category') for c in chunks]).categories
+        chunks = [c.assign(**{org_colName: pd.Categorical(c[org_colName], categories=orgs)})
+                  for c in chunks]
+        data = pd.concat(chunks, ignore_index=True)
+    del chunks
+
+    # 去重
     data = data.drop_duplicates(subset=key_colNames)
-    
-    # 剔除無效欄位
-    data.drop(columns=[c for c in drop_colNames if c in data.columns], errors='ignore')
-    data.drop(columns=[c for c in data.columns if data[c].nunique() <= 1], errors='ignore')
-    
+
     # 重命名欄位
-    data.rename(columns={date_colName: 'new_date', y_colName: 'new_target', 
-                         org_colName: 'new_org'}, inplace=True)
+    data = data.rename(columns={date_colName: 'new_date', y_colName: 'new_target',
+                                org_colName: 'new_org'})
     data['new_date'] = data['new_date'].astype(str).str.replace('-', '', regex=False).str[:8]
-    data['new_date_ym'] = data['new_date'].str[:6]
-    
+    data['new_date_ym'] = data['new_date'].str[:6].astype('category')
+    data['new_org'] = data['new_org'].astype('category')
+    if downcast:
+        data['new_target'] = data['new_target'].astype(np.int8)
+
     return data
 
 
@@ -71,15 +170,15 @@ def org_analysis(data: pd.DataFrame, oos_orgs: List[str] = None) -> pd.DataFrame
         data: 資料
         oos_orgs: 貸外機構清單，用於識別 OOS 樣本
     """
-    stat = data.groupby(['new_org', 'new_date_ym']).agg(
+    stat = data.groupby(['new_org', 'new_date_ym'], observed=True).agg(
         單月壞樣本數=('new_target', 'sum'),
         單月總樣本數=('new_target', 'count'),
         單月壞樣率=('new_target', 'mean')
     ).reset_index()
     
     # 累計統計
-    stat['總壞樣本數'] = stat.groupby('new_org')['單月壞樣本數'].transform('sum')
-    stat['總樣本數'] = stat.groupby('new_org')['單月總樣本數'].transform('sum')
+    stat['總壞樣本數'] = stat.groupby('new_org', observed=True)['單月壞樣本數'].transform('sum')
+    stat['總樣本數'] = stat.groupby('new_org', observed=True)['單月總樣本數'].transform('sum')
     stat['總壞樣率'] = stat['總壞樣本數'] / stat['總樣本數']
     
     # 標記是否為 OOS 機構
@@ -97,132 +196,452 @@ def org_analysis(data: pd.DataFrame, oos_orgs: List[str] = None) -> pd.DataFrame
     return stat[['機構', '年月', '單月壞樣本數', '單月總樣本數', '單月壞樣率', '總壞樣本數', '總樣本數', '總壞樣率', '樣本類型']]
 
 
-def missing_check(data: pd.DataFrame, channel: Dict[str, List[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+# 分塊剖析時每塊的儲存格數上限 (列數 × 欄數)，約對應數百 MB 的布林遮罩
+_PROFILE_CHUNK_CELLS = 50_000_000
+
+
+def missing_profile(data: pd.DataFrame, cols: List[str], miss_vals: List[int] = None,
+                    chunk_size: int = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series]:
+    """單次掃描計算所有欄位的分機構缺失計數與有值計數
+
+    以布林遮罩按 new_org 分組加總，按列分塊處理，每塊只需建立該塊的遮罩，
+    因此大型寬表也能維持在固定記憶體內。
+
+    參數:
+        cols: 需剖析的欄位
+        miss_vals: 視為缺失的異常值清單，預設為 [-1, -999, -1111]
+        chunk_size: 每塊列數，預設依 _PROFILE_CHUNK_CELLS 自動決定
+
+    返回:
+        miss_counts: 缺失計數 (NaN 或異常值)，索引為機構、欄位為變數
+        value_counts: 有值計數 (非 NaN)，索引為機構、欄位為變數
+        row_counts: 各機構樣本數
+    """
+    if miss_vals is None:
+        miss_vals = [-1, -999, -1111]
+    if chunk_size is None:
+        chunk_size = max(1, _PROFILE_CHUNK_CELLS // max(1, len(cols)))
+
+    miss_counts = pd.DataFrame(0, index=pd.Index([], name='new_org'), columns=cols)
+    value_counts = miss_counts.copy()
+    row_counts = pd.Series(0, index=miss_counts.index)
+
+    for start in tqdm.tqdm(range(0, len(data), chunk_size), desc="缺失率"):
+        chunk = data.iloc[start:start + chunk_size]
+        orgs = chunk['new_org']
+        na = chunk[cols].isna()
+        miss = na | chunk[cols].isin(miss_vals)
+        miss_counts = miss_counts.add(miss.groupby(orgs, observed=True).sum(), fill_value=0)
+        value_counts = value_counts.add((~na).groupby(orgs, observed=True).sum(), fill_value=0)
+        row_counts = row_counts.add(orgs.value_counts(), fill_value=0)
+
+    return miss_counts.astype(np.int64), value_counts.astype(np.int64), row_counts.astype(np.int64)
+
+
+def missing_check(data: pd.DataFrame, channel: Dict[str, List[str]] = None,
+                  chunk_size: int = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """計算缺失率 - 包含整體及分機構缺失率
-    
+
+    參數:
+        chunk_size: 分塊處理的每塊列數，預設自動決定
+
     返回:
         miss_detail: 缺失率明細 (格式：變數、整體、org1, org2, ..., orgn)
         miss_ch: 整體缺失率 (每個變數的整體缺失率)
     """
-    miss_vals = [-1, -999, -1111]
-    miss_ch = []
-    
     # 排除非變數欄位：record_id, target, org_info 等
     exclude_cols = ['new_date', 'new_date_ym', 'new_target', 'new_org', 'record_id', 'target', 'org_info']
     cols = [c for c in data.columns if c not in exclude_cols]
-    
+
+    miss_counts, _, row_counts = missing_profile(data, cols, chunk_size=chunk_size)
+
     # 計算整體缺失率
-    for col in tqdm.tqdm(cols, desc="缺失率"):
-        rate = ((data[col].isin(miss_vals)) | (data[col].isna())).mean()
-        miss_ch.append({'變數': col, '整體缺失率': round(rate, 4)})
-    
-    miss_ch = pd.DataFrame(miss_ch)
-    
+    overall = (miss_counts.sum() / len(data)).round(4)
+    miss_ch = pd.DataFrame({'變數': cols, '整體缺失率': overall.reindex(cols).values})
+
     # 計算分機構缺失率並轉換為寬格式
     orgs = sorted(data['new_org'].unique())
-    miss_detail_dict = {'變數': []}
-    miss_detail_dict['整體'] = []
-    
-    for org in orgs:
-        miss_detail_dict[org] = []
-    
-    for col in cols:
-        miss_detail_dict['變數'].append(col)
-        # 整體缺失率
-        overall_rate = ((data[col].isin(miss_vals)) | (data[col].isna())).mean()
-        miss_detail_dict['整體'].append(round(overall_rate, 4))
-        
-        # 各機構缺失率
-        for org in orgs:
-            org_data = data[data['new_org'] == org]
-            rate = ((org_data[col].isin(miss_vals)) | (org_data[col].isna())).mean()
-            miss_detail_dict[org].append(round(rate, 4))
-    
-    miss_detail = pd.DataFrame(miss_detail_dict)
+    org_rates = miss_counts.div(row_counts, axis=0).round(4).reindex(orgs)
+    miss_detail = pd.DataFrame({'變數': cols, '整體': miss_ch['整體缺失率'].values})
+    miss_detail = pd.concat([miss_detail, org_rates[cols].T.reset_index(drop=True)], axis=1)
     # 按整體缺失率降序排序
     miss_detail = miss_detail.sort_values('整體', ascending=False)
     miss_detail = miss_detail.reset_index(drop=True)
-    
+
     return miss_detail, miss_ch
 
 
+_IV_BINS = 5
+# NaN 作為獨立分箱，固定放在最後一箱，使所有特徵的計數陣列形狀一致
+_IV_NAN_BIN = _IV_BINS
+
+
+def _calc_iv_counts(args):
+    """以決策樹分箱擬合單一特徵一次，返回 (機構, 分箱, 目標) 計數
+
+    source 為 np.save 產生的 .npy 路徑 (以 memmap 唯讀開啟) 或記憶體中的矩陣，
+    倒數第二列為目標，最後一列為機構代碼；數值特徵從第 row 列讀取，
+    非數值特徵則直接以 values 傳入。
+    """
+    source, f, row, values, n_orgs = args
+    matrix = np.load(source, mmap_mode='r') if isinstance(source, str) else source
+    x = np.asarray(matrix[row]) if values is None else values
+    y = np.asarray(matrix[-2]).astype(np.int64)
+    orgs = np.asarray(matrix[-1]).astype(np.int64)
+
+    try:
+        # 使用 toad.transform.Combiner 進行分箱，分箱數設為 5，保留 NaN 值
+        c = toad.transform.Combiner()
+        bins = np.asarray(c.fit_transform(X=x, y=y, method='dt', n_bins=_IV_BINS,
+                                          min_samples=0.05/_IV_BINS, empty_separate=True))
+        if values is None:
+            bins = np.where(np.isnan(x), _IV_NAN_BIN, bins)
+        else:
+            bins = np.where(bins < 0, _IV_NAN_BIN, bins)
+    except Exception as e:
+        print(f"   IV 計算錯誤：變數={f}, 錯誤={e}")
+        return None
+
+    idx = (orgs * (_IV_BINS + 1) + bins) * 2 + y
+    counts = np.bincount(idx, minlength=n_orgs * (_IV_BINS + 1) * 2)
+    return counts.reshape(n_orgs, _IV_BINS + 1, 2)
+
+
+def _iv_from_counts(counts: np.ndarray) -> np.ndarray:
+    """由 (..., 分箱, 目標) 計數向量化計算 IV
+
+    與 toad.stats.IV 相同：僅計入有樣本的分箱，好/壞計數為 0 時以 1 代替。
+    """
+    present = counts.sum(axis=-1) > 0
+    total = counts.sum(axis=-2, keepdims=True)
+    total = np.where(total == 0, 1, total)
+    prob = np.where(counts == 0, 1, counts) / total
+    y_prob, n_prob = prob[..., 1], prob[..., 0]
+    iv = (y_prob - n_prob) * np.log(y_prob / n_prob)
+    return np.where(present, iv, 0.0).sum(axis=-1)
+
+
+def _iv_table(features: List[str], iv: np.ndarray) -> pd.DataFrame:
+    """整理 IV 結果為 (變數, IV) 表，剔除無法計算的特徵並按 IV 降序排序"""
+    iv_df = pd.DataFrame({'變數': features, 'IV': np.round(iv, 4)}).dropna(subset=['IV'])
+    return iv_df.sort_values('IV', ascending=False)
+
+
+def _fit_iv(data: pd.DataFrame, features: List[str], n_jobs: int,
+            org_col: str = None) -> Tuple[List[str], np.ndarray, list]:
+    """每個特徵擬合一次分箱，返回 (成功的特徵, 計數陣列 (特徵, 機構, 分箱, 目標), 機構名稱)
+
+    特徵欄位寫入單一矩陣，多程序時寫入暫存 .npy 並以 memmap 傳遞給各程序，
+    不再序列化整份 DataFrame。org_col 為 None 時所有樣本視為同一組。
+    """
+    import os
+    import shutil
+    import tempfile
+    from joblib import Parallel, delayed
+
+    if org_col is None:
+        org_codes, org_names = np.zeros(len(data), dtype=np.int64), [None]
+    else:
+        org_codes, org_names = pd.factorize(data[org_col], sort=True)
+        org_names = list(org_names)
+        if (org_codes < 0).any():
+            # 機構為空值的樣本僅計入整體
+            org_codes = np.where(org_codes < 0, len(org_names), org_codes)
+            org_names.append(None)
+
+    numeric = [f for f in features if pd.api.types.is_numeric_dtype(data[f])]
+    row_of = {f: i for i, f in enumerate(numeric)}
+    shape = (len(numeric) + 2, len(data))
+    use_memmap = n_jobs != 1 and len(features) > 1
+    tmp_dir = tempfile.mkdtemp(prefix='iv_') if use_memmap else None
+    try:
+        if use_memmap:
+            source = os.path.join(tmp_dir, 'matrix.npy')
+            matrix = np.lib.format.open_memmap(source, mode='w+', dtype=np.float64, shape=shape)
+        else:
+            matrix = source = np.empty(shape, dtype=np.float64)
+        for f, i in row_of.items():
+            matrix[i] = data[f].to_numpy(dtype=np.float64, na_value=np.nan)
+        matrix[-2] = data['new_target'].to_numpy(dtype=np.float64)
+        matrix[-1] = org_codes
+        if use_memmap:
+            matrix.flush()
+            del matrix
+
+        results = Parallel(n_jobs=n_jobs, verbose=0)(
+            delayed(_calc_iv_counts)((
+                source, f, row_of.get(f),
+                None if f in row_of else data[f].to_numpy(), len(org_names)
+            ))
+            for f in features
+        )
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    fitted = [(f, r) for f, r in zip(features, results) if r is not None]
+    if len(fitted) == 0:
+        return [], np.zeros((0, len(org_names), _IV_BINS + 1, 2), dtype=np.int64), org_names
+    return [f for f, _ in fitted], np.stack([r for _, r in fitted]), org_names
+
+
+def calculate_org_iv(data: pd.DataFrame, features: List[str],
+                     n_jobs: int = 4) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """一次計算整體與分機構 IV
+
+    每個特徵只在全體資料上擬合一次決策樹分箱 (toad Combiner，5 箱，NaN 獨立成箱)，
+    再以 (機構, 分箱, 目標) 分組計數，向量化得到整體及各機構的 IV；
+    分機構 IV 沿用整體分箱邊界。
+
+    返回:
+        iv_overall: 整體 IV (變數、IV)
+        iv_by_org: 分機構 IV (變數、IV、機構)；機構內該特徵全為 NaN 時不列出
+    """
+    fitted_vars, counts, org_names = _fit_iv(data, features, n_jobs, org_col='new_org')
+    if len(fitted_vars) == 0:
+        print(f"   IV 計算結果為空，特徵數量={len(features)}")
+        return pd.DataFrame(columns=['變數', 'IV']), pd.DataFrame(columns=['變數', 'IV', '機構'])
+
+    iv_overall = _iv_table(fitted_vars, _iv_from_counts(counts.sum(axis=1)))
+
+    # 機構內無任何非 NaN 值的特徵無法分箱，視同計算失敗
+    org_iv = _iv_from_counts(counts)
+    org_iv[counts[:, :, :_IV_NAN_BIN].sum(axis=(2, 3)) == 0] = np.nan
+    iv_by_org = pd.DataFrame({
+        '變數': np.repeat(np.array(fitted_vars, dtype=object), len(org_names)),
+        'IV': np.round(org_iv, 4).ravel(),
+        '機構': np.tile(np.array(org_names, dtype=object), len(fitted_vars)),
+    }).dropna(subset=['IV', '機構'])
+    iv_by_org = iv_by_org.reset_index(drop=True)
+
+    return iv_overall, iv_by_org
+
+
 def calculate_iv(data: pd.DataFrame, features: List[str], n_jobs: int = 4) -> pd.DataFrame:
     """計算 IV 值 - 使用 toad.transform.Combiner 進行分箱，分箱數設為 5，保留 NaN 值"""
-    import tqdm
-    from joblib import Parallel, delayed
-    
-    def _calc_iv(f):
-        try:
-            # 使用 toad.transform.Combiner 進行分箱，分箱數設為 5
-            c = toad.transform.Combiner()
-            data_temp = data[[f, 'new_target']].copy()
-            data_temp.columns = ['x', 'y']
-            data_temp['x_bin'] = c.fit_transform(X=data_temp['x'], y=data_temp['y'], method='dt', n_bins=5, min_samples=0.05/5, empty_separate=True)
-            
-            # 使用分箱後的資料計算 IV 值
-            iv_df = toad.quality(data_temp[['x_bin', 'y']], 'y', iv_only=True)
-            if 'iv' in iv_df.columns and len(iv_df) > 0:
-                iv_value = iv_df['iv'].iloc[0]
-                if not np.isnan(iv_value):
-                    return {'變數': f, 'IV': round(iv_value, 4)}
-            return None
-        except Exception as e:
-            print(f"   IV 計算錯誤：變數={f}, 錯誤={e}")
-            return None
-    
-    # 使用 tqdm 顯示進度
-    results = Parallel(n_jobs=n_jobs, verbose=0)(
-        delayed(_calc_iv)(f) for f in features
-    )
-    iv_list = [r for r in results if r is not None]
-    
-    if len(iv_list) == 0:
+    fitted_vars, counts, _ = _fit_iv(data, features, n_jobs)
+    if len(fitted_vars) == 0:
         print(f"   IV 計算結果為空，特徵數量={len(features)}")
         return pd.DataFrame(columns=['變數', 'IV'])
-    
-    return pd.DataFrame(iv_list).sort_values('IV', ascending=False)
+    return _iv_table(fitted_vars, _iv_from_counts(counts[:, 0]))
 
 
-def calculate_corr(data: pd.DataFrame, features: List[str]) -> pd.DataFrame:
-    """計算相關性矩陣"""
-    corr = data[features].corr().abs()
-    return corr
+def calculate_corr(data: pd.DataFrame, features: List[str], dtype: str = 'float64',
+                   block_size: int = 1024) -> pd.DataFrame:
+    """計算相關性矩陣 (絕對值)
 
+    與 DataFrame.corr() 相同採用成對完整觀測值，但以分塊矩陣乘法計算；
+    dtype 可設為 'float32' 以減半記憶體，block_size 為每塊的欄數。
+    """
+    X = data[features].to_numpy(dtype=dtype, na_value=np.nan)
+    mask = ~np.isnan(X)
+    k = X.shape[1]
+    corr = np.empty((k, k), dtype=dtype)
 
-def export_report_xlsx(filepath: str, data_name: str, data: pd.DataFrame, 
-                       sheet_name: str, description: str = ""):
-    """匯出 xlsx 報告 - 支援追加"""
-    try:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 先中心化以減少相消誤差
+        X = np.where(mask, X - np.nanmean(X, axis=0), 0).astype(dtype)
+        if mask.all():
+            Z = X / np.sqrt((X * X).sum(axis=0))
+            for start in range(0, k, block_size):
+                block = slice(start, start + block_size)
+                corr[:, block] = Z.T @ Z[:, block]
+        else:
+            M = mask.astype(dtype)
+            X2 = X * X
+            tol = np.finfo(dtype).eps * 64
+            for start in range(0, k, block_size):
+                block = slice(start, start + block_size)
+                n = M.T @ M[:, block]
+                sx = X.T @ M[:, block]
+                sy = M.T @ X[:, block]
+                sxx = X2.T @ M[:, block]
+                syy = M.T @ X2[:, block]
+                cov = X.T @ X[:, block] - sx * sy / n
+                var_x = sxx - sx * sx / n
+                var_y = syy - sy * sy / n
+                # 重疊樣本內為常數的欄位變異數僅剩捨入誤差，比照 pandas 視為 NaN
+                var_x[var_x <= tol * sxx] = np.nan
+                var_y[var_y <= tol * syy] = np.nan
+                corr[:, block] = cov / np.sqrt(var_x * var_y)
+
+    return pd.DataFrame(np.abs(corr), index=features, columns=features)
+
+
+# Excel 單一工作表的列數上限
+_XLSX_MAX_ROWS = 1_048_576
+# 串流寫入時每次轉換的列數
+_REPORT_CHUNK_ROWS = 10_000
+
+
+def _iter_excel_rows(data: pd.DataFrame, chunk_rows: int = _REPORT_CHUNK_ROWS):
+    """按區塊逐欄轉為 Python 值並逐列產出；缺失值寫為空白儲存格"""
+    for start in range(0, len(data), chunk_rows):
+        block = data.iloc[start:start + chunk_rows]
+        columns = [s.astype(object).where(s.notna(), None).tolist() for _, s in block.items()]
+        yield from zip(*columns)
+
+
+class ReportWriter:
+    """串流 xlsx 報告寫入器
+
+    使用 openpyxl write-only 模式，資料列按區塊從 DataFrame 串流寫入，不建立逐格的儲存格物件；
+    所有工作表在 close() 時一次儲存。列數超過 max_rows 的工作表改存為旁路檔案
+    (parquet，缺少 pyarrow 時為 CSV)，工作表中僅記錄檔案路徑。
+
+    用法:
+        with ReportWriter('report.xlsx') as writer:
+            writer.write_sheet('明細', df)
+    """
+
+    def __init__(self, filepath: str, max_rows: int = _XLSX_MAX_ROWS):
+        if not HAS_OPENPYXL:
+            raise ImportError("匯出 xlsx 報告需要安裝 openpyxl")
+        self.filepath = filepath
+        self.max_rows = max_rows
+        self.wb = Workbook(write_only=True)
+        self.header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        self.header_font = Font(color="FFFFFF", bold=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+    def _sidecar(self, sheet_name: str, data: pd.DataFrame) -> str:
+        """將超過列數上限的工作表另存為旁路檔案"""
+        import os
+        import re
+        stem = os.path.splitext(self.filepath)[0] + '_' + re.sub(r'[\\/:*?"<>|\s]+', '_', sheet_name)
+        try:
+            data.to_parquet(stem + '.parquet', index=False)
+            return stem + '.parquet'
+        except ImportError:
+            data.to_csv(stem + '.csv', index=False, encoding='utf-8-sig')
+            return stem + '.csv'
+
+    def write_rows(self, sheet_name: str, rows) -> None:
+        """寫入不含表頭樣式的工作表 (例如彙總)"""
+        ws = self.wb.create_sheet(sheet_name)
+        for row in rows:
+            ws.append(row)
+
+    def write_sheet(self, sheet_name: str, data: pd.DataFrame, title_rows: list = None,
+                    start_row: int = 1, center_header: bool = False) -> None:
+        """寫入 DataFrame 工作表
+
+        參數:
+            sheet_name: 工作表名稱
+            data: 資料
+            title_rows: 表頭之前的說明列
+            start_row: 表頭所在列 (不足的列以空白補齊)
+            center_header: 表頭是否置中
+        """
+        from openpyxl.cell import WriteOnlyCell
+
+        ws = self.wb.create_sheet(sheet_name)
+        title_rows = list(title_rows or [])
+        for row in title_rows:
+            ws.append(row)
+        for _ in range(start_row - 1 - len(title_rows)):
+            ws.append([])
+
+        if start_row + len(data) > self.max_rows:
+            path = self._sidecar(sheet_name, data)
+            ws.append([f"資料共 {len(data)} 行，超過工作表上限 {self.max_rows} 行，完整資料已另存：{path}"])
+            print(f"   [{sheet_name}] 超過工作表列數上限，已另存至 {path}")
+            return
+
+        header = []
+        for col in data.columns:
+            cell = WriteOnlyCell(ws, value=col)
+            cell.fill = self.header_fill
+            cell.font = self.header_font
+            if center_header:
+                cell.alignment = Alignment(horizontal='center')
+            header.append(cell)
+        ws.append(header)
+        for row in _iter_excel_rows(data):
+            ws.append(row)
+
+    def copy_existing(self, skip=()) -> None:
+        """以串流方式複製既有檔案中的工作表 (保留值及儲存格樣式，例如表頭)，略過 skip 中的工作表"""
+        import os
+        from copy import copy
         from openpyxl import load_workbook
-        wb = load_workbook(filepath)
-        ws = wb.create_sheet(sheet_name)
-    except:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = sheet_name
-    
-    # 寫入描述
-    ws['A1'] = f"資料：{data_name}"
-    ws['A2'] = f"時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        from openpyxl.cell import WriteOnlyCell
+
+        if not os.path.exists(self.filepath):
+            return
+        try:
+            src = load_workbook(self.filepath, read_only=True)
+        except Exception:
+            return
+        try:
+            for ws in src.worksheets:
+                if ws.title in skip:
+                    continue
+                out = self.wb.create_sheet(ws.title)
+                for row in ws.iter_rows():
+                    values = []
+                    for cell in row:
+                        # 唯讀模式下空白儲存格為 EmptyCell，沒有 has_style 屬性
+                        if not getattr(cell, "has_style", False):
+                            values.append(cell.value)
+                            continue
+                        # 只有帶樣式的儲存格 (表頭等) 才建立儲存格物件
+                        styled = WriteOnlyCell(out, value=cell.value)
+                        styled.font = copy(cell.font)
+                        styled.fill = copy(cell.fill)
+                        styled.border = copy(cell.border)
+                        styled.alignment = copy(cell.alignment)
+                        styled.number_format = cell.number_format
+                        values.append(styled)
+                    out.append(values)
+        finally:
+            src.close()
+
+    def close(self) -> None:
+        """一次儲存所有工作表 (先寫入暫存檔再取代，避免覆寫仍在讀取的來源檔)"""
+        import os
+        import tempfile
+
+        out_dir = os.path.dirname(os.path.abspath(self.filepath))
+        fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=out_dir)
+        os.close(fd)
+        try:
+            self.wb.save(tmp_path)
+            os.replace(tmp_path, self.filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def export_report_xlsx(filepath, data_name: str, data: pd.DataFrame,
+                       sheet_name: str, description: str = ""):
+    """匯出 xlsx 報告 - 支援追加
+
+    filepath 為 ReportWriter 時只加入工作表，由呼叫端寫完所有工作表後一次儲存；
+    為路徑時保留既有工作表 (含表頭樣式) 並加入新工作表，同名工作表會被取代。
+    路徑模式每次呼叫都會重新讀寫整個活頁簿，寫入多個工作表時請傳入 ReportWriter：
+
+        with ReportWriter('report.xlsx') as writer:
+            export_report_xlsx(writer, '資料', df1, '明細')
+            export_report_xlsx(writer, '資料', df2, '統計')
+    """
+    title_rows = [[f"資料：{data_name}"], [f"時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"]]
     if description:
-        ws['A3'] = f"描述：{description}"
-    
-    # 寫入資料
-    start_row = 5
-    for i, col in enumerate(data.columns):
-        ws.cell(start_row, i+1, col)
-    
-    for i, row in enumerate(data.values):
-        for j, val in enumerate(row):
-            ws.cell(start_row+1+i, j+1, val)
-    
-    # 樣式
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    for cell in ws[start_row]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-    
-    wb.save(filepath)
+        title_rows.append([f"描述：{description}"])
+
+    if isinstance(filepath, ReportWriter):
+        filepath.write_sheet(sheet_name, data, title_rows=title_rows, start_row=5, center_header=True)
+        print(f"[{sheet_name}] 已加入 {filepath.filepath}")
+        return
+
+    with ReportWriter(filepath) as writer:
+        writer.copy_existing(skip={sheet_name})
+        writer.write_sheet(sheet_name, data, title_rows=title_rows, start_row=5, center_header=True)
     print(f"[{sheet_name}] 已儲存至 {filepath}")
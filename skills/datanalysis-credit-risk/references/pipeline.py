@@ -0,0 +1,223 @@
+"""管線執行模組 - 步驟快取、續跑與效能報告
+
+每個步驟的輸出 (DataFrame) 以 parquet 存於快取目錄，快取鍵由步驟名稱、參數
+及上游步驟的快取鍵雜湊而成；根步驟以資料檔案指紋作為輸入。調整某個步驟的
+參數時，只有該步驟及依賴它的步驟會重新計算。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+import pandas as pd
+
+# 步驟實作變更導致舊快取失效時遞增
+CACHE_VERSION = 1
+
+# 每個步驟保留的快取項目數 (依最近使用時間)
+DEFAULT_KEEP_PER_STEP = 2
+
+StepOutput = Union[pd.DataFrame, Tuple[pd.DataFrame, ...]]
+
+
+def file_fingerprint(path: str) -> str:
+    """資料檔案指紋 - 路徑、大小及修改時間 (不讀取內容，大型檔案亦可即時取得)"""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _hash(payload) -> str:
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _save_frame(df: pd.DataFrame, path_stem: str) -> str:
+    """優先存為 parquet；欄位含混合型態等 parquet 無法表示的情形改存 pickle"""
+    try:
+        df.to_parquet(path_stem + '.parquet')
+        return os.path.basename(path_stem) + '.parquet'
+    except Exception:
+        if os.path.exists(path_stem + '.parquet'):
+            os.remove(path_stem + '.parquet')
+        df.to_pickle(path_stem + '.pkl')
+        return os.path.basename(path_stem) + '.pkl'
+
+
+def _load_frame(path: str) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def _rss_bytes():
+    """目前程序常駐記憶體 (RSS)；無法取得時返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class _PeakMemory:
+    """以背景執行緒取樣 RSS，記錄區塊執行期間的峰值 (不含子程序)"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = _rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        return False
+
+
+class StepRunner:
+    """執行並快取管線步驟
+
+    參數:
+        cache_dir: 快取目錄
+        from_step: 從此步驟起強制重新計算 (忽略快取)，之前的步驟優先讀取快取
+        use_cache: 是否啟用快取
+        keep_per_step: 每個步驟保留的快取項目數；其他資料指紋或參數留下的較舊項目
+                       於寫入或讀取該步驟時刪除，None 表示不清理
+    """
+
+    def __init__(self, cache_dir: str, from_step: int = None, use_cache: bool = True,
+                 keep_per_step: int = DEFAULT_KEEP_PER_STEP):
+        self.cache_dir = cache_dir
+        self.from_step = from_step
+        self.use_cache = use_cache
+        self.keep_per_step = keep_per_step
+        self.keys: Dict[int, str] = {}
+        self.records: List[dict] = []
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, step: int, name: str, params: dict, inputs: Sequence[int] = ()) -> str:
+        """由步驟名稱、參數及上游步驟快取鍵計算快取鍵"""
+        return _hash({
+            'version': CACHE_VERSION,
+            'step': step,
+            'name': name,
+            'params': params,
+            'inputs': [self.keys[s] for s in inputs],
+        })
+
+    def _entry_dir(self, step: int, key: str) -> str:
+        return os.path.join(self.cache_dir, f"step{step:02d}-{key}")
+
+    def _load(self, entry: str) -> StepOutput:
+        with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        frames = tuple(_load_frame(os.path.join(entry, name)) for name in meta['files'])
+        return frames if meta['is_tuple'] else frames[0]
+
+    def _store(self, entry: str, output: StepOutput) -> None:
+        frames = output if isinstance(output, tuple) else (output,)
+        tmp = entry + f".{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        files = [_save_frame(df, os.path.join(tmp, f"out{i}")) for i, df in enumerate(frames)]
+        with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'files': files, 'is_tuple': isinstance(output, tuple)}, f)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+
+    def _prune(self, step: int, current: str) -> None:
+        """刪除同一步驟中最久未使用的項目，只保留 keep_per_step 個 (含目前項目)"""
+        if self.keep_per_step is None:
+            return
+        prefix = f"step{step:02d}-"
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            meta = os.path.join(path, 'meta.json')
+            if name.startswith(prefix) and not name.endswith('.tmp') and path != current \
+                    and os.path.exists(meta):
+                entries.append((os.path.getmtime(meta), path))
+        entries.sort(reverse=True)
+        for _, path in entries[max(self.keep_per_step - 1, 0):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def run(self, step: int, name: str, func: Callable[[], StepOutput],
+            params: dict = None, inputs: Sequence[int] = (), cache: bool = True) -> StepOutput:
+        """執行步驟；快取命中時直接讀取輸出
+
+        參數:
+            step: 步驟編號
+            name: 步驟名稱
+            func: 無參數函式，返回 DataFrame 或 DataFrame 的 tuple
+            params: 影響輸出的參數 (需可序列化為 JSON)
+            inputs: 上游步驟編號，其快取鍵會納入本步驟的快取鍵
+            cache: 是否快取輸出；計算成本低或輸出過大的步驟可設為 False，
+                   仍會記錄快取鍵供下游步驟使用
+        """
+        params = params or {}
+        key = self.key(step, name, params, inputs)
+        self.keys[step] = key
+        entry = self._entry_dir(step, key)
+        cache = cache and self.use_cache
+        forced = self.from_step is not None and step >= self.from_step
+        cached = cache and not forced and os.path.exists(os.path.join(entry, 'meta.json'))
+
+        start = time.perf_counter()
+        with _PeakMemory() as mem:
+            if cached:
+                output = self._load(entry)
+                # 更新最近使用時間，避免被清理
+                os.utime(os.path.join(entry, 'meta.json'))
+            else:
+                output = func()
+                if cache:
+                    self._store(entry, output)
+            if cache:
+                self._prune(step, entry)
+        elapsed = time.perf_counter() - start
+        peak_mb = round(mem.peak / 1024 / 1024, 1) if mem.peak is not None else None
+
+        self.records.append({
+            '步驟': step,
+            '名稱': name,
+            '狀態': '快取' if cached else '計算',
+            '耗時(秒)': round(elapsed, 2),
+            '峰值記憶體(MB)': peak_mb,
+            '快取鍵': key,
+        })
+        print(f"   步驟 {step} {'讀取快取' if cached else '計算完成'}：耗時 {elapsed:.2f} 秒，峰值記憶體 {peak_mb} MB")
+        return output
+
+    def report(self) -> pd.DataFrame:
+        """各步驟耗時與峰值記憶體報告 (峰值為主程序 RSS，不含並行子程序)"""
+        return pd.DataFrame(self.records, columns=['步驟', '名稱', '狀態', '耗時(秒)', '峰值記憶體(MB)', '快取鍵'])
+
+    def save_report(self, path: str) -> None:
+        """將報告存為 JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=2)
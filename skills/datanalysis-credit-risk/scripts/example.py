@@ -5,7 +5,7 @@
 上次修改時間：2026-03-02
 """
 import os, sys
-import time
+import argparse
 import pandas as pd
 from typing import Dict, List, Optional, Any, Callable
 import numpy as np
@@ -37,6 +37,7 @@ def _ensure_references_on_path():
 _ensure_references_on_path()
 
 from references.func import get_dataset, missing_check, org_analysis
+from references.pipeline import StepRunner, file_fingerprint
 from references.analysis import (drop_abnormal_ym, drop_highmiss_features,
                                drop_lowiv_features, drop_highcorr_features,
                                drop_highpsi_features,
@@ -46,6 +47,14 @@ from references.analysis import (drop_abnormal_ym, drop_highmiss_features,
                                psi_distribution_by_org,
                                value_ratio_distribution_by_org)
 
+# ==================== 命令列參數 ====================
+# --from-step N：從步驟 N 起重新計算，之前的步驟讀取快取
+# --no-cache：停用步驟快取，每個步驟都重新計算
+_arg_parser = argparse.ArgumentParser(description='資料清洗管線')
+_arg_parser.add_argument('--from-step', type=int, default=None, help='從此步驟起重新計算')
+_arg_parser.add_argument('--no-cache', action='store_true', help='停用步驟快取')
+PIPELINE_ARGS, _ = _arg_parser.parse_known_args()
+
 # ==================== 路徑設定 (互動式輸入) ====================
 # 預設使用 50 欄位的測試資料，支援在命令列中進行互動式修改
 default_data_path = ''
@@ -124,27 +133,17 @@ steps = []
 # 儲存每個步驟的參數
 params = {}
 
-# 計時器裝飾器
-def timer(step_name):
-    """計時器裝飾器"""
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            print(f"\n正在開始 {step_name}...")
-            start_time = time.time()
-            result = func(*args, **kwargs)
-            elapsed = time.time() - start_time
-            print(f"   {step_name} 耗時：{elapsed:.2f} 秒")
-            return result
-        return wrapper
-    return decorator
+# 步驟執行器：各步驟輸出依輸入指紋與參數快取，調整參數後只重新計算受影響的步驟
+runner = StepRunner(os.path.join(OUTPUT_DIR, '.pipeline_cache'),
+                    from_step=PIPELINE_ARGS.from_step,
+                    use_cache=not PIPELINE_ARGS.no_cache)
 
 # ==================== 步驟 1：獲取資料 ====================
 print("\n" + "=" * 60)
 print("步驟 1：獲取資料")
 print("=" * 60)
-step_start = time.time()
 # 使用 global_parameters 中的設定
-data = get_dataset(
+load_params = dict(
     data_pth=DATA_PATH,
     date_colName=DATE_COL,
     y_colName=Y_COL,
@@ -154,32 +153,34 @@ data = get_dataset(
     drop_colNames=[],
     miss_vals=[-1, -999, -1111]
 )
+data = runner.run(1, '獲取資料', lambda: get_dataset(**load_params),
+                  params={**load_params, 'fingerprint': file_fingerprint(DATA_PATH)})
 print(f"   原始資料：{data.shape}")
 print(f"   異常值已替換為 NaN：[-1, -999, -1111]")
-print(f"   步驟 1 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 2：機構樣本分析 ====================
 print("\n" + "=" * 60)
 print("步驟 2：機構樣本分析")
 print("=" * 60)
-step_start = time.time()
-org_stat = org_analysis(data, oos_orgs=OOS_ORGS)
+org_stat = runner.run(2, '機構樣本分析', lambda: org_analysis(data, oos_orgs=OOS_ORGS),
+                      params={'oos_orgs': OOS_ORGS}, inputs=[1])
 steps.append(('機構樣本統計', org_stat))
 print(f"   機構數量：{data['new_org'].nunique()}，月份數量：{data['new_date_ym'].nunique()}")
 print(f"   貸外機構數量：{len(OOS_ORGS)}")
-print(f"   步驟 2 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 3：分離 OOS 資料 ====================
 print("\n" + "=" * 60)
 print("步驟 3：分離 OOS 資料")
 print("=" * 60)
-step_start = time.time()
-oos_data = data[data['new_org'].isin(OOS_ORGS)]
-data = data[~data['new_org'].isin(OOS_ORGS)]
+# 分離成本低且輸出與原始資料同量級，不寫入快取
+oos_data, data = runner.run(
+    3, '分離OOS資料',
+    lambda: (data[data['new_org'].isin(OOS_ORGS)], data[~data['new_org'].isin(OOS_ORGS)]),
+    params={'oos_orgs': OOS_ORGS}, inputs=[1], cache=False
+)
 print(f"   OOS 樣本：{oos_data.shape[0]} 行")
 print(f"   建模樣本：{data.shape[0]} 行")
 print(f"   貸外機構：{OOS_ORGS}")
-print(f"   步驟 3 耗時：{time.time() - step_start:.2f} 秒")
 # 建立分離資訊 DataFrame
 oos_info = pd.DataFrame({'變數': ['OOS樣本', '建模樣本'], '數量': [oos_data.shape[0], data.shape[0]]})
 steps.append(('分離OOS資料', oos_info))
@@ -192,30 +193,31 @@ print("   按 Enter 使用預設值")
 print("=" * 60)
 params['min_ym_bad_sample'] = int(get_user_input("壞樣本數閾值", 10, int))
 params['min_ym_sample'] = int(get_user_input("總樣本數閾值", 500, int))
-step_start = time.time()
-data_filtered, abnormal_ym = drop_abnormal_ym(data.copy(), min_ym_bad_sample=params['min_ym_bad_sample'], min_ym_sample=params['min_ym_sample'])
+abnormal_ym = runner.run(
+    4, '篩選異常月份',
+    lambda: drop_abnormal_ym(data.copy(), min_ym_bad_sample=params['min_ym_bad_sample'], min_ym_sample=params['min_ym_sample'])[1],
+    params={k: params[k] for k in ('min_ym_bad_sample', 'min_ym_sample')}, inputs=[3]
+)
 steps.append(('Step4-異常月份處理', abnormal_ym))
-print(f"   篩選後：{data_filtered.shape}")
+print(f"   篩選後：{(int((~data['new_date_ym'].isin(abnormal_ym['年月'])).sum()), data.shape[1])}")
 print(f"   參數：min_ym_bad_sample={params['min_ym_bad_sample']}, min_ym_sample={params['min_ym_sample']}")
 if len(abnormal_ym) > 0:
     print(f"   已剔除月份：{abnormal_ym['年月'].tolist()}")
     print(f"   移除條件：{abnormal_ym['去除條件'].tolist()}")
-print(f"   步驟 4 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 5：計算缺失率 ====================
 print("\n" + "=" * 60)
 print("步驟 5：計算缺失率")
 print("=" * 60)
-step_start = time.time()
 orgs = data['new_org'].unique().tolist()
 channel = {'整體': orgs}
-miss_detail, miss_channel = missing_check(data, channel=channel)
+miss_detail, miss_channel = runner.run(5, '計算缺失率', lambda: missing_check(data, channel=channel),
+                                       params={'channel': channel}, inputs=[3])
 # miss_detail: 缺失率明細 (格式：特徵、整體、org1, org2, ..., orgn)
 # miss_channel: 整體缺失率
 steps.append(('缺失率明細', miss_detail))
 print(f"   特徵數量：{len(miss_detail['變數'].unique())}")
 print(f"   機構數量：{len(miss_detail.columns) - 2}")  # 減去 '變數' 和 '整體' 兩欄
-print(f"   步驟 5 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 6：剔除高缺失率特徵 ====================
 print("\n" + "=" * 60)
@@ -224,15 +226,17 @@ print("=" * 60)
 print("   按 Enter 使用預設值")
 print("=" * 60)
 params['missing_ratio'] = get_user_input("缺失率閾值", 0.6)
-step_start = time.time()
-data_miss, dropped_miss = drop_highmiss_features(data.copy(), miss_channel, threshold=params['missing_ratio'])
+dropped_miss = runner.run(
+    6, '剔除高缺失率特徵',
+    lambda: drop_highmiss_features(data.copy(), miss_channel, threshold=params['missing_ratio'])[1],
+    params={'missing_ratio': params['missing_ratio']}, inputs=[3, 5]
+)
 steps.append(('Step6-高缺失率處理', dropped_miss))
 print(f"   已剔除：{len(dropped_miss)}")
 print(f"   閾值：{params['missing_ratio']}")
 if len(dropped_miss) > 0:
     print(f"   已剔除特徵：{dropped_miss['變數'].tolist()[:5]}...")
     print(f"   移除條件：{dropped_miss['去除條件'].tolist()[:5]}...")
-print(f"   步驟 6 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 7：剔除低 IV 特徵 ====================
 print("\n" + "=" * 60)
@@ -243,15 +247,19 @@ print("=" * 60)
 params['overall_iv_threshold'] = get_user_input("整體 IV 閾值", 0.1)
 params['org_iv_threshold'] = get_user_input("單一機構 IV 閾值", 0.1)
 params['max_org_threshold'] = int(get_user_input("最大容忍低 IV 機構數量", 2, int))
-step_start = time.time()
 # 獲取特徵列表 (使用所有特徵)
 features = [c for c in data.columns if c.startswith('i_')]
-data_iv, iv_detail, iv_process = drop_lowiv_features(
-    data.copy(), features,
-    overall_iv_threshold=params['overall_iv_threshold'],
-    org_iv_threshold=params['org_iv_threshold'],
-    max_org_threshold=params['max_org_threshold'],
-    n_jobs=N_JOBS
+iv_detail, iv_process = runner.run(
+    7, '剔除低IV特徵',
+    lambda: drop_lowiv_features(
+        data.copy(), features,
+        overall_iv_threshold=params['overall_iv_threshold'],
+        org_iv_threshold=params['org_iv_threshold'],
+        max_org_threshold=params['max_org_threshold'],
+        n_jobs=N_JOBS
+    )[1:],
+    params={k: params[k] for k in ('overall_iv_threshold', 'org_iv_threshold', 'max_org_threshold')},
+    inputs=[3]
 )
 # iv_detail: IV 明細 (每個特徵在每個機構及整體的 IV 值)
 # iv_process: IV 處理表 (不符合條件的特徵)
@@ -261,7 +269,6 @@ print(f"   參數：overall_iv_threshold={params['overall_iv_threshold']}, org_i
 if len(iv_process) > 0:
     print(f"   已剔除特徵：{iv_process['變數'].tolist()[:5]}...")
     print(f"   處理原因：{iv_process['處理原因'].tolist()[:5]}...")
-print(f"   步驟 7 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 8：剔除高 PSI 特徵 ====================
 print("\n" + "=" * 60)
@@ -272,16 +279,20 @@ print("=" * 60)
 params['psi_threshold'] = get_user_input("PSI 閾值", 0.1)
 params['max_months_ratio'] = get_user_input("最大不穩定月份比例", 1/3)
 params['max_orgs'] = int(get_user_input("最大不穩定機構數量", 6, int))
-step_start = time.time()
 # 獲取 PSI 計算前的特徵 (使用所有特徵)
 features_for_psi = [c for c in data.columns if c.startswith('i_')]
-data_psi, psi_detail, psi_process = drop_highpsi_features(
-    data.copy(), features_for_psi,
-    psi_threshold=params['psi_threshold'],
-    max_months_ratio=params['max_months_ratio'],
-    max_orgs=params['max_orgs'],
-    min_sample_per_month=100,
-    n_jobs=N_JOBS
+psi_detail, psi_process = runner.run(
+    8, '剔除高PSI特徵',
+    lambda: drop_highpsi_features(
+        data.copy(), features_for_psi,
+        psi_threshold=params['psi_threshold'],
+        max_months_ratio=params['max_months_ratio'],
+        max_orgs=params['max_orgs'],
+        min_sample_per_month=100,
+        n_jobs=N_JOBS
+    )[1:],
+    params={**{k: params[k] for k in ('psi_threshold', 'max_months_ratio', 'max_orgs')}, 'min_sample_per_month': 100},
+    inputs=[3]
 )
 # psi_detail: PSI 明細 (每個特徵在每個機構每個月份的 PSI 值)
 # psi_process: PSI 處理表 (不符合條件的特徵)
@@ -292,7 +303,6 @@ if len(psi_process) > 0:
     print(f"   已剔除特徵：{psi_process['變數'].tolist()[:5]}...")
     print(f"   處理原因：{psi_process['處理原因'].tolist()[:5]}...")
 print(f"   PSI 明細：{len(psi_detail)} 筆記錄")
-print(f"   步驟 8 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 9：Null Importance 去噪 ====================
 print("\n" + "=" * 60)
@@ -302,17 +312,21 @@ print("   按 Enter 使用預設值")
 print("=" * 60)
 params['n_estimators'] = int(get_user_input("樹的數量", 100, int))
 params['max_depth'] = int(get_user_input("最大樹深度", 5, int))
-params['gain_threshold'] = get_user_input("增益差值閾值", 50)
-step_start = time.time()
+params['noise_confidence'] = get_user_input("打亂增益信賴水準", 0.95)
+params['noise_rounds'] = int(get_user_input("最大打亂輪數", 50, int))
 # 獲取特徵列表 (使用所有特徵)
 features = [c for c in data.columns if c.startswith('i_')]
-data_noise, dropped_noise = drop_highnoise_features(data.copy(), features, n_estimators=params['n_estimators'], max_depth=params['max_depth'], gain_threshold=params['gain_threshold'])
+dropped_noise = runner.run(
+    9, 'Null Importance去噪',
+    lambda: drop_highnoise_features(data.copy(), features, n_estimators=params['n_estimators'], max_depth=params['max_depth'],
+                                    confidence=params['noise_confidence'], n_rounds=params['noise_rounds'], n_jobs=N_JOBS)[1],
+    params={k: params[k] for k in ('n_estimators', 'max_depth', 'noise_confidence', 'noise_rounds')}, inputs=[3]
+)
 steps.append(('Step9-null importance處理', dropped_noise))
 print(f"   已剔除：{len(dropped_noise)}")
-print(f"   參數：n_estimators={params['n_estimators']}, max_depth={params['max_depth']}, gain_threshold={params['gain_threshold']}")
+print(f"   參數：n_estimators={params['n_estimators']}, max_depth={params['max_depth']}, noise_confidence={params['noise_confidence']}, noise_rounds={params['noise_rounds']}")
 if len(dropped_noise) > 0:
     print(f"   已剔除特徵：{dropped_noise['變數'].tolist()}")
-print(f"   步驟 9 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 10：剔除高相關性特徵 (基於 Null Importance 原始增益) ====================
 print("\n" + "=" * 60)
@@ -322,7 +336,6 @@ print("   按 Enter 使用預設值")
 print("=" * 60)
 params['max_corr'] = get_user_input("相關性閾值", 0.9)
 params['top_n_keep'] = int(get_user_input("按原始增益排名保留前 N 個特徵", 20, int))
-step_start = time.time()
 # 獲取特徵列表 (使用所有特徵)
 features = [c for c in data.columns if c.startswith('i_')]
 # 從 null importance 結果中獲取原始增益
@@ -330,55 +343,71 @@ if len(dropped_noise) > 0 and '原始gain' in dropped_noise.columns:
     gain_dict = dict(zip(dropped_noise['變數'], dropped_noise['原始gain']))
 else:
     gain_dict = {}
-data_corr, dropped_corr = drop_highcorr_features(data.copy(), features, threshold=params['max_corr'], gain_dict=gain_dict, top_n_keep=params['top_n_keep'])
+dropped_corr = runner.run(
+    10, '剔除高相關性特徵',
+    lambda: drop_highcorr_features(data.copy(), features, threshold=params['max_corr'], gain_dict=gain_dict, top_n_keep=params['top_n_keep'])[1],
+    params={k: params[k] for k in ('max_corr', 'top_n_keep')}, inputs=[3, 9]
+)
 steps.append(('Step10-高相關性剔除', dropped_corr))
 print(f"   已剔除：{len(dropped_corr)}")
 print(f"   閾值：{params['max_corr']}")
 if len(dropped_corr) > 0:
     print(f"   已剔除特徵：{dropped_corr['變數'].tolist()}")
     print(f"   移除條件：{dropped_corr['去除條件'].tolist()[:5]}...")
-print(f"   步驟 10 耗時：{time.time() - step_start:.2f} 秒")
 
 # ==================== 步驟 11：匯出報告 ====================
 print("\n" + "=" * 60)
 print("步驟 11：匯出報告")
 print("=" * 60)
-step_start = time.time()
-
-# 計算 IV 分佈統計
-print("   正在計算 IV 分佈統計...")
-iv_distribution = iv_distribution_by_org(iv_detail, oos_orgs=OOS_ORGS)
-print(f"   IV 分佈統計：{len(iv_distribution)} 筆記錄")
-
-# 計算 PSI 分佈統計
-print("   正在計算 PSI 分佈統計...")
-psi_distribution = psi_distribution_by_org(psi_detail, oos_orgs=OOS_ORGS)
-print(f"   PSI 分佈統計：{len(psi_distribution)} 筆記錄")
-
-# 計算有值率分佈統計 (使用所有特徵)
-print("   正在計算有值率分佈統計...")
-features_for_value_ratio = [c for c in data.columns if c.startswith('i_')]
-value_ratio_distribution = value_ratio_distribution_by_org(data, features_for_value_ratio, oos_orgs=OOS_ORGS)
-print(f"   有值率分佈統計：{len(value_ratio_distribution)} 筆記錄")
-
-# 將明細和分佈統計加入步驟清單
-steps.append(('Step7-IV明細', iv_detail))
-steps.append(('Step7-IV分佈統計', iv_distribution))
-steps.append(('Step8-PSI明細', psi_detail))
-steps.append(('Step8-PSI分佈統計', psi_distribution))
-steps.append(('Step5-有值率分佈統計', value_ratio_distribution))
-
-export_cleaning_report(REPORT_PATH, steps,
-                      iv_detail=iv_detail,
-                      iv_process=iv_process,
-                      psi_detail=psi_detail,
-                      psi_process=psi_process,
-                      params=params,
-                      iv_distribution=iv_distribution,
-                      psi_distribution=psi_distribution,
-                      value_ratio_distribution=value_ratio_distribution)
-print(f"   報告：{REPORT_PATH}")
-print(f"   步驟 11 耗時：{time.time() - step_start:.2f} 秒")
+
+
+def export_report():
+    """計算分佈統計並匯出報告"""
+    # 計算 IV 分佈統計
+    print("   正在計算 IV 分佈統計...")
+    iv_distribution = iv_distribution_by_org(iv_detail, oos_orgs=OOS_ORGS)
+    print(f"   IV 分佈統計：{len(iv_distribution)} 筆記錄")
+
+    # 計算 PSI 分佈統計
+    print("   正在計算 PSI 分佈統計...")
+    psi_distribution = psi_distribution_by_org(psi_detail, oos_orgs=OOS_ORGS)
+    print(f"   PSI 分佈統計：{len(psi_distribution)} 筆記錄")
+
+    # 計算有值率分佈統計 (使用所有特徵)
+    print("   正在計算有值率分佈統計...")
+    features_for_value_ratio = [c for c in data.columns if c.startswith('i_')]
+    value_ratio_distribution = value_ratio_distribution_by_org(data, features_for_value_ratio, oos_orgs=OOS_ORGS)
+    print(f"   有值率分佈統計：{len(value_ratio_distribution)} 筆記錄")
+
+    # 將明細和分佈統計加入步驟清單
+    steps.append(('Step7-IV明細', iv_detail))
+    steps.append(('Step7-IV分佈統計', iv_distribution))
+    steps.append(('Step8-PSI明細', psi_detail))
+    steps.append(('Step8-PSI分佈統計', psi_distribution))
+    steps.append(('Step5-有值率分佈統計', value_ratio_distribution))
+
+    export_cleaning_report(REPORT_PATH, steps,
+                          iv_detail=iv_detail,
+                          iv_process=iv_process,
+                          psi_detail=psi_detail,
+                          psi_process=psi_process,
+                          params=params,
+                          iv_distribution=iv_distribution,
+                          psi_distribution=psi_distribution,
+                          value_ratio_distribution=value_ratio_distribution)
+    print(f"   報告：{REPORT_PATH}")
+
+
+# 報告檔案每次都重新寫出，不寫入快取
+runner.run(11, '匯出報告', export_report, params=params,
+           inputs=[2, 3, 4, 5, 6, 7, 8, 9, 10], cache=False)
+
+# ==================== 執行報告 ====================
+print("\n" + "=" * 60)
+print("管線執行報告")
+print("=" * 60)
+print(runner.report().to_string(index=False))
+runner.save_report(os.path.join(OUTPUT_DIR, '管線執行報告.json'))
 
 # ==================== 彙總 ====================
 print("\n" + "=" * 60)
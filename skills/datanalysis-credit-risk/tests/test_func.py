@@ -0,0 +1,36 @@
+"""references/func.py 報告匯出的回歸測試。"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("openpyxl")
+pytest.importorskip("toad")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from openpyxl import load_workbook  # noqa: E402
+
+from references.func import export_report_xlsx  # noqa: E402
+
+
+def test_append_keeps_sheets_with_blank_cells(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    # NaN 寫成空白儲存格，唯讀讀取時為 EmptyCell
+    with_nan = pd.DataFrame({"feature": ["a", "b"], "iv": [np.nan, 0.2], "bins": [3, 4]})
+    other = pd.DataFrame({"feature": ["c"], "psi": [0.01]})
+
+    export_report_xlsx(path, "資料", with_nan, "IV")
+    export_report_xlsx(path, "資料", other, "PSI")
+    export_report_xlsx(path, "資料", other, "PSI2")
+
+    wb = load_workbook(path)
+    assert wb.sheetnames == ["IV", "PSI", "PSI2"]
+    iv = wb["IV"]
+    assert [c.value for c in iv[6]] == ["a", None, 3]
+    assert [c.value for c in iv[7]] == ["b", 0.2, 4]
+    # 表頭樣式在追加後仍保留
+    assert iv["A5"].value == "feature"
+    assert iv["A5"].font.b
+    assert iv["A5"].fill.fgColor.rgb.endswith("366092")
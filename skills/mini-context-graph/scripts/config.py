@@ -6,6 +6,7 @@ config.py — 內容圖形技能 (Context Graph Skill) 的全域設定常數。
 
   MINI_CONTEXT_GRAPH_DATA_DIR — graph.json、index.json 等檔案所在位置
   MINI_CONTEXT_GRAPH_WIKI_DIR — Wiki 頁面、index.md 與 log.md 所在位置
+  MINI_CONTEXT_GRAPH_BACKEND  — 儲存後端："json"（預設）或 "sqlite"
 
 當未設定環境變數時，兩者都預設為目前工作目錄的子目錄，
 因此資料會存放在使用該技能的專案目錄中。
@@ -18,6 +19,10 @@ _BASE = Path(os.environ.get("MINI_CONTEXT_GRAPH_BASE", str(Path.cwd())))
 DATA_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_DATA_DIR", str(_BASE / "data")))
 WIKI_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_WIKI_DIR", str(_BASE / "wiki")))
 
+# "json"：每個儲存一個 JSON 檔案；"sqlite"：DATA_DIR/contextgraph.db（見 tools/sqlite_backend.py）
+STORAGE_BACKEND: str = os.environ.get("MINI_CONTEXT_GRAPH_BACKEND", "json").strip().lower()
+SQLITE_PATH = DATA_DIR / "contextgraph.db"
+
 MAX_GRAPH_DEPTH: int = 2
 MIN_CONFIDENCE: float = 0.6
 MAX_NODES: int = 50
@@ -13,12 +13,14 @@ contextgraph.py — 內容圖形技能 (Context Graph Skill) 的主要介面。
 from __future__ import annotations
 
 import sys
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 import config
-from tools import graph_store, index_store, ontology_store, retrieval_engine, documents_store
+from tools import graph_store, index_store, ontology_store, retrieval_engine, documents_store, storage
 
 
 class ContextGraphSkill:
@@ -40,6 +42,7 @@ class ContextGraphSkill:
              - source_id = graph_store.find_node_by_name(relation["source"])
              - target_id = graph_store.find_node_by_name(relation["target"])
              - graph_store.add_edge(source_id, target_id, relation["type"], relation["confidence"])
+          6. 將步驟 4–5 包在 `with skill.batch():` 中，讓每個儲存檔案只寫入一次。
 
         此方法不會呼叫任何 LLM。它僅用於記載代理程式合約。
         """
@@ -74,6 +77,20 @@ class ContextGraphSkill:
         )
         return graph_store.get_subgraph(node_ids)
 
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        批次寫入工作階段。區塊內所有 graph/index/ontology/documents 變更
+        都保留在記憶體中，離開時每個儲存檔案只寫入一次；
+        若區塊內發生例外則全部回滾。
+
+            with skill.batch():
+                for doc in docs:
+                    skill.ingest_with_content(**doc)
+        """
+        with storage.batch():
+            yield
+
     # ------------------------------------------------------------------
     # 便利包裝函式 — 代理程式可直接呼叫這些
     # ------------------------------------------------------------------
@@ -136,7 +153,24 @@ class ContextGraphSkill:
 
         回傳：
             摘要字典：{doc_id, chunk_count, nodes_added, edges_added}
+
+        整個引入在單一批次工作階段中執行：每個儲存檔案只寫入一次，
+        中途失敗不會留下寫了一半的文件或圖形。
         """
+        with self.batch():
+            return self._ingest_with_content(
+                doc_id, title, source, raw_content, entities, relations
+            )
+
+    def _ingest_with_content(
+        self,
+        doc_id: str,
+        title: str,
+        source: str,
+        raw_content: str,
+        entities: list[dict],
+        relations: list[dict],
+    ) -> dict:
         # 步驟 1：儲存原始文件並自動區塊化
         doc = documents_store.add_document(doc_id, title, source, raw_content)
         chunks = doc["chunks"]
@@ -256,24 +290,32 @@ class ContextGraphSkill:
                     docs_chunks[doc_id].append(edge["chunk_id"])
 
         # 從 documents_store 解析區塊文字
+        # 一次批次讀取所有被引用的區塊
+        chunks = documents_store.get_chunks(
+            [cid for chunk_ids in docs_chunks.values() for cid in chunk_ids]
+        )
+        doc_titles = {chunk["doc_id"]: chunk["doc_title"] for chunk in chunks.values()}
+
         supporting_documents = []
         for doc_id, chunk_ids in docs_chunks.items():
-            doc = documents_store.get_document(doc_id)
-            if doc is None:
-                continue
+            if doc_id not in doc_titles:
+                doc = documents_store.get_document(doc_id)
+                if doc is None:
+                    continue
+                doc_titles[doc_id] = doc["title"]
             seen = set()
             chunks_out = []
             for cid in chunk_ids:
                 if cid in seen:
                     continue
                 seen.add(cid)
-                chunk = documents_store.get_chunk(cid)
+                chunk = chunks.get(cid)
                 if chunk:
                     chunks_out.append({"chunk_id": cid, "text": chunk["text"]})
             if chunks_out:
                 supporting_documents.append({
                     "doc_id": doc_id,
-                    "doc_title": doc["title"],
+                    "doc_title": doc_titles[doc_id],
                     "supporting_chunks": chunks_out,
                 })
 
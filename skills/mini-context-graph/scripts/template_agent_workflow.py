@@ -64,45 +64,47 @@ def ingest_document(skill: ContextGraphSkill, document: str) -> dict:
     errors = []
     added_nodes = {}
 
-    for entity in extraction_result["entities"]:
-        try:
-            node_id = skill.add_node(entity["name"], entity["type"])
-            added_nodes[entity["name"]] = node_id
-            print(f"  ✓ 已新增節點：{entity['name']} (id: {node_id}, 類型：{entity['type']})")
-        except Exception as e:
-            errors.append(f"無法新增節點 {entity['name']}：{e}")
-            print(f"  ✗ 新增節點時發生錯誤 {entity['name']}：{e}")
-
-    for relation in extraction_result["relations"]:
-        # 驗證兩個端點是否存在
-        if relation["source"] not in added_nodes or relation["target"] not in added_nodes:
-            error_msg = f"無法新增邊緣：來源或目標缺失"
-            errors.append(error_msg)
-            print(f"  ✗ 跳過邊緣 {relation['source']} → {relation['target']}：{error_msg}")
-            continue
-
-        # 驗證信賴度門檻值
-        if relation["confidence"] < 0.6:
-            error_msg = f"信賴度 {relation['confidence']} < 0.6（最低門檻值）"
-            errors.append(error_msg)
-            print(f"  ✗ 跳過邊緣 {relation['source']} → {relation['target']}：{error_msg}")
-            continue
-
-        try:
-            skill.add_edge(
-                source_name=relation["source"],
-                target_name=relation["target"],
-                relation=relation["type"],
-                confidence=relation["confidence"],
-            )
-            print(
-                f"  ✓ 已新增邊緣：{relation['source']} "
-                f"--[{relation['type']}]→ {relation['target']} "
-                f"(信賴度：{relation['confidence']})"
-            )
-        except Exception as e:
-            errors.append(f"無法新增邊緣 {relation['source']} → {relation['target']}：{e}")
-            print(f"  ✗ 新增邊緣時發生錯誤：{e}")
+    # 以批次寫入工作階段包住所有持久化呼叫：每個儲存檔案只寫入一次
+    with skill.batch():
+        for entity in extraction_result["entities"]:
+            try:
+                node_id = skill.add_node(entity["name"], entity["type"])
+                added_nodes[entity["name"]] = node_id
+                print(f"  ✓ 已新增節點：{entity['name']} (id: {node_id}, 類型：{entity['type']})")
+            except Exception as e:
+                errors.append(f"無法新增節點 {entity['name']}：{e}")
+                print(f"  ✗ 新增節點時發生錯誤 {entity['name']}：{e}")
+
+        for relation in extraction_result["relations"]:
+            # 驗證兩個端點是否存在
+            if relation["source"] not in added_nodes or relation["target"] not in added_nodes:
+                error_msg = f"無法新增邊緣：來源或目標缺失"
+                errors.append(error_msg)
+                print(f"  ✗ 跳過邊緣 {relation['source']} → {relation['target']}：{error_msg}")
+                continue
+
+            # 驗證信賴度門檻值
+            if relation["confidence"] < 0.6:
+                error_msg = f"信賴度 {relation['confidence']} < 0.6（最低門檻值）"
+                errors.append(error_msg)
+                print(f"  ✗ 跳過邊緣 {relation['source']} → {relation['target']}：{error_msg}")
+                continue
+
+            try:
+                skill.add_edge(
+                    source_name=relation["source"],
+                    target_name=relation["target"],
+                    relation=relation["type"],
+                    confidence=relation["confidence"],
+                )
+                print(
+                    f"  ✓ 已新增邊緣：{relation['source']} "
+                    f"--[{relation['type']}]→ {relation['target']} "
+                    f"(信賴度：{relation['confidence']})"
+                )
+            except Exception as e:
+                errors.append(f"無法新增邊緣 {relation['source']} → {relation['target']}：{e}")
+                print(f"  ✗ 新增邊緣時發生錯誤：{e}")
 
     return {
         "success": len(errors) == 0,
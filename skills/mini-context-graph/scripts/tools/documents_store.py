@@ -7,28 +7,40 @@ documents_store.py — 原始文件與區塊的持久化儲存（RAG 層）。
 處理：
 - 儲存帶有 Metadata 的原始文件
 - 將文件拆分為重疊的文字視窗（區塊化）
-- 透過 ID 或關鍵字搜尋檢索區塊
-- 持久化至 data/documents.json
+- 串流引入大型檔案：增量區塊化，原始內容以參照方式儲存而不重複複製
+- 透過 ID 以 O(1) 檢索區塊（chunk_id → 位置索引），或批次檢索多個區塊
+- 關鍵字搜尋區塊（BM25，基於新增文件時增量維護的倒排索引）
+- 持久化至 data/documents.json（或 SQLite 後端的 documents/chunks 資料表）
 """
 from __future__ import annotations
 
-import json
+import heapq
+import math
 import os
 import re
 import sys
 import uuid
+from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterable, Iterator
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
+from tools import sqlite_backend, storage
 
 _DATA_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_DATA_DIR", str(config.DATA_DIR)))
 _DOCS_FILE = _DATA_DIR / "documents.json"
+_FILE = storage.JsonFile(_DOCS_FILE, lambda: {"documents": {}})
 
 _CHUNK_SIZE = 500       # 每個區塊的字元數
 _CHUNK_OVERLAP = 100    # 連續區塊之間的重疊字元數
 
+_STREAM_BLOCK = 1 << 20  # 串流讀取時每次讀取的字元數
+
+_BM25_K1 = 1.5          # 詞頻飽和參數
+_BM25_B = 0.75          # 區塊長度正規化參數
+
 _STOPWORDS = frozenset([
     "a", "an", "the", "is", "are", "was", "were", "be", "been", "being",
     "have", "has", "had", "do", "does", "did", "will", "would", "could",
@@ -40,16 +52,11 @@ _STOPWORDS = frozenset([
 
 
 def _load() -> dict:
-    if _DOCS_FILE.exists():
-        with open(_DOCS_FILE, "r") as f:
-            return json.load(f)
-    return {"documents": {}}
+    return _FILE.load()
 
 
-def _save(store: dict) -> None:
-    _DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(_DOCS_FILE, "w") as f:
-        json.dump(store, f, indent=2)
+def _save(data: dict) -> None:
+    _FILE.save(data)
 
 
 def _tokenize(text: str) -> list[str]:
@@ -57,17 +64,130 @@ def _tokenize(text: str) -> list[str]:
     return [t for t in tokens if t not in _STOPWORDS and len(t) > 1]
 
 
+def _term_frequencies(text: str) -> Counter:
+    return Counter(_tokenize(text))
+
+
+def _empty_search_index() -> dict:
+    # postings: 權杖 → {chunk_id: 詞頻}
+    # chunks:   chunk_id → [doc_id, index, 權杖長度]；同時作為 get_chunk 的位置索引
+    return {"postings": {}, "chunks": {}, "total_length": 0}
+
+
+def _index_document(index: dict, doc: dict) -> None:
+    """將文件的區塊加入倒排索引（就地修改）。"""
+    postings = index["postings"]
+    for chunk in doc["chunks"]:
+        tf = _term_frequencies(chunk["text"])
+        length = sum(tf.values())
+        index["chunks"][chunk["chunk_id"]] = [doc["id"], chunk["index"], length]
+        index["total_length"] += length
+        for token, count in tf.items():
+            postings.setdefault(token, {})[chunk["chunk_id"]] = count
+
+
+def _search_index(store: dict) -> dict:
+    """回傳 documents.json 中的倒排索引；舊版檔案缺少索引時會於記憶體中重建。"""
+    index = store.get("search_index")
+    if index is None:
+        index = _empty_search_index()
+        for doc in store["documents"].values():
+            _index_document(index, doc)
+        # 下次儲存時會一併持久化
+        store["search_index"] = index
+    return index
+
+
+def _bm25_top_k(
+    postings: dict[str, list[tuple[str, int, int]]],
+    n_chunks: int,
+    total_length: int,
+    top_k: int,
+) -> list[tuple[float, str]]:
+    """
+    只走訪查詢權杖的 postings 計算 BM25，並以堆積選出前 top_k 個 (score, chunk_id)。
+
+    postings: 權杖 → [(chunk_id, 詞頻, 區塊權杖長度), ...]
+    """
+    if not n_chunks:
+        return []
+    avgdl = total_length / n_chunks or 1.0
+    scores: dict[str, float] = {}
+    for entries in postings.values():
+        df = len(entries)
+        idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+        for chunk_id, tf, length in entries:
+            norm = tf + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / avgdl)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (_BM25_K1 + 1) / norm
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    return [(score, chunk_id) for chunk_id, score in best]
+
+
+def _iter_chunks(
+    parts: Iterable[str],
+    chunk_size: int = _CHUNK_SIZE,
+    overlap: int = _CHUNK_OVERLAP,
+) -> Iterator[tuple[int, str]]:
+    """
+    從文字片段串流中增量產生 (offset, text) 區塊。
+
+    與對完整內容呼叫 _chunk_text 的結果完全相同，但只保留尚未切完的
+    尾端文字於記憶體中。offset 是區塊視窗在原始內容中的起始字元位置。
+    """
+    step = chunk_size - overlap
+    buf = ""
+    base = 0  # buf[0] 在原始內容中的位置
+    for part in parts:
+        if not part:
+            continue
+        buf += part
+        pos = 0
+        # 只有確定後面還有內容時才切出完整視窗；最後一個視窗留到串流結束
+        while len(buf) - pos > chunk_size:
+            text = buf[pos:pos + chunk_size].strip()
+            if text:
+                yield base + pos, text
+            pos += step
+        buf = buf[pos:]
+        base += pos
+    text = buf.strip()
+    if text:
+        yield base, text
+
+
 def _chunk_text(content: str, chunk_size: int = _CHUNK_SIZE, overlap: int = _CHUNK_OVERLAP) -> list[str]:
     """將內容拆分為重疊的字元視窗。"""
+    return [text for _, text in _iter_chunks([content], chunk_size, overlap)]
+
+
+def _read_blocks(path: Path, encoding: str) -> Iterator[str]:
+    with open(path, "r", encoding=encoding) as f:
+        while True:
+            block = f.read(_STREAM_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+def _build_document(doc_id: str, title: str, source: str, content: str) -> dict:
+    """建立文件記錄並將內容切分為區塊。"""
+    raw_chunks = _chunk_text(content)
     chunks = []
-    start = 0
-    while start < len(content):
-        end = start + chunk_size
-        chunks.append(content[start:end].strip())
-        if end >= len(content):
-            break
-        start += chunk_size - overlap
-    return [c for c in chunks if c]
+    for i, text in enumerate(raw_chunks):
+        chunks.append({
+            "chunk_id": f"{doc_id}_chunk_{i:03d}",
+            "index": i,
+            "text": text,
+        })
+
+    return {
+        "id": doc_id,
+        "title": title,
+        "source": source,
+        "content": content,
+        "chunks": chunks,
+        "ingestion_date": datetime.now(timezone.utc).isoformat(),
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -92,52 +212,224 @@ def add_document(
     回傳：
         儲存的文件字典，包含產生的 chunk_ids。
     """
+    if storage.is_sqlite():
+        with storage.batch():
+            existing = sqlite_backend.documents_get(doc_id)
+            if existing is not None:
+                return existing
+            doc = _build_document(doc_id, title, source, content)
+            sqlite_backend.documents_insert(doc)
+            sqlite_backend.documents_add_chunks(
+                doc_id, doc["chunks"], [_term_frequencies(chunk["text"]) for chunk in doc["chunks"]]
+            )
+        return doc
+
     store = _load()
 
     # 冪等：如果文件已儲存則回傳現有文件
     if doc_id in store["documents"]:
         return store["documents"][doc_id]
 
-    raw_chunks = _chunk_text(content)
-    chunks = []
-    for i, text in enumerate(raw_chunks):
-        chunks.append({
-            "chunk_id": f"{doc_id}_chunk_{i:03d}",
-            "index": i,
-            "text": text,
-        })
+    doc = _build_document(doc_id, title, source, content)
+    index = _search_index(store)
+    store["documents"][doc_id] = doc
+    _index_document(index, doc)
+    _save(store)
+    return doc
+
+
+def add_document_stream(
+    doc_id: str,
+    title: str,
+    stream: str | Path | Iterable[str],
+    source: str | None = None,
+    store_content: str | None = None,
+    encoding: str = "utf-8",
+) -> dict:
+    """
+    以串流方式儲存大型文件：邊讀邊區塊化，不需將完整內容載入為單一字串。
+
+    區塊的大小/重疊語意與 add_document 相同，且每個區塊額外記錄 `offset`
+    （區塊視窗在原始內容中的起始字元位置）。
+
+    參數：
+        doc_id:        穩定的文件識別碼。
+        title:         人類可讀的標題。
+        stream:        檔案路徑，或產生文字片段的可迭代物件。
+        source:        來源路徑/URL；stream 為檔案路徑時預設為該路徑。
+        store_content: "reference" — 不複製原始內容，只記錄
+                       content_ref = {"source", "chars"}，之後可透過 iter_content
+                       從來源檔案讀回；僅限 stream 為既有的檔案路徑；
+                       "inline" — 與 add_document 相同，將完整內容存入 content；
+                       None（預設）— 檔案路徑使用 "reference"，可迭代物件使用 "inline"
+                       （其內容無法事後重新讀取）。
+        encoding:      讀取檔案時使用的編碼。
+
+    回傳：
+        文件摘要：{id, title, source, chunk_count, content_ref, ingestion_date}
+        （不含區塊文字，避免再次將整份文件留在記憶體中）。
+    """
+    if store_content not in (None, "reference", "inline"):
+        raise ValueError(f"store_content 必須為 'reference' 或 'inline'，而非 {store_content!r}")
+    if isinstance(stream, (str, Path)):
+        path = Path(stream)
+        if not path.is_file():
+            raise FileNotFoundError(f"找不到檔案：{path}")
+        source = source or str(path)
+        parts: Iterable[str] = _read_blocks(path, encoding)
+        store_content = store_content or "reference"
+    else:
+        if source is None:
+            raise ValueError("以可迭代物件串流時必須提供 source")
+        if store_content == "reference":
+            raise ValueError("store_content='reference' 僅適用於檔案路徑；可迭代物件的內容無法事後讀回")
+        store_content = "inline"
+        parts = stream
+
+    inline: list[str] = []
+    counted = [0]
+
+    def _tee(pieces: Iterable[str]) -> Iterator[str]:
+        for piece in pieces:
+            counted[0] += len(piece)
+            if store_content == "inline":
+                inline.append(piece)
+            yield piece
+
+    def _chunk_records() -> Iterator[dict]:
+        for i, (offset, text) in enumerate(_iter_chunks(_tee(parts))):
+            yield {"chunk_id": f"{doc_id}_chunk_{i:03d}", "index": i, "text": text, "offset": offset}
 
     doc = {
         "id": doc_id,
         "title": title,
         "source": source,
-        "content": content,
-        "chunks": chunks,
+        "content": None,
+        "content_ref": None,
         "ingestion_date": datetime.now(timezone.utc).isoformat(),
     }
+
+    def _finish_content() -> None:
+        if store_content == "inline":
+            doc["content"] = "".join(inline)
+        else:
+            # iter_content 以 content_ref["source"] 重新開啟檔案，因此記錄實際路徑而非顯示用的 source
+            doc["content_ref"] = {"source": str(path.resolve()), "chars": counted[0]}
+
+    if storage.is_sqlite():
+        with storage.batch():
+            existing = sqlite_backend.documents_summary(doc_id)
+            if existing is not None:
+                return existing
+            sqlite_backend.documents_insert({**doc, "content": ""})
+            chunk_count = 0
+            pending: list[dict] = []
+            for chunk in _chunk_records():
+                pending.append(chunk)
+                if len(pending) >= 500:
+                    sqlite_backend.documents_add_chunks(
+                        doc_id, pending, [_term_frequencies(c["text"]) for c in pending]
+                    )
+                    chunk_count += len(pending)
+                    pending = []
+            sqlite_backend.documents_add_chunks(
+                doc_id, pending, [_term_frequencies(c["text"]) for c in pending]
+            )
+            chunk_count += len(pending)
+            _finish_content()
+            sqlite_backend.documents_set_content(doc_id, doc["content"] or "", doc["content_ref"])
+        return _summary(doc, chunk_count)
+
+    store = _load()
+    if doc_id in store["documents"]:
+        existing = store["documents"][doc_id]
+        return _summary(existing, len(existing["chunks"]))
+
+    doc["chunks"] = list(_chunk_records())
+    _finish_content()
+    index = _search_index(store)
     store["documents"][doc_id] = doc
+    _index_document(index, doc)
     _save(store)
-    return doc
+    return _summary(doc, len(doc["chunks"]))
+
+
+def _summary(doc: dict, chunk_count: int) -> dict:
+    return {
+        "id": doc["id"],
+        "title": doc["title"],
+        "source": doc["source"],
+        "chunk_count": chunk_count,
+        "content_ref": doc.get("content_ref"),
+        "ingestion_date": doc["ingestion_date"],
+    }
+
+
+def iter_content(doc_id: str, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    以區塊串流方式產生文件的原始內容。
+
+    以參照方式儲存的文件（content_ref）會從來源檔案逐塊讀取；
+    行內儲存的文件則直接產生 content。找不到文件時不產生任何內容。
+    """
+    doc = get_document(doc_id)
+    if doc is None:
+        return
+    ref = doc.get("content_ref")
+    if ref:
+        yield from _read_blocks(Path(ref["source"]), encoding)
+    elif doc.get("content"):
+        yield doc["content"]
 
 
 def get_document(doc_id: str) -> dict | None:
     """回傳完整的文件記錄，如果找不到則回傳 None。"""
+    if storage.is_sqlite():
+        return sqlite_backend.documents_get(doc_id)
     store = _load()
     return store["documents"].get(doc_id)
 
 
 def get_chunk(chunk_id: str) -> dict | None:
-    """透過 chunk_id 回傳特定區塊（搜尋所有文件）。"""
+    """透過 chunk_id 回傳特定區塊（透過位置索引直接定位，不掃描文件）。"""
+    if storage.is_sqlite():
+        return sqlite_backend.documents_get_chunk(chunk_id)
     store = _load()
-    for doc in store["documents"].values():
-        for chunk in doc["chunks"]:
-            if chunk["chunk_id"] == chunk_id:
-                return chunk
-    return None
+    location = _search_index(store)["chunks"].get(chunk_id)
+    if location is None:
+        return None
+    doc_id, position, _ = location
+    return store["documents"][doc_id]["chunks"][position]
+
+
+def get_chunks(chunk_ids: list[str]) -> dict[str, dict]:
+    """
+    一次讀取多個區塊。回傳 chunk_id → {chunk_id, index, text, doc_id, doc_title}；
+    找不到的 chunk_id 會被略過。
+    """
+    if storage.is_sqlite():
+        return sqlite_backend.documents_get_chunk_map(list(dict.fromkeys(chunk_ids)))
+    store = _load()
+    locations = _search_index(store)["chunks"]
+    found: dict[str, dict] = {}
+    for chunk_id in chunk_ids:
+        location = locations.get(chunk_id)
+        if location is None or chunk_id in found:
+            continue
+        doc_id, position, _ = location
+        doc = store["documents"][doc_id]
+        found[chunk_id] = {
+            **doc["chunks"][position],
+            "doc_id": doc_id,
+            "doc_title": doc["title"],
+        }
+    return found
 
 
 def get_chunks_for_document(doc_id: str) -> list[dict]:
     """回傳文件的所有區塊。"""
+    if storage.is_sqlite():
+        return sqlite_backend.documents_get_chunks(doc_id)
     doc = get_document(doc_id)
     if doc is None:
         return []
@@ -146,37 +438,49 @@ def get_chunks_for_document(doc_id: str) -> list[dict]:
 
 def search_chunks(query: str, top_k: int = 5) -> list[dict]:
     """
-    對區塊文字進行關鍵字搜尋。回傳按字詞重疊度排序的前 top_k 個匹配區塊
-    （簡單的 TF 風格評分，不需嵌入向量）。
+    對區塊文字進行 BM25 關鍵字搜尋。回傳分數最高的前 top_k 個區塊
+    （不需嵌入向量）。只會走訪查詢權杖的 postings，
+    成本與匹配的區塊數成正比，而非整個語料庫。
 
-    回傳字典列表，包含鍵：chunk_id、doc_id、score、text。
+    回傳字典列表，包含鍵：chunk_id、doc_id、doc_title、score、text。
     """
-    store = _load()
-    query_tokens = set(_tokenize(query))
-    if not query_tokens:
+    query_tokens = list(dict.fromkeys(_tokenize(query)))
+    if not query_tokens or top_k <= 0:
         return []
 
-    scored: list[tuple[float, dict]] = []
-    for doc in store["documents"].values():
-        for chunk in doc["chunks"]:
-            chunk_tokens = set(_tokenize(chunk["text"]))
-            overlap = len(query_tokens & chunk_tokens)
-            if overlap > 0:
-                score = overlap / len(query_tokens)
-                scored.append((score, {
-                    "chunk_id": chunk["chunk_id"],
-                    "doc_id": doc["id"],
-                    "doc_title": doc["title"],
-                    "score": round(score, 4),
-                    "text": chunk["text"],
-                }))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [item for _, item in scored[:top_k]]
+    if storage.is_sqlite():
+        sqlite_backend.documents_ensure_search_index(_term_frequencies)
+        n_chunks, total_length = sqlite_backend.search_totals()
+        postings = sqlite_backend.search_postings(query_tokens)
+        best = _bm25_top_k(postings, n_chunks, total_length, top_k)
+    else:
+        store = _load()
+        index = _search_index(store)
+        chunk_meta = index["chunks"]
+        postings = {
+            token: [(cid, tf, chunk_meta[cid][2]) for cid, tf in index["postings"][token].items()]
+            for token in query_tokens
+            if token in index["postings"]
+        }
+        best = _bm25_top_k(postings, len(chunk_meta), index["total_length"], top_k)
+
+    hits = get_chunks([chunk_id for _, chunk_id in best])
+    return [
+        {
+            "chunk_id": chunk_id,
+            "doc_id": hits[chunk_id]["doc_id"],
+            "doc_title": hits[chunk_id]["doc_title"],
+            "score": round(score, 4),
+            "text": hits[chunk_id]["text"],
+        }
+        for score, chunk_id in best
+    ]
 
 
 def list_documents() -> list[dict]:
     """回傳所有已儲存文件的摘要列表（無內容，無區塊）。"""
+    if storage.is_sqlite():
+        return sqlite_backend.documents_list()
     store = _load()
     return [
         {
@@ -6,10 +6,18 @@ graph_store.py — 圖形節點與邊緣的持久化儲存。
 - 新增帶有信賴度的邊緣
 - 獲取鄰居節點
 - 持久化至 graph.json
+
+圖形在程序內只載入一次，並保留依信賴度排序的正向/反向鄰接串列，
+以及 名稱 → node_id 與 (來源, 目標, 關聯) → 邊緣位置 的雜湊索引，
+讓去重疊查詢為 O(1)。新增節點/邊緣時索引會就地更新；
+當 graph.json 的 mtime 改變時（例如其他程序寫入）快照會自動失效。
+在 storage.batch() 中，所有寫入都延遲到提交時才一次寫入。
+
+當 config.STORAGE_BACKEND 為 "sqlite" 時，所有操作改由 sqlite_backend 的
+nodes/edges 資料表處理。
 """
 from __future__ import annotations
 
-import json
 import os
 import sys
 import uuid
@@ -17,22 +25,163 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
+from tools import sqlite_backend, storage
 
 _DATA_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_DATA_DIR", str(config.DATA_DIR)))
 _GRAPH_FILE = _DATA_DIR / "graph.json"
+_FILE = storage.JsonFile(_GRAPH_FILE, lambda: {"nodes": {}, "edges": []})
+
+
+class GraphSnapshot:
+    """
+    graph.json 的常駐記憶體快照。
+
+    鄰接串列在首次需要時建立：每個節點對應一個依信賴度遞減排序的
+    (confidence, neighbor_id, edge_position) 列表，因此 min_confidence 過濾
+    只需掃描到第一個低於門檻的項目即可停止。
+    """
+
+    def __init__(self, graph: dict, version: int) -> None:
+        self.graph = graph
+        self.version = version
+        self._out: dict[str, list[tuple[float, str, int]]] | None = None
+        self._in: dict[str, list[tuple[float, str, int]]] | None = None
+        self._by_name: dict[str, str] | None = None
+        self._edge_pos: dict[tuple[str, str, str], int] | None = None
+
+    # -- 雜湊索引 ---------------------------------------------------------
+
+    def find_node(self, name_lower: str) -> str | None:
+        if self._by_name is None:
+            by_name: dict[str, str] = {}
+            for node_id, node in self.graph["nodes"].items():
+                by_name.setdefault(node["name"], node_id)
+            self._by_name = by_name
+        return self._by_name.get(name_lower)
+
+    def find_edge(self, source_id: str, target_id: str, relation: str) -> int | None:
+        if self._edge_pos is None:
+            edge_pos: dict[tuple[str, str, str], int] = {}
+            for pos, edge in enumerate(self.graph["edges"]):
+                edge_pos.setdefault((edge["source"], edge["target"], edge["type"]), pos)
+            self._edge_pos = edge_pos
+        return self._edge_pos.get((source_id, target_id, relation))
+
+    def _node_added(self, node_id: str) -> None:
+        if self._by_name is not None:
+            self._by_name.setdefault(self.graph["nodes"][node_id]["name"], node_id)
+
+    def _edge_added(self, pos: int) -> None:
+        edge = self.graph["edges"][pos]
+        if self._edge_pos is not None:
+            self._edge_pos.setdefault((edge["source"], edge["target"], edge["type"]), pos)
+        if self._out is not None:
+            self._out.setdefault(edge["source"], []).append((edge["confidence"], edge["target"], pos))
+            self._in.setdefault(edge["target"], []).append((edge["confidence"], edge["source"], pos))
+            self._resort(edge)
+
+    def _edge_confidence_changed(self, pos: int) -> None:
+        if self._out is None:
+            return
+        edge = self.graph["edges"][pos]
+        for adjacency, key in ((self._out, edge["source"]), (self._in, edge["target"])):
+            adjacency[key] = [
+                (edge["confidence"], nb, p) if p == pos else (conf, nb, p)
+                for conf, nb, p in adjacency[key]
+            ]
+        self._resort(edge)
+
+    def _resort(self, edge: dict) -> None:
+        self._out[edge["source"]].sort(key=lambda item: item[0], reverse=True)
+        self._in[edge["target"]].sort(key=lambda item: item[0], reverse=True)
+
+    # -- 鄰接串列 ---------------------------------------------------------
+
+    def _build(self) -> None:
+        out: dict[str, list[tuple[float, str, int]]] = {}
+        inc: dict[str, list[tuple[float, str, int]]] = {}
+        for pos, edge in enumerate(self.graph["edges"]):
+            conf = edge["confidence"]
+            out.setdefault(edge["source"], []).append((conf, edge["target"], pos))
+            inc.setdefault(edge["target"], []).append((conf, edge["source"], pos))
+        for adjacency in (out, inc):
+            for entries in adjacency.values():
+                entries.sort(key=lambda item: item[0], reverse=True)
+        self._out, self._in = out, inc
+
+    def _adjacency(self, direction: str) -> list[dict[str, list[tuple[float, str, int]]]]:
+        if self._out is None:
+            self._build()
+        if direction == "out":
+            return [self._out]
+        if direction == "in":
+            return [self._in]
+        return [self._out, self._in]
+
+    def iter_adjacent(
+        self,
+        node_id: str,
+        min_confidence: float = 0.0,
+        direction: str = "both",
+    ):
+        """依信賴度遞減產生 (confidence, neighbor_id, edge)；direction 為 "out"、"in" 或 "both"。"""
+        edges = self.graph["edges"]
+        for adjacency in self._adjacency(direction):
+            for conf, neighbor, pos in adjacency.get(node_id, ()):
+                if conf < min_confidence:
+                    break
+                yield conf, neighbor, edges[pos]
+
+    def neighbors(
+        self,
+        node_id: str,
+        min_confidence: float = 0.0,
+        direction: str = "both",
+    ) -> list[str]:
+        seen: dict[str, None] = {}
+        for _, neighbor, _ in self.iter_adjacent(node_id, min_confidence, direction):
+            seen.setdefault(neighbor, None)
+        return list(seen)
+
+    def subgraph(self, node_ids: list[str]) -> dict:
+        node_id_set = set(node_ids)
+        nodes = {nid: self.graph["nodes"][nid] for nid in node_ids if nid in self.graph["nodes"]}
+        positions = sorted(
+            pos
+            for nid in node_id_set
+            for _, target, pos in self._adjacency("out")[0].get(nid, ())
+            if target in node_id_set
+        )
+        edges = [self.graph["edges"][pos] for pos in positions]
+        return {"nodes": nodes, "edges": edges}
+
+
+_snapshot: GraphSnapshot | None = None
+
+
+def snapshot() -> GraphSnapshot | sqlite_backend.SqliteGraph:
+    """
+    回傳目前的圖形快照；僅在圖形被儲存或 graph.json 於磁碟上變更時才重建。
+
+    SQLite 後端下回傳具有相同介面、直接查詢資料庫索引的 SqliteGraph。
+    """
+    global _snapshot
+    if storage.is_sqlite():
+        return sqlite_backend.SqliteGraph()
+    graph = _FILE.load()
+    if _snapshot is None or _snapshot.version != _FILE.version:
+        _snapshot = GraphSnapshot(graph, _FILE.version)
+    return _snapshot
 
 
 def _load() -> dict:
-    if _GRAPH_FILE.exists():
-        with open(_GRAPH_FILE, "r") as f:
-            return json.load(f)
-    return {"nodes": {}, "edges": []}
+    return _FILE.load()
 
 
-def _save(graph: dict) -> None:
-    _DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(_GRAPH_FILE, "w") as f:
-        json.dump(graph, f, indent=2)
+def _save_indexed(snap: GraphSnapshot) -> None:
+    """儲存已就地修改的快照；呼叫者已同步更新其索引，因此不需重建。"""
+    _FILE.save(snap.graph)
+    snap.version = _FILE.version
 
 
 def add_node(
@@ -48,26 +197,38 @@ def add_node(
         source_document: 來自 documents_store 的 doc_id（來源指標）。
         source_chunks:   提及此實體的 chunk_ids 列表。
     """
-    graph = _load()
     name_lower = name.strip().lower()
+    if storage.is_sqlite():
+        with storage.batch():
+            return sqlite_backend.graph_add_node(
+                str(uuid.uuid4())[:8],
+                name_lower,
+                node_type.strip().lower(),
+                source_document,
+                source_chunks,
+            )
+
+    snap = snapshot()
+    graph = snap.graph
 
-    # 去重疊：按標準化名稱搜尋
-    for node_id, node in graph["nodes"].items():
-        if node["name"] == name_lower:
-            # 如果提供了新資訊，則合併來源
-            changed = False
-            if source_document and node.get("source_document") is None:
-                node["source_document"] = source_document
+    # 去重疊：按標準化名稱查詢雜湊索引
+    node_id = snap.find_node(name_lower)
+    if node_id is not None:
+        node = graph["nodes"][node_id]
+        # 如果提供了新資訊，則合併來源
+        changed = False
+        if source_document and node.get("source_document") is None:
+            node["source_document"] = source_document
+            changed = True
+        if source_chunks:
+            existing = set(node.get("source_chunks") or [])
+            merged = list(existing | set(source_chunks))
+            if merged != list(existing):
+                node["source_chunks"] = merged
                 changed = True
-            if source_chunks:
-                existing = set(node.get("source_chunks") or [])
-                merged = list(existing | set(source_chunks))
-                if merged != list(existing):
-                    node["source_chunks"] = merged
-                    changed = True
-            if changed:
-                _save(graph)
-            return node_id
+        if changed:
+            _save_indexed(snap)
+        return node_id
 
     node_id = str(uuid.uuid4())[:8]
     graph["nodes"][node_id] = {
@@ -76,7 +237,8 @@ def add_node(
         "source_document": source_document,
         "source_chunks": source_chunks or [],
     }
-    _save(graph)
+    snap._node_added(node_id)
+    _save_indexed(snap)
     return node_id
 
 
@@ -97,32 +259,43 @@ def add_edge(
         supporting_text:  支持此關聯的確切文字片段。
         chunk_id:         支持文字來源的特定 chunk_id。
     """
-    graph = _load()
+    relation_lower = relation.strip().lower()
+    if storage.is_sqlite():
+        sqlite_backend.graph_add_edge({
+            "source": source_id,
+            "target": target_id,
+            "type": relation_lower,
+            "confidence": confidence,
+            "source_document": source_document,
+            "supporting_text": supporting_text,
+            "chunk_id": chunk_id,
+        })
+        return
+
+    snap = snapshot()
+    graph = snap.graph
 
     # 透過 來源 + 目標 + 關聯 去重疊邊緣
-    relation_lower = relation.strip().lower()
-    for edge in graph["edges"]:
-        if (
-            edge["source"] == source_id
-            and edge["target"] == target_id
-            and edge["type"] == relation_lower
-        ):
-            changed = False
-            if confidence > edge["confidence"]:
-                edge["confidence"] = confidence
-                changed = True
-            if source_document and edge.get("source_document") is None:
-                edge["source_document"] = source_document
-                changed = True
-            if supporting_text and edge.get("supporting_text") is None:
-                edge["supporting_text"] = supporting_text
-                changed = True
-            if chunk_id and edge.get("chunk_id") is None:
-                edge["chunk_id"] = chunk_id
-                changed = True
-            if changed:
-                _save(graph)
-            return
+    pos = snap.find_edge(source_id, target_id, relation_lower)
+    if pos is not None:
+        edge = graph["edges"][pos]
+        changed = False
+        if confidence > edge["confidence"]:
+            edge["confidence"] = confidence
+            snap._edge_confidence_changed(pos)
+            changed = True
+        if source_document and edge.get("source_document") is None:
+            edge["source_document"] = source_document
+            changed = True
+        if supporting_text and edge.get("supporting_text") is None:
+            edge["supporting_text"] = supporting_text
+            changed = True
+        if chunk_id and edge.get("chunk_id") is None:
+            edge["chunk_id"] = chunk_id
+            changed = True
+        if changed:
+            _save_indexed(snap)
+        return
 
     graph["edges"].append({
         "source": source_id,
@@ -133,69 +306,56 @@ def add_edge(
         "supporting_text": supporting_text,
         "chunk_id": chunk_id,
     })
-    _save(graph)
+    snap._edge_added(len(graph["edges"]) - 1)
+    _save_indexed(snap)
 
 
 def get_neighbors(node_id: str, min_confidence: float = 0.0) -> list[str]:
     """回傳從 node_id 可到達的所有鄰居節點的 node_ids。"""
-    graph = _load()
-    neighbors = []
-    for edge in graph["edges"]:
-        if edge["confidence"] < min_confidence:
-            continue
-        if edge["source"] == node_id:
-            neighbors.append(edge["target"])
-        elif edge["target"] == node_id:
-            neighbors.append(edge["source"])
-    return list(set(neighbors))
+    return snapshot().neighbors(node_id, min_confidence=min_confidence)
 
 
 def get_node(node_id: str) -> dict | None:
     """透過 ID 獲取單個節點。"""
+    if storage.is_sqlite():
+        return sqlite_backend.graph_get_node(node_id)
     graph = _load()
     return graph["nodes"].get(node_id)
 
 
 def get_subgraph(node_ids: list[str]) -> dict:
     """回傳由給定 node_ids 誘導的節點與邊緣。"""
-    graph = _load()
-    node_id_set = set(node_ids)
-
-    nodes = {nid: graph["nodes"][nid] for nid in node_ids if nid in graph["nodes"]}
-    edges = [
-        e
-        for e in graph["edges"]
-        if e["source"] in node_id_set and e["target"] in node_id_set
-    ]
-    return {"nodes": nodes, "edges": edges}
+    return snapshot().subgraph(node_ids)
 
 
 def find_node_by_name(name: str) -> str | None:
     """回傳給定標準化名稱的 node_id，或回傳 None。"""
-    graph = _load()
     name_lower = name.strip().lower()
-    for node_id, node in graph["nodes"].items():
-        if node["name"] == name_lower:
-            return node_id
-    return None
+    if storage.is_sqlite():
+        return sqlite_backend.graph_find_node(name_lower)
+    return snapshot().find_node(name_lower)
 
 
 def link_node_to_source(node_id: str, doc_id: str, chunk_ids: list[str]) -> None:
     """將來源資訊 (doc_id + chunk_ids) 附加到現有節點。"""
-    graph = _load()
+    if storage.is_sqlite():
+        with storage.batch():
+            sqlite_backend.graph_set_node_sources(node_id, doc_id, chunk_ids)
+        return
+    snap = snapshot()
+    graph = snap.graph
     if node_id not in graph["nodes"]:
         return
     node = graph["nodes"][node_id]
     node["source_document"] = doc_id
     existing = set(node.get("source_chunks") or [])
     node["source_chunks"] = list(existing | set(chunk_ids))
-    _save(graph)
+    _save_indexed(snap)
 
 
 def get_node_sources(node_id: str) -> dict:
     """回傳節點的來源資訊 (source_document + source_chunks)。"""
-    graph = _load()
-    node = graph["nodes"].get(node_id, {})
+    node = get_node(node_id) or {}
     return {
         "source_document": node.get("source_document"),
         "source_chunks": node.get("source_chunks", []),
@@ -8,7 +8,6 @@ index_store.py — 維護實體與關鍵字索引，用於快速查閱。
 """
 from __future__ import annotations
 
-import json
 import os
 import re
 import sys
@@ -16,9 +15,11 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
+from tools import sqlite_backend, storage
 
 _DATA_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_DATA_DIR", str(config.DATA_DIR)))
 _INDEX_FILE = _DATA_DIR / "index.json"
+_FILE = storage.JsonFile(_INDEX_FILE, lambda: {"entity_index": {}, "keyword_index": {}})
 
 _STOPWORDS = frozenset(
     [
@@ -33,16 +34,11 @@ _STOPWORDS = frozenset(
 
 
 def _load() -> dict:
-    if _INDEX_FILE.exists():
-        with open(_INDEX_FILE, "r") as f:
-            return json.load(f)
-    return {"entity_index": {}, "keyword_index": {}}
+    return _FILE.load()
 
 
-def _save(index: dict) -> None:
-    _DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(_INDEX_FILE, "w") as f:
-        json.dump(index, f, indent=2)
+def _save(data: dict) -> None:
+    _FILE.save(data)
 
 
 def _tokenize(text: str) -> list[str]:
@@ -53,8 +49,13 @@ def _tokenize(text: str) -> list[str]:
 
 def add_entity(name: str, node_id: str) -> None:
     """在實體與關鍵字索引中註冊 實體名稱 → node_id。"""
-    index = _load()
     name_lower = name.strip().lower()
+    if storage.is_sqlite():
+        with storage.batch():
+            sqlite_backend.index_add_entity(name_lower, _tokenize(name_lower), node_id)
+        return
+
+    index = _load()
 
     # 實體索引
     if name_lower not in index["entity_index"]:
@@ -74,8 +75,11 @@ def add_entity(name: str, node_id: str) -> None:
 
 def search(query: str) -> list[str]:
     """透過實體名稱或關鍵字搜尋與查詢匹配的 node_ids。"""
-    index = _load()
     query_lower = query.strip().lower()
+    if storage.is_sqlite():
+        return sqlite_backend.index_search(query_lower, _tokenize(query_lower))
+
+    index = _load()
     matched_ids: set[str] = set()
 
     # 精確匹配實體名稱
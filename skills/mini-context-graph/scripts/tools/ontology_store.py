@@ -9,16 +9,17 @@ ontology_store.py — 追蹤實體類型與關聯類型。
 注意：此處沒有 LLM 邏輯。標準化是基於規則的（小寫 + 同義詞映射）。
 """
 
-import json
 import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
+from tools import sqlite_backend, storage
 
 _DATA_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_DATA_DIR", str(config.DATA_DIR)))
 _ONTOLOGY_FILE = _DATA_DIR / "ontology.json"
+_FILE = storage.JsonFile(_ONTOLOGY_FILE, lambda: {"entity_types": {}, "relation_types": {}})
 
 # 同義詞映射 — 小寫變體映射至規範形式
 _ENTITY_TYPE_MAP: dict[str, str] = {
@@ -125,16 +126,11 @@ _RELATION_TYPE_MAP: dict[str, str] = {
 
 
 def _load() -> dict:
-    if _ONTOLOGY_FILE.exists():
-        with open(_ONTOLOGY_FILE, "r") as f:
-            return json.load(f)
-    return {"entity_types": {}, "relation_types": {}}
+    return _FILE.load()
 
 
-def _save(ontology: dict) -> None:
-    _DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(_ONTOLOGY_FILE, "w") as f:
-        json.dump(ontology, f, indent=2)
+def _save(data: dict) -> None:
+    _FILE.save(data)
 
 
 def normalize_type(type_name: str) -> str:
@@ -151,25 +147,35 @@ def normalize_relation(relation_name: str) -> str:
 
 def add_type(type_name: str) -> None:
     """註冊實體類型，增加其使用次數。"""
-    ontology = _load()
     canonical = normalize_type(type_name)
+    if storage.is_sqlite():
+        sqlite_backend.ontology_increment("entity_types", canonical)
+        return
+    ontology = _load()
     ontology["entity_types"][canonical] = ontology["entity_types"].get(canonical, 0) + 1
     _save(ontology)
 
 
 def add_relation(relation_name: str) -> None:
     """註冊關聯類型，增加其使用次數。"""
-    ontology = _load()
     canonical = normalize_relation(relation_name)
+    if storage.is_sqlite():
+        sqlite_backend.ontology_increment("relation_types", canonical)
+        return
+    ontology = _load()
     ontology["relation_types"][canonical] = ontology["relation_types"].get(canonical, 0) + 1
     _save(ontology)
 
 
 def get_all_types() -> dict[str, int]:
     """回傳所有已註冊的實體類型及其計數。"""
+    if storage.is_sqlite():
+        return sqlite_backend.ontology_counts("entity_types")
     return _load()["entity_types"]
 
 
 def get_all_relations() -> dict[str, int]:
     """回傳所有已註冊的關聯類型及其計數。"""
+    if storage.is_sqlite():
+        return sqlite_backend.ontology_counts("relation_types")
     return _load()["relation_types"]
@@ -3,32 +3,68 @@ retrieval_engine.py — 基於廣度優先搜尋 (BFS) 的圖形周遊，用於
 
 輸入：種子 node_ids + 深度
 輸出：在周遊深度內，且經過 min_confidence 過濾的 node_ids 列表
+
+周遊模式：
+- retrieve()：              未加權 BFS（預設）
+- retrieve_weighted()：     最佳優先搜尋，路徑分數為沿途邊緣信賴度的乘積，
+                           以優先佇列優先回傳分數最高的 max_nodes 個節點
+- retrieve_bidirectional()：從兩組種子同時擴展，回傳連接兩者的最短路徑上的節點
+
+所有模式皆可用 relation_types 限制只走特定關聯類型，
+且整個周遊都在同一份圖形快照上執行。
 """
 from __future__ import annotations
 
+import heapq
 import sys
 from pathlib import Path
 from collections import deque
+from typing import Iterable, Iterator
 
 # 允許從父套件匯入
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from tools import graph_store
+from tools import graph_store, ontology_store
 import config
 
 
+def _adjacent(
+    graph,
+    node_id: str,
+    min_confidence: float,
+    relation_types: frozenset[str] | None,
+) -> Iterator[tuple[float, str]]:
+    """依信賴度遞減產生 (confidence, neighbor_id)，並套用關聯類型過濾。"""
+    for conf, neighbor, edge in graph.iter_adjacent(node_id, min_confidence):
+        if relation_types is None or edge["type"] in relation_types:
+            yield conf, neighbor
+
+
+def _relation_filter(relation_types: Iterable[str] | None) -> frozenset[str] | None:
+    """以與寫入時相同的規範形式 (ontology_store.normalize_relation) 建立關聯類型過濾集合。"""
+    if relation_types is None:
+        return None
+    return frozenset(ontology_store.normalize_relation(r) for r in relation_types)
+
+
 def retrieve(
     seed_node_ids: list[str],
     depth: int = config.MAX_GRAPH_DEPTH,
     min_confidence: float = config.MIN_CONFIDENCE,
     max_nodes: int = config.MAX_NODES,
+    relation_types: Iterable[str] | None = None,
 ) -> list[str]:
     """
     從種子節點開始進行 BFS，最多周遊 `depth` 跳 (hops)。
 
     回傳周遊範圍內的 node_ids 列表（包含種子節點），
     邊緣經過 min_confidence 過濾，且數量上限為 max_nodes。
+    整個周遊使用同一份記憶體內圖形快照，成本與所訪問的鄰域成正比。
+
+    relation_types: 若提供，只周遊這些（規範形式的）關聯類型的邊緣。
     """
+    graph = graph_store.snapshot()
+    relations = _relation_filter(relation_types)
     visited: set[str] = set()
     # 佇列項目：(node_id, current_depth)
     queue: deque[tuple[str, int]] = deque()
@@ -47,8 +83,7 @@ def retrieve(
         if current_depth >= depth:
             continue
 
-        neighbors = graph_store.get_neighbors(node_id, min_confidence=min_confidence)
-        for neighbor in neighbors:
+        for _, neighbor in _adjacent(graph, node_id, min_confidence, relations):
             if neighbor not in visited:
                 visited.add(neighbor)
                 queue.append((neighbor, current_depth + 1))
@@ -56,3 +91,117 @@ def retrieve(
                     break
 
     return list(visited)
+
+
+def retrieve_weighted(
+    seed_node_ids: list[str],
+    depth: int = config.MAX_GRAPH_DEPTH,
+    min_confidence: float = config.MIN_CONFIDENCE,
+    max_nodes: int = config.MAX_NODES,
+    relation_types: Iterable[str] | None = None,
+) -> list[tuple[str, float]]:
+    """
+    最佳優先搜尋：節點分數為從任一種子出發、不超過 `depth` 跳的路徑中，
+    沿途邊緣信賴度乘積的最大值（種子分數為 1.0）。
+
+    由於信賴度不大於 1，分數沿路徑單調不增，因此依分數從優先佇列取出
+    的順序即為最終排名；取滿 max_nodes 個節點即停止，
+    高信賴度路徑不會被低價值的樞紐節點擠掉。
+
+    回傳依分數遞減排序的 [(node_id, score), ...]。
+    """
+    graph = graph_store.snapshot()
+    relations = _relation_filter(relation_types)
+    results: dict[str, float] = {}
+    # 每個節點已展開時的最少跳數；以更少跳數再次到達時仍需展開，以免深度上限截斷較佳路徑
+    expanded_hops: dict[str, int] = {}
+    # 堆積項目：(-score, hops, node_id)
+    heap: list[tuple[float, int, str]] = [(-1.0, 0, seed) for seed in dict.fromkeys(seed_node_ids)]
+    heapq.heapify(heap)
+
+    while heap and len(results) < max_nodes:
+        neg_score, hops, node_id = heapq.heappop(heap)
+        if node_id not in results:
+            results[node_id] = -neg_score
+        if hops >= depth or hops >= expanded_hops.get(node_id, depth + 1):
+            continue
+        expanded_hops[node_id] = hops
+        for conf, neighbor in _adjacent(graph, node_id, min_confidence, relations):
+            if neighbor not in results or hops + 1 < expanded_hops.get(neighbor, depth + 1):
+                heapq.heappush(heap, (neg_score * conf, hops + 1, neighbor))
+
+    return list(results.items())
+
+
+def retrieve_bidirectional(
+    source_node_ids: list[str],
+    target_node_ids: list[str],
+    depth: int = config.MAX_GRAPH_DEPTH,
+    min_confidence: float = config.MIN_CONFIDENCE,
+    max_nodes: int = config.MAX_NODES,
+    relation_types: Iterable[str] | None = None,
+) -> list[str]:
+    """
+    從兩組種子同時進行 BFS（每次擴展較小的前沿），尋找連接兩者的最短路徑。
+
+    每一側最多擴展 `depth` 跳，因此路徑長度不超過 2 * depth。
+    回傳兩組種子，以及所有最短連接路徑上的節點（數量上限為 max_nodes）；
+    若兩組種子之間沒有路徑，則只回傳種子節點。
+    """
+    graph = graph_store.snapshot()
+    relations = _relation_filter(relation_types)
+    # 每一側：node_id → 最短路徑上的所有父節點，以及 node_id → 與該側種子的距離
+    parents: list[dict[str, list[str]]] = [
+        {seed: [] for seed in source_node_ids},
+        {seed: [] for seed in target_node_ids},
+    ]
+    dists = [dict.fromkeys(parents[0], 0), dict.fromkeys(parents[1], 0)]
+    frontiers = [list(parents[0]), list(parents[1])]
+    levels = [0, 0]
+    meetings = [n for n in parents[0] if n in parents[1]]
+
+    while not meetings:
+        open_sides = [s for s in (0, 1) if frontiers[s] and levels[s] < depth]
+        if not open_sides:
+            break
+        side = min(open_sides, key=lambda s: len(frontiers[s]))
+        own, own_dist, other = parents[side], dists[side], parents[1 - side]
+        level = levels[side] + 1
+        next_frontier: list[str] = []
+        for node_id in frontiers[side]:
+            for _, neighbor in _adjacent(graph, node_id, min_confidence, relations):
+                known = own_dist.get(neighbor)
+                if known is None:
+                    own_dist[neighbor] = level
+                    own[neighbor] = [node_id]
+                    next_frontier.append(neighbor)
+                    if neighbor in other:
+                        meetings.append(neighbor)
+                elif known == level and node_id not in own[neighbor]:
+                    # 同一層的另一條最短路徑
+                    own[neighbor].append(node_id)
+        frontiers[side] = next_frontier
+        levels[side] += 1
+
+    # 同一輪擴展中相遇的節點，到另一側種子的距離可能不同；只保留總長度最短者
+    if meetings:
+        shortest = min(dists[0][m] + dists[1][m] for m in meetings)
+        meetings = [m for m in meetings if dists[0][m] + dists[1][m] == shortest]
+
+    result: dict[str, None] = {}
+    for seed in list(source_node_ids) + list(target_node_ids):
+        result.setdefault(seed, None)
+    visited: list[set[str]] = [set(), set()]
+    for meeting in meetings:
+        for side in (0, 1):
+            stack = [meeting]
+            while stack and len(result) < max_nodes:
+                node = stack.pop()
+                if node in visited[side]:
+                    continue
+                visited[side].add(node)
+                result.setdefault(node, None)
+                stack.extend(reversed(parents[side][node]))
+        if len(result) >= max_nodes:
+            break
+    return list(result)[:max_nodes]
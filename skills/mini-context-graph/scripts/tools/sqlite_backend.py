@@ -0,0 +1,681 @@
+"""
+sqlite_backend.py — 以標準函式庫 sqlite3 實作的儲存後端。
+
+當 MINI_CONTEXT_GRAPH_BACKEND=sqlite 時，graph_store、index_store、
+documents_store 與 ontology_store 會將讀寫委派給此模組，而不是各自的 JSON 檔案。
+
+與 JSON 後端相比：
+- 所有資料存放在單一資料庫 DATA_DIR/contextgraph.db（WAL 模式），
+  多個代理程式可同時讀取，寫入則由 SQLite 鎖定序列化，不會互相覆寫
+- get_node、get_chunk 等點查詢只讀取需要的資料列，而不是反序列化整個語料庫
+- 去重疊與鄰居查詢由資料表索引支援
+
+將既有的 JSON 資料匯入資料庫：
+    python scripts/tools/sqlite_backend.py migrate [--data-dir DIR] [--db PATH]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Mapping
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id              TEXT PRIMARY KEY,
+    name            TEXT NOT NULL,
+    type            TEXT NOT NULL,
+    source_document TEXT,
+    source_chunks   TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS nodes_name ON nodes (name);
+
+CREATE TABLE IF NOT EXISTS edges (
+    pos             INTEGER PRIMARY KEY AUTOINCREMENT,
+    source          TEXT NOT NULL,
+    target          TEXT NOT NULL,
+    type            TEXT NOT NULL,
+    confidence      REAL NOT NULL,
+    source_document TEXT,
+    supporting_text TEXT,
+    chunk_id        TEXT,
+    UNIQUE (source, target, type)
+);
+CREATE INDEX IF NOT EXISTS edges_out ON edges (source, confidence DESC);
+CREATE INDEX IF NOT EXISTS edges_in ON edges (target, confidence DESC);
+
+CREATE TABLE IF NOT EXISTS entity_index (
+    name    TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    PRIMARY KEY (name, node_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS keyword_index (
+    token   TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    PRIMARY KEY (token, node_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS documents (
+    id             TEXT PRIMARY KEY,
+    title          TEXT NOT NULL,
+    source         TEXT NOT NULL,
+    content        TEXT NOT NULL,
+    content_ref    TEXT,
+    ingestion_date TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    doc_id   TEXT NOT NULL,
+    idx      INTEGER NOT NULL,
+    text     TEXT NOT NULL,
+    offset   INTEGER
+);
+CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id, idx);
+
+-- BM25 倒排索引：postings 依 (token, chunk_id) 聚簇，查詢只讀取查詢權杖的範圍
+CREATE TABLE IF NOT EXISTS postings (
+    token    TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    tf       INTEGER NOT NULL,
+    PRIMARY KEY (token, chunk_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS chunk_stats (
+    chunk_id TEXT PRIMARY KEY,
+    length   INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- 單列：區塊總數與權杖總長度；缺少此列表示索引需要重建
+CREATE TABLE IF NOT EXISTS search_totals (
+    id           INTEGER PRIMARY KEY CHECK (id = 0),
+    chunk_count  INTEGER NOT NULL,
+    total_length INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS entity_types (
+    name  TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS relation_types (
+    name  TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# SQLite 預設的主機參數上限為 999，IN (...) 查詢以此大小分批
+_MAX_PARAMS = 500
+
+_conn: sqlite3.Connection | None = None
+
+
+def connect(db_path: Path | None = None) -> sqlite3.Connection:
+    """
+    開啟（或建立）資料庫並確保結構存在。
+
+    未指定 db_path 時回傳程序內共用的連線。連線使用自動提交模式；
+    交易由 storage.batch() 以明確的 BEGIN/COMMIT 控制。
+    """
+    global _conn
+    if db_path is None and _conn is not None:
+        return _conn
+    path = Path(db_path or config.SQLITE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), isolation_level=None, timeout=30.0)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    _upgrade(conn)
+    if db_path is None:
+        _conn = conn
+    return conn
+
+
+# 較早版本建立的資料庫缺少的欄位：(資料表, 欄位, 定義)
+_ADDED_COLUMNS = (
+    ("documents", "content_ref", "TEXT"),
+    ("chunks", "offset", "INTEGER"),
+)
+
+
+def _upgrade(conn: sqlite3.Connection) -> None:
+    for table, column, decl in _ADDED_COLUMNS:
+        columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _chunked(items: list, size: int = _MAX_PARAMS) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(n: int) -> str:
+    return ",".join("?" * n)
+
+
+# ---------------------------------------------------------------------------
+# graph_store
+# ---------------------------------------------------------------------------
+
+def _node_dict(row: sqlite3.Row) -> dict:
+    return {
+        "name": row["name"],
+        "type": row["type"],
+        "source_document": row["source_document"],
+        "source_chunks": json.loads(row["source_chunks"]),
+    }
+
+
+def _edge_dict(row: sqlite3.Row) -> dict:
+    return {
+        "source": row["source"],
+        "target": row["target"],
+        "type": row["type"],
+        "confidence": row["confidence"],
+        "source_document": row["source_document"],
+        "supporting_text": row["supporting_text"],
+        "chunk_id": row["chunk_id"],
+    }
+
+
+def graph_find_node(name_lower: str) -> str | None:
+    row = connect().execute(
+        "SELECT id FROM nodes WHERE name = ? ORDER BY rowid LIMIT 1", (name_lower,)
+    ).fetchone()
+    return row["id"] if row else None
+
+
+def graph_add_node(
+    node_id: str,
+    name_lower: str,
+    node_type: str,
+    source_document: str | None,
+    source_chunks: list[str] | None,
+) -> str:
+    """新增節點或合併既有同名節點的來源。呼叫者須在交易中呼叫。"""
+    conn = connect()
+    row = conn.execute(
+        "SELECT * FROM nodes WHERE name = ? ORDER BY rowid LIMIT 1", (name_lower,)
+    ).fetchone()
+    if row is not None:
+        node = _node_dict(row)
+        changed = False
+        if source_document and node["source_document"] is None:
+            node["source_document"] = source_document
+            changed = True
+        if source_chunks:
+            existing = set(node["source_chunks"])
+            merged = list(existing | set(source_chunks))
+            if merged != list(existing):
+                node["source_chunks"] = merged
+                changed = True
+        if changed:
+            conn.execute(
+                "UPDATE nodes SET source_document = ?, source_chunks = ? WHERE id = ?",
+                (node["source_document"], json.dumps(node["source_chunks"]), row["id"]),
+            )
+        return row["id"]
+
+    conn.execute(
+        "INSERT INTO nodes (id, name, type, source_document, source_chunks) VALUES (?, ?, ?, ?, ?)",
+        (node_id, name_lower, node_type, source_document, json.dumps(source_chunks or [])),
+    )
+    return node_id
+
+
+def graph_add_edge(edge: dict) -> None:
+    """新增邊緣，或依 JSON 後端相同的規則合併既有的 (來源, 目標, 關聯) 邊緣。"""
+    conn = connect()
+    conn.execute(
+        """
+        INSERT INTO edges (source, target, type, confidence, source_document, supporting_text, chunk_id)
+        VALUES (:source, :target, :type, :confidence, :source_document, :supporting_text, :chunk_id)
+        ON CONFLICT (source, target, type) DO UPDATE SET
+            confidence      = MAX(confidence, excluded.confidence),
+            source_document = COALESCE(source_document, excluded.source_document),
+            supporting_text = COALESCE(supporting_text, excluded.supporting_text),
+            chunk_id        = COALESCE(chunk_id, excluded.chunk_id)
+        """,
+        edge,
+    )
+
+
+def graph_get_node(node_id: str) -> dict | None:
+    row = connect().execute("SELECT * FROM nodes WHERE id = ?", (node_id,)).fetchone()
+    return _node_dict(row) if row else None
+
+
+def graph_set_node_sources(node_id: str, doc_id: str, chunk_ids: list[str]) -> None:
+    conn = connect()
+    row = conn.execute("SELECT source_chunks FROM nodes WHERE id = ?", (node_id,)).fetchone()
+    if row is None:
+        return
+    merged = list(set(json.loads(row["source_chunks"])) | set(chunk_ids))
+    conn.execute(
+        "UPDATE nodes SET source_document = ?, source_chunks = ? WHERE id = ?",
+        (doc_id, json.dumps(merged), node_id),
+    )
+
+
+class SqliteGraph:
+    """
+    與 graph_store.GraphSnapshot 相同介面的資料庫檢視。
+
+    每次呼叫只透過 edges_out / edges_in 索引讀取該節點的鄰接邊緣；
+    讀過的鄰接串列會保留在此檢視中，因此同一次周遊重複展開節點時不會再次查詢。
+    """
+
+    def __init__(self) -> None:
+        self._adjacent: dict[tuple[str, str], list[tuple[float, str, dict]]] = {}
+
+    def _load_adjacent(self, node_id: str, key: str) -> list[tuple[float, str, dict]]:
+        cached = self._adjacent.get((node_id, key))
+        if cached is None:
+            other = "target" if key == "source" else "source"
+            rows = connect().execute(
+                f"SELECT * FROM edges WHERE {key} = ? ORDER BY confidence DESC", (node_id,)
+            )
+            cached = [(row["confidence"], row[other], _edge_dict(row)) for row in rows]
+            self._adjacent[(node_id, key)] = cached
+        return cached
+
+    def iter_adjacent(
+        self,
+        node_id: str,
+        min_confidence: float = 0.0,
+        direction: str = "both",
+    ):
+        keys = []
+        if direction in ("out", "both"):
+            keys.append("source")
+        if direction in ("in", "both"):
+            keys.append("target")
+        for key in keys:
+            for conf, neighbor, edge in self._load_adjacent(node_id, key):
+                if conf < min_confidence:
+                    break
+                yield conf, neighbor, edge
+
+    def neighbors(
+        self,
+        node_id: str,
+        min_confidence: float = 0.0,
+        direction: str = "both",
+    ) -> list[str]:
+        seen: dict[str, None] = {}
+        for _, neighbor, _ in self.iter_adjacent(node_id, min_confidence, direction):
+            seen.setdefault(neighbor, None)
+        return list(seen)
+
+    def subgraph(self, node_ids: list[str]) -> dict:
+        conn = connect()
+        unique_ids = list(dict.fromkeys(node_ids))
+        node_id_set = set(unique_ids)
+        found: dict[str, dict] = {}
+        edge_rows: list[sqlite3.Row] = []
+        for batch in _chunked(unique_ids):
+            marks = _placeholders(len(batch))
+            for row in conn.execute(f"SELECT * FROM nodes WHERE id IN ({marks})", batch):
+                found[row["id"]] = _node_dict(row)
+            edge_rows.extend(
+                row
+                for row in conn.execute(f"SELECT * FROM edges WHERE source IN ({marks})", batch)
+                if row["target"] in node_id_set
+            )
+        edge_rows.sort(key=lambda row: row["pos"])
+        nodes = {nid: found[nid] for nid in unique_ids if nid in found}
+        return {"nodes": nodes, "edges": [_edge_dict(row) for row in edge_rows]}
+
+
+# ---------------------------------------------------------------------------
+# index_store
+# ---------------------------------------------------------------------------
+
+def index_add_entity(name_lower: str, tokens: Iterable[str], node_id: str) -> None:
+    conn = connect()
+    conn.execute(
+        "INSERT OR IGNORE INTO entity_index (name, node_id) VALUES (?, ?)", (name_lower, node_id)
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO keyword_index (token, node_id) VALUES (?, ?)",
+        [(token, node_id) for token in tokens],
+    )
+
+
+def index_search(name_lower: str, tokens: list[str]) -> list[str]:
+    conn = connect()
+    matched = {row["node_id"] for row in conn.execute(
+        "SELECT node_id FROM entity_index WHERE name = ?", (name_lower,)
+    )}
+    for batch in _chunked(list(dict.fromkeys(tokens))):
+        matched.update(row["node_id"] for row in conn.execute(
+            f"SELECT node_id FROM keyword_index WHERE token IN ({_placeholders(len(batch))})", batch
+        ))
+    return list(matched)
+
+
+# ---------------------------------------------------------------------------
+# ontology_store
+# ---------------------------------------------------------------------------
+
+_COUNT_TABLES = {"entity_types", "relation_types"}
+
+
+def ontology_increment(table: str, name: str) -> None:
+    assert table in _COUNT_TABLES
+    connect().execute(
+        f"INSERT INTO {table} (name, count) VALUES (?, 1) "
+        "ON CONFLICT (name) DO UPDATE SET count = count + 1",
+        (name,),
+    )
+
+
+def ontology_counts(table: str) -> dict[str, int]:
+    assert table in _COUNT_TABLES
+    return {row["name"]: row["count"] for row in connect().execute(f"SELECT name, count FROM {table}")}
+
+
+# ---------------------------------------------------------------------------
+# documents_store
+# ---------------------------------------------------------------------------
+
+def _chunk_dict(row: sqlite3.Row) -> dict:
+    chunk = {"chunk_id": row["chunk_id"], "index": row["idx"], "text": row["text"]}
+    if row["offset"] is not None:
+        chunk["offset"] = row["offset"]
+    return chunk
+
+
+def _index_chunks(conn: sqlite3.Connection, chunks_tf: list[tuple[str, Mapping[str, int]]]) -> None:
+    """將 (chunk_id, 詞頻) 加入 postings、chunk_stats 並累加 search_totals。"""
+    conn.executemany(
+        "INSERT INTO postings (token, chunk_id, tf) VALUES (?, ?, ?)",
+        [(token, chunk_id, count) for chunk_id, tf in chunks_tf for token, count in tf.items()],
+    )
+    lengths = [(chunk_id, sum(tf.values())) for chunk_id, tf in chunks_tf]
+    conn.executemany("INSERT INTO chunk_stats (chunk_id, length) VALUES (?, ?)", lengths)
+    conn.execute(
+        "INSERT INTO search_totals (id, chunk_count, total_length) VALUES (0, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET "
+        "chunk_count = chunk_count + excluded.chunk_count, "
+        "total_length = total_length + excluded.total_length",
+        (len(lengths), sum(length for _, length in lengths)),
+    )
+
+
+def documents_insert(doc: dict) -> None:
+    """新增文件資料列（不含區塊）。"""
+    connect().execute(
+        "INSERT INTO documents (id, title, source, content, content_ref, ingestion_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (doc["id"], doc["title"], doc["source"], doc["content"],
+         json.dumps(doc["content_ref"]) if doc.get("content_ref") else None, doc["ingestion_date"]),
+    )
+
+
+def documents_set_content(doc_id: str, content: str, content_ref: dict | None) -> None:
+    connect().execute(
+        "UPDATE documents SET content = ?, content_ref = ? WHERE id = ?",
+        (content, json.dumps(content_ref) if content_ref else None, doc_id),
+    )
+
+
+def documents_add_chunks(
+    doc_id: str,
+    chunks: list[dict],
+    term_frequencies: list[Mapping[str, int]],
+) -> None:
+    """新增文件的區塊並更新倒排索引；term_frequencies 與 chunks 一一對應。呼叫者須在交易中呼叫。"""
+    if not chunks:
+        return
+    conn = connect()
+    conn.executemany(
+        "INSERT INTO chunks (chunk_id, doc_id, idx, text, offset) VALUES (?, ?, ?, ?, ?)",
+        [(c["chunk_id"], doc_id, c["index"], c["text"], c.get("offset")) for c in chunks],
+    )
+    _index_chunks(conn, [(c["chunk_id"], tf) for c, tf in zip(chunks, term_frequencies)])
+
+
+def documents_ensure_search_index(term_frequencies: Callable[[str], Mapping[str, int]]) -> None:
+    """
+    若 search_totals 缺少資料列（舊版資料庫或剛遷移完成），則從 chunks 重建倒排索引。
+    """
+    conn = connect()
+    if conn.execute("SELECT 1 FROM search_totals").fetchone() is not None:
+        return
+    if conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None:
+        return
+    from tools import storage
+    with storage.batch():
+        conn.execute("DELETE FROM postings")
+        conn.execute("DELETE FROM chunk_stats")
+        conn.execute("INSERT INTO search_totals (id, chunk_count, total_length) VALUES (0, 0, 0)")
+        rows = conn.execute("SELECT chunk_id, text FROM chunks").fetchall()
+        for batch in _chunked(rows):
+            _index_chunks(conn, [(row["chunk_id"], term_frequencies(row["text"])) for row in batch])
+
+
+def search_totals() -> tuple[int, int]:
+    row = connect().execute("SELECT chunk_count, total_length FROM search_totals").fetchone()
+    return (row["chunk_count"], row["total_length"]) if row else (0, 0)
+
+
+def search_postings(tokens: list[str]) -> dict[str, list[tuple[str, int, int]]]:
+    """回傳 權杖 → [(chunk_id, 詞頻, 區塊權杖長度), ...]，只讀取給定權杖的 postings。"""
+    conn = connect()
+    postings: dict[str, list[tuple[str, int, int]]] = {}
+    for batch in _chunked(tokens):
+        rows = conn.execute(
+            "SELECT p.token, p.chunk_id, p.tf, s.length FROM postings p "
+            f"JOIN chunk_stats s ON s.chunk_id = p.chunk_id WHERE p.token IN ({_placeholders(len(batch))})",
+            batch,
+        )
+        for row in rows:
+            postings.setdefault(row["token"], []).append((row["chunk_id"], row["tf"], row["length"]))
+    return postings
+
+
+def documents_get_chunk_map(chunk_ids: list[str]) -> dict[str, dict]:
+    """回傳 chunk_id → {chunk_id, index, text, doc_id, doc_title}，以主鍵批次查詢。"""
+    conn = connect()
+    found: dict[str, dict] = {}
+    for batch in _chunked(chunk_ids):
+        rows = conn.execute(
+            "SELECT c.*, d.title AS doc_title "
+            f"FROM chunks c JOIN documents d ON d.id = c.doc_id WHERE c.chunk_id IN ({_placeholders(len(batch))})",
+            batch,
+        )
+        for row in rows:
+            found[row["chunk_id"]] = {**_chunk_dict(row), "doc_id": row["doc_id"], "doc_title": row["doc_title"]}
+    return found
+
+
+def documents_get_chunks(doc_id: str) -> list[dict]:
+    rows = connect().execute("SELECT * FROM chunks WHERE doc_id = ? ORDER BY idx", (doc_id,))
+    return [_chunk_dict(row) for row in rows]
+
+
+def documents_get(doc_id: str) -> dict | None:
+    row = connect().execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    if row is None:
+        return None
+    doc = {
+        "id": row["id"],
+        "title": row["title"],
+        "source": row["source"],
+        "content": row["content"],
+        "chunks": documents_get_chunks(doc_id),
+        "ingestion_date": row["ingestion_date"],
+    }
+    if row["content_ref"]:
+        doc["content"] = None
+        doc["content_ref"] = json.loads(row["content_ref"])
+    return doc
+
+
+def documents_summary(doc_id: str) -> dict | None:
+    """回傳文件摘要（不讀取內容與區塊文字）。"""
+    row = connect().execute(
+        "SELECT d.id, d.title, d.source, d.content_ref, d.ingestion_date, "
+        "(SELECT COUNT(*) FROM chunks c WHERE c.doc_id = d.id) AS chunk_count "
+        "FROM documents d WHERE d.id = ?",
+        (doc_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "source": row["source"],
+        "chunk_count": row["chunk_count"],
+        "content_ref": json.loads(row["content_ref"]) if row["content_ref"] else None,
+        "ingestion_date": row["ingestion_date"],
+    }
+
+
+def documents_get_chunk(chunk_id: str) -> dict | None:
+    row = connect().execute("SELECT * FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+    return _chunk_dict(row) if row else None
+
+
+def documents_list() -> list[dict]:
+    rows = connect().execute(
+        "SELECT d.id, d.title, d.source, d.ingestion_date, "
+        "(SELECT COUNT(*) FROM chunks c WHERE c.doc_id = d.id) AS chunk_count "
+        "FROM documents d ORDER BY d.rowid"
+    )
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "source": row["source"],
+            "chunk_count": row["chunk_count"],
+            "ingestion_date": row["ingestion_date"],
+        }
+        for row in rows
+    ]
+
+
+# ---------------------------------------------------------------------------
+# 從 JSON 後端遷移
+# ---------------------------------------------------------------------------
+
+def _read_json(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def migrate_json(data_dir: Path, db_path: Path) -> dict[str, int]:
+    """
+    將 data_dir 中的 graph/index/documents/ontology JSON 檔案匯入 db_path。
+
+    在單一交易中執行；已存在的節點、邊緣、文件與索引項目會被略過，
+    類型計數則以 JSON 中的值為準，因此可安全地重複執行。
+    回傳每個資料表匯入的來源記錄數。
+    """
+    graph = _read_json(data_dir / "graph.json")
+    index = _read_json(data_dir / "index.json")
+    docs = _read_json(data_dir / "documents.json")
+    ontology = _read_json(data_dir / "ontology.json")
+
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        nodes = graph.get("nodes", {})
+        conn.executemany(
+            "INSERT OR IGNORE INTO nodes (id, name, type, source_document, source_chunks) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (nid, n["name"], n["type"], n.get("source_document"), json.dumps(n.get("source_chunks") or []))
+                for nid, n in nodes.items()
+            ],
+        )
+        edges = graph.get("edges", [])
+        conn.executemany(
+            "INSERT OR IGNORE INTO edges "
+            "(source, target, type, confidence, source_document, supporting_text, chunk_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (e["source"], e["target"], e["type"], e["confidence"],
+                 e.get("source_document"), e.get("supporting_text"), e.get("chunk_id"))
+                for e in edges
+            ],
+        )
+        entity_index = index.get("entity_index", {})
+        conn.executemany(
+            "INSERT OR IGNORE INTO entity_index (name, node_id) VALUES (?, ?)",
+            [(name, nid) for name, ids in entity_index.items() for nid in ids],
+        )
+        keyword_index = index.get("keyword_index", {})
+        conn.executemany(
+            "INSERT OR IGNORE INTO keyword_index (token, node_id) VALUES (?, ?)",
+            [(token, nid) for token, ids in keyword_index.items() for nid in ids],
+        )
+        documents = docs.get("documents", {})
+        for doc in documents.values():
+            ref = doc.get("content_ref")
+            conn.execute(
+                "INSERT OR IGNORE INTO documents (id, title, source, content, content_ref, ingestion_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc["id"], doc["title"], doc["source"], doc["content"] or "",
+                 json.dumps(ref) if ref else None, doc["ingestion_date"]),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunks (chunk_id, doc_id, idx, text, offset) VALUES (?, ?, ?, ?, ?)",
+                [(c["chunk_id"], doc["id"], c["index"], c["text"], c.get("offset")) for c in doc["chunks"]],
+            )
+        # 匯入的區塊尚未建立倒排索引；清除總計列，下次搜尋時會自動重建
+        conn.execute("DELETE FROM search_totals")
+        for table, key in (("entity_types", "entity_types"), ("relation_types", "relation_types")):
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} (name, count) VALUES (?, ?)",
+                list(ontology.get(key, {}).items()),
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return {
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "entity_index": len(entity_index),
+        "keyword_index": len(keyword_index),
+        "documents": len(documents),
+        "entity_types": len(ontology.get("entity_types", {})),
+        "relation_types": len(ontology.get("relation_types", {})),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="mini-context-graph SQLite 儲存後端工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="將既有的 JSON 儲存檔案匯入 SQLite 資料庫")
+    migrate.add_argument("--data-dir", type=Path, default=config.DATA_DIR,
+                         help="JSON 檔案所在目錄（預設：%(default)s）")
+    migrate.add_argument("--db", type=Path, default=config.SQLITE_PATH,
+                         help="目標資料庫路徑（預設：%(default)s）")
+    args = parser.parse_args(argv)
+
+    counts = migrate_json(args.data_dir, args.db)
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    print(f"已匯入至 {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+storage.py — 各儲存模組共用的 JSON 持久化與批次工作階段。
+
+處理：
+- 以 mtime 失效的程序內快取載入 JSON 檔案
+- 以暫存檔 + os.replace 原子性地寫入
+- 批次工作階段：收集所有變更於記憶體中，提交時每個檔案只寫入一次，
+  失敗時回滾，不會留下寫了一半的檔案
+- 後端選擇（config.STORAGE_BACKEND）；在 SQLite 後端下，批次即為一個資料庫交易
+
+用法：
+    from tools import storage
+
+    with storage.batch():
+        graph_store.add_node(...)
+        index_store.add_entity(...)
+    # 離開區塊時 graph.json 與 index.json 各寫入一次
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+from tools import sqlite_backend
+
+_BACKENDS = ("json", "sqlite")
+
+_FILES: list["JsonFile"] = []
+_EXIT_HOOKS: list[Callable[[], None]] = []
+_batch_depth = 0
+
+
+def _stat(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _write_tmp(path: Path, data: dict) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    return tmp
+
+
+def write_json_atomic(path: Path, data: dict) -> None:
+    """將 data 寫入暫存檔後以 os.replace 取代 path，讀者永遠不會看到半個檔案。"""
+    os.replace(_write_tmp(path, data), path)
+
+
+class JsonFile:
+    """
+    單一 JSON 儲存檔案。
+
+    load() 回傳的字典在程序內共用：只有在磁碟上的檔案 mtime/大小改變時
+    才會重新讀取。`version` 在每次資料被重新載入或儲存時遞增，
+    讓衍生結構（例如圖形鄰接串列）知道何時需要重建。
+    """
+
+    def __init__(self, path: Path, default: Callable[[], dict]) -> None:
+        self.path = path
+        self._default = default
+        self._data: dict | None = None
+        self._stamp: tuple[int, int] | None = None
+        self._dirty = False
+        self.version = 0
+        _FILES.append(self)
+
+    def load(self) -> dict:
+        if self._dirty:
+            # 批次中尚未提交的變更優先於磁碟內容
+            return self._data
+        stamp = _stat(self.path)
+        if self._data is None or stamp != self._stamp:
+            if stamp is None:
+                self._data = self._default()
+            else:
+                with open(self.path, "r") as f:
+                    self._data = json.load(f)
+            self._stamp = stamp
+            self.version += 1
+        return self._data
+
+    def save(self, data: dict) -> None:
+        self._data = data
+        self.version += 1
+        if _batch_depth:
+            self._dirty = True
+            return
+        write_json_atomic(self.path, data)
+        self._stamp = _stat(self.path)
+
+    def _discard(self) -> None:
+        self._data = None
+        self._stamp = None
+        self._dirty = False
+        self.version += 1
+
+
+def is_sqlite() -> bool:
+    """若設定的儲存後端為 SQLite 則回傳 True。"""
+    if config.STORAGE_BACKEND not in _BACKENDS:
+        raise ValueError(
+            f"未知的儲存後端 {config.STORAGE_BACKEND!r}；請使用 {' 或 '.join(_BACKENDS)}"
+        )
+    return config.STORAGE_BACKEND == "sqlite"
+
+
+def in_batch() -> bool:
+    return _batch_depth > 0
+
+
+def on_batch_exit(hook: Callable[[], None]) -> None:
+    """
+    註冊於最外層批次結束時（提交或回滾之後）呼叫的函式。
+
+    供不屬於交易的衍生檔案（例如 Wiki 側邊搜尋索引）將批次內的多次更新
+    合併為一次寫入。
+    """
+    _EXIT_HOOKS.append(hook)
+
+
+def _commit() -> None:
+    if is_sqlite():
+        sqlite_backend.connect().execute("COMMIT")
+        return
+    dirty = [f for f in _FILES if f._dirty]
+    staged: list[tuple[JsonFile, Path]] = []
+    try:
+        for f in dirty:
+            staged.append((f, _write_tmp(f.path, f._data)))
+    except BaseException:
+        for _, tmp in staged:
+            tmp.unlink(missing_ok=True)
+        raise
+    for f, tmp in staged:
+        os.replace(tmp, f.path)
+        f._stamp = _stat(f.path)
+        f._dirty = False
+
+
+def _rollback() -> None:
+    if is_sqlite():
+        sqlite_backend.connect().execute("ROLLBACK")
+        return
+    for f in _FILES:
+        if f._dirty or f._data is not None:
+            # 快取的字典可能已被就地修改，一律捨棄並於下次存取時重新載入
+            f._discard()
+
+
+@contextmanager
+def batch() -> Iterator[None]:
+    """
+    在記憶體中收集所有儲存的變更，並於離開時每個檔案只寫入一次。
+
+    可巢狀使用；只有最外層的區塊會提交。區塊內發生例外時，
+    所有未提交的變更都會被捨棄，磁碟上的檔案保持不變。
+    在 SQLite 後端下，區塊對應一個 BEGIN IMMEDIATE ... COMMIT 交易。
+    """
+    global _batch_depth
+    if _batch_depth == 0 and is_sqlite():
+        sqlite_backend.connect().execute("BEGIN IMMEDIATE")
+    _batch_depth += 1
+    try:
+        yield
+    except BaseException:
+        if _batch_depth == 1:
+            _rollback()
+        raise
+    else:
+        if _batch_depth == 1:
+            try:
+                _commit()
+            except BaseException:
+                _rollback()
+                raise
+    finally:
+        _batch_depth -= 1
+        if _batch_depth == 0:
+            for hook in _EXIT_HOOKS:
+                hook()
@@ -14,9 +14,15 @@ Wiki 結構（相對於專案根目錄）：
         topics/         ← 跨領域整合與主題頁面
 
 代理程式編寫頁面；此模組處理檔案系統 + 索引 + 記錄。
+
+search_wiki 與 lint_wiki 使用側邊索引 wiki/.search_index.json，記錄每個頁面的
+權杖、每個權杖首次出現處片段的位元組範圍、Wiki 連結與 mtime/大小。每次搜尋以
+os.scandir 檢查所有頁面的 mtime/大小，只重新讀取改變的頁面（包括就地修改的頁面），
+並依位元組範圍讀取片段。批次（storage.batch）內的多次 write_page 只寫入一次側邊索引。
 """
 from __future__ import annotations
 
+import json
 import os
 import re
 import sys
@@ -25,10 +31,13 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
+from tools import storage
 
 _WIKI_DIR = Path(os.environ.get("MINI_CONTEXT_GRAPH_WIKI_DIR", str(config.WIKI_DIR)))
 _INDEX_FILE = _WIKI_DIR / "index.md"
 _LOG_FILE = _WIKI_DIR / "log.md"
+_SEARCH_INDEX_FILE = _WIKI_DIR / ".search_index.json"
+_SEARCH_INDEX_VERSION = 2
 
 _CATEGORY_DIRS = {
     "entity": _WIKI_DIR / "entities",
@@ -115,6 +124,192 @@ def _append_log(operation: str, detail: str) -> None:
         f.write(entry)
 
 
+# ---------------------------------------------------------------------------
+# 側邊搜尋索引
+# ---------------------------------------------------------------------------
+
+# 程序內快取：{"pages": {相對路徑: 頁面項目}, "dirs": {類別: 目錄 mtime}}，
+# 以及由其衍生的 權杖 → {相對路徑}
+_search_index: dict | None = None
+_postings: dict[str, set[str]] = {}
+_search_index_dirty = False
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _snippet_spans(raw: bytes, lower: str) -> dict[str, list[int]] | None:
+    """
+    每個權杖首次出現處片段（前 30、後 80 個字元）在檔案中的位元組範圍。
+
+    無法以 UTF-8 解碼或小寫轉換改變長度時回傳 None，搜尋時改為讀取整個頁面。
+    """
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if len(text) != len(lower):
+        return None
+    first: dict[str, int] = {}
+    for m in _TOKEN_RE.finditer(lower):
+        first.setdefault(m.group(), m.start())
+    if len(raw) == len(text):
+        # 純 ASCII：字元位置即位元組位置
+        return {t: [max(0, i - 30), min(len(text), i + 80)] for t, i in first.items()}
+    # 依位置順序累加各段的編碼長度，將字元位置轉換為位元組位置
+    bounds = sorted({b for i in first.values() for b in (max(0, i - 30), min(len(text), i + 80))})
+    byte_at: dict[int, int] = {}
+    pos = nbytes = 0
+    for b in bounds:
+        nbytes += len(text[pos:b].encode("utf-8"))
+        byte_at[b] = nbytes
+        pos = b
+    return {
+        t: [byte_at[max(0, i - 30)], byte_at[min(len(text), i + 80)]]
+        for t, i in first.items()
+    }
+
+
+def _page_entry(category: str, path: Path, st: os.stat_result) -> dict:
+    raw = path.read_bytes()
+    content = raw.decode("utf-8", errors="replace")
+    lower = content.lower()
+    return {
+        "category": category,
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "tokens": sorted(set(_TOKEN_RE.findall(lower))),
+        "spans": _snippet_spans(raw, lower),
+        "links": re.findall(r"\[\[([^\]]+)\]\]", content),
+    }
+
+
+def _set_page(pages: dict, rel: str, entry: dict | None) -> None:
+    """更新（或在 entry 為 None 時移除）頁面項目，並同步倒排 postings。"""
+    old = pages.pop(rel, None)
+    if old is not None:
+        for token in old["tokens"]:
+            holders = _postings.get(token)
+            if holders is not None:
+                holders.discard(rel)
+                if not holders:
+                    del _postings[token]
+    if entry is not None:
+        pages[rel] = entry
+        for token in entry["tokens"]:
+            _postings.setdefault(token, set()).add(rel)
+
+
+def _dir_mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _load_search_index() -> dict:
+    global _search_index
+    if _search_index is None:
+        pages: dict = {}
+        dirs: dict = {}
+        _postings.clear()
+        if _SEARCH_INDEX_FILE.exists():
+            try:
+                with open(_SEARCH_INDEX_FILE, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == _SEARCH_INDEX_VERSION:
+                for rel, entry in data.get("pages", {}).items():
+                    _set_page(pages, rel, entry)
+                dirs = data.get("dirs", {})
+        _search_index = {"pages": pages, "dirs": dirs}
+    return _search_index
+
+
+def _save_search_index() -> None:
+    """寫入側邊索引；批次進行中時延後至批次結束才寫入一次。"""
+    global _search_index_dirty
+    if storage.in_batch():
+        _search_index_dirty = True
+        return
+    _search_index_dirty = False
+    _ensure_dirs()
+    storage.write_json_atomic(
+        _SEARCH_INDEX_FILE,
+        {
+            "version": _SEARCH_INDEX_VERSION,
+            "pages": _search_index["pages"],
+            "dirs": _search_index["dirs"],
+        },
+    )
+
+
+def _flush_search_index() -> None:
+    if _search_index_dirty and _search_index is not None:
+        _save_search_index()
+
+
+storage.on_batch_exit(_flush_search_index)
+
+
+def _refresh_search_index(full: bool = False) -> dict:
+    """
+    將側邊索引與磁碟同步：以 os.scandir 檢查每個頁面的 mtime/大小，只重新讀取
+    新增或改變的頁面（包括就地修改、目錄 mtime 不變的頁面），並移除已刪除的頁面。
+    回傳 {相對路徑: 頁面項目}。
+
+    類別目錄的 mtime 與上次掃描相同時該目錄沒有新增或刪除的檔案，略過刪除檢查；
+    full 為 True 時一律檢查。
+    """
+    index = _load_search_index()
+    pages, dirs = index["pages"], index["dirs"]
+    current = {category: _dir_mtime(d) for category, d in _CATEGORY_DIRS.items()}
+    seen: set[str] = set()
+    changed = current != dirs
+    for category, base_dir in _CATEGORY_DIRS.items():
+        if current[category] is None:
+            continue
+        with os.scandir(base_dir) as it:
+            for dir_entry in it:
+                name = dir_entry.name
+                if name.startswith(".") or not name.endswith(".md") or not dir_entry.is_file():
+                    continue
+                path = Path(dir_entry.path)
+                rel = str(path.relative_to(_WIKI_DIR))
+                seen.add(rel)
+                st = dir_entry.stat()
+                entry = pages.get(rel)
+                if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+                    _set_page(pages, rel, _page_entry(category, path, st))
+                    changed = True
+    # 只有 mtime 改變的目錄可能有檔案被刪除
+    unchanged = set() if full else {
+        c for c, mtime in current.items() if mtime is not None and mtime == dirs.get(c)
+    }
+    for rel in [rel for rel, e in pages.items() if rel not in seen and e["category"] not in unchanged]:
+        _set_page(pages, rel, None)
+        changed = True
+    index["dirs"] = current
+    if changed:
+        _save_search_index()
+    return pages
+
+
+def _read_snippet(rel: str, entry: dict, token: str) -> str:
+    spans = entry.get("spans")
+    path = _WIKI_DIR / rel
+    if spans is not None and token in spans:
+        start, end = spans[token]
+        with open(path, "rb") as f:
+            f.seek(start)
+            text = f.read(end - start).decode("utf-8", errors="replace").lower()
+    else:
+        content = path.read_text().lower()
+        idx = content.find(token)
+        text = content[max(0, idx - 30):idx + 80]
+    return text.replace("\r\n", "\n").replace("\n", " ").strip()
+
+
 # ---------------------------------------------------------------------------
 # 公開 API
 # ---------------------------------------------------------------------------
@@ -154,7 +349,19 @@ def write_page(
                 summary = stripped[:100]
                 break
 
-    path.write_text(content)
+    if category in _CATEGORY_DIRS:
+        index = _load_search_index()
+        base_dir = _CATEGORY_DIRS[category]
+        in_sync = index["dirs"].get(category) == _dir_mtime(base_dir)
+        path.write_text(content)
+        # 直接更新此頁面的側邊索引項目；寫入前目錄已同步時一併記錄新的目錄 mtime，
+        # 下次搜尋便不需重新掃描
+        _set_page(index["pages"], str(path.relative_to(_WIKI_DIR)), _page_entry(category, path, path.stat()))
+        if in_sync:
+            index["dirs"][category] = _dir_mtime(base_dir)
+        _save_search_index()
+    else:
+        path.write_text(content)
 
     # 更新索引
     entries = _load_index()
@@ -197,31 +404,33 @@ def search_wiki(query: str) -> list[dict]:
     """
     對所有 Wiki 頁面進行簡單的關鍵字搜尋。
     回傳按相關性排序的 {slug, category, path, snippet} 列表。
+
+    先以 _refresh_search_index 同步索引（只重新讀取改變的頁面），匹配與評分
+    只使用側邊索引的倒排 postings，並依索引中的位元組範圍讀取片段。
     """
     query_tokens = set(re.findall(r"[a-z0-9]+", query.lower()))
     if not query_tokens:
         return []
 
+    pages = _refresh_search_index()
+    matched: dict[str, set[str]] = {}
+    for token in query_tokens:
+        for rel in _postings.get(token, ()):
+            matched.setdefault(rel, set()).add(token)
+
     results = []
-    for category, base_dir in _CATEGORY_DIRS.items():
-        if not base_dir.exists():
-            continue
-        for page_path in base_dir.glob("*.md"):
-            content = page_path.read_text().lower()
-            content_tokens = set(re.findall(r"[a-z0-9]+", content))
-            overlap = len(query_tokens & content_tokens)
-            if overlap > 0:
-                # 提取第一個匹配項周圍的短片段
-                first_token = next(iter(query_tokens & content_tokens), "")
-                idx = content.find(first_token)
-                snippet = content[max(0, idx - 30):idx + 80].replace("\n", " ").strip()
-                results.append({
-                    "slug": page_path.stem,
-                    "category": category,
-                    "path": str(page_path.relative_to(_WIKI_DIR)),
-                    "score": overlap,
-                    "snippet": snippet,
-                })
+    for rel, tokens in matched.items():
+        page_path = _WIKI_DIR / rel
+        # 提取第一個匹配項周圍的短片段
+        first_token = next(iter(tokens))
+        snippet = _read_snippet(rel, pages[rel], first_token)
+        results.append({
+            "slug": page_path.stem,
+            "category": pages[rel]["category"],
+            "path": rel,
+            "score": len(tokens),
+            "snippet": snippet,
+        })
 
     results.sort(key=lambda x: x["score"], reverse=True)
     return results
@@ -263,11 +472,12 @@ def lint_wiki() -> dict:
         }
     """
     index_entries = {e["slug"] for e in _load_index()}
-    file_slugs: dict[str, Path] = {}
-    for d in _CATEGORY_DIRS.values():
-        if d.exists():
-            for p in d.glob("*.md"):
-                file_slugs[p.stem] = p
+    pages = _refresh_search_index(full=True)
+    # 依類別順序填入，與逐目錄掃描時相同：同名頁面以較後面的類別為準
+    category_order = {category: i for i, category in enumerate(_CATEGORY_DIRS)}
+    file_slugs: dict[str, str] = {}
+    for rel in sorted(pages, key=lambda r: category_order[pages[r]["category"]]):
+        file_slugs[Path(rel).stem] = rel
 
     orphans = [s for s in file_slugs if s not in index_entries]
     missing = [s for s in index_entries if s not in file_slugs]
@@ -276,9 +486,8 @@ def lint_wiki() -> dict:
     isolated: list[str] = []
     all_slugs = set(file_slugs.keys())
 
-    for slug, path in file_slugs.items():
-        content = path.read_text()
-        links = re.findall(r"\[\[([^\]]+)\]\]", content)
+    for slug, rel in file_slugs.items():
+        links = pages[rel]["links"]
         if not links:
             isolated.append(slug)
         broken = [lnk for lnk in links if _slug(lnk) not in all_slugs]
@@ -0,0 +1,45 @@
+"""wiki_store 側邊搜尋索引的回歸測試。"""
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+
+@pytest.fixture
+def wiki_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("MINI_CONTEXT_GRAPH_WIKI_DIR", str(tmp_path / "wiki"))
+    monkeypatch.setenv("MINI_CONTEXT_GRAPH_DATA_DIR", str(tmp_path / "data"))
+    import config
+    importlib.reload(config)
+    from tools import wiki_store
+    return importlib.reload(wiki_store)
+
+
+def test_search_finds_page_edited_in_place(wiki_store):
+    rel = wiki_store.write_page("entity", "Horse", "# Horse\n\nA horse lives on a farm.\n")
+    wiki_store.write_page("entity", "Cow", "# Cow\n\nA cow lives on a farm.\n")
+    assert wiki_store.search_wiki("zebra") == []
+
+    # 就地修改不會改變類別目錄的 mtime
+    dirs_before = dict(wiki_store._search_index["dirs"])
+    with open(wiki_store._WIKI_DIR / rel, "a") as f:
+        f.write("\nSometimes mistaken for a zebra.\n")
+    assert wiki_store._dir_mtime(wiki_store._CATEGORY_DIRS["entity"]) == dirs_before["entity"]
+
+    results = wiki_store.search_wiki("zebra")
+    assert [r["path"] for r in results] == [rel]
+    assert "zebra" in results[0]["snippet"]
+
+    # 新的程序從側邊索引檔載入
+    wiki_store._search_index = None
+    assert [r["path"] for r in wiki_store.search_wiki("zebra")] == [rel]
+
+
+def test_search_drops_deleted_page(wiki_store):
+    rel = wiki_store.write_page("topic", "Zebra", "# Zebra\n\nStripes.\n")
+    assert [r["path"] for r in wiki_store.search_wiki("stripes")] == [rel]
+    (wiki_store._WIKI_DIR / rel).unlink()
+    assert wiki_store.search_wiki("stripes") == []
@@ -1,14 +1,44 @@
 import argparse
+import bz2
+import datetime
+import glob
+import gzip
+import lzma
+import os
 import re
 import json
+import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # 可用的欄位清單
 VALID_FIELDS = [
-    "timestamp", "app", "level", "endpoint", "contextPath", "event", 
+    "timestamp", "app", "level", "endpoint", "contextPath", "event",
     "user", "class", "function", "rowId", "body"
 ]
 
+# 用於匹配 Simplicité 紀錄格式的正規表示式
+LOG_REGEX = re.compile(r"^(?P<timestamp>.*?)\|(?P<app>SIMPLICITE)\|(?P<level>.+?)\|\|(?P<endpoint>.*?)\|(?P<contextPath>.*?)\|(?P<event>.*?)\|(?P<user>.*?)\|(?P<class>.*?)\|(?P<function>.*?)\|(?P<rowId>.*?)\|(?P<body>.*)$", re.DOTALL)
+# 用於識別新紀錄項目起始時間戳記的正規表示式
+TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}")
+TIMESTAMP_RE_BYTES = re.compile(TIMESTAMP_RE.pattern.encode("ascii"))
+# 時間分桶長度，例如 30s、5m、1h、1d
+DURATION_RE = re.compile(r"^(\d+)([smhd])$")
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# 追蹤模式下，最後一個項目在沒有新增任何行超過此秒數後才輸出 (遠大於輪詢間隔，
+# 讓晚到的堆疊追蹤後續行仍併入同一個項目)
+FOLLOW_FLUSH_DELAY = 5.0
+# 不縮排的編碼器使用 C 實作；紀錄項目為單層物件，縮排格式可直接組合
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+# 壓縮格式的檔頭 (magic bytes)，輪替後的檔案即使沒有副檔名也能辨識
+_COMPRESSED_OPENERS = [
+    (b"\x1f\x8b", gzip.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+    (b"BZh", bz2.open),
+]
+
 def validate_fields(value):
     """驗證使用者提供的欄位是否在可用欄位清單中。"""
     fields = [f.strip() for f in value.split(",")]
@@ -21,16 +51,74 @@ def parse_args():
     """解析指令列引數。"""
     parser = argparse.ArgumentParser(
         prog="simplicite-log2json",
-        description="解析 Simplicité 紀錄 (logs) 並輸出 JSON。"
+        description="解析 Simplicité 紀錄 (logs) 並輸出 JSON。彙總查詢請使用 `simplicite-log2json stats -h`。"
     )
-    parser.add_argument("input", help="輸入的 .txt 紀錄檔案路徑")
+    parser.add_argument("input", nargs="+",
+                        help="輸入的紀錄檔案路徑或萬用字元 (可指定多個，支援 .gz/.xz/.bz2 壓縮檔)")
     parser.add_argument("-o", "--output", help="輸出檔案路徑 (預設為標準輸出 stdout)", metavar="FILE")
-    
+    parser.add_argument("-f", "--follow", action="store_true",
+                        help="讀完所有輸入後持續追蹤最新的檔案 (類似 tail -F)，逐一輸出新的項目；以 Ctrl+C 結束")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="輸出格式：json 為串流輸出的 JSON 陣列，ndjson 為每行一個 JSON 物件 (預設：json)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="平行解析的程序數；大於 1 時於時間戳記邊界切分檔案並平行解析 (預設：1)")
+
     group = parser.add_mutually_exclusive_group()
     group.add_argument("--include", help=f"欲包含的欄位 (以逗號分隔)。可用欄位：{', '.join(VALID_FIELDS)}", type=validate_fields, metavar="FIELDS", action="append")
     group.add_argument("--exclude", help=f"欲排除的欄位 (以逗號分隔)。可用欄位：{', '.join(VALID_FIELDS)}", type=validate_fields, metavar="FIELDS", action="append")
-    
-    return parser.parse_args()
+
+    args = parser.parse_args()
+    if args.follow and args.jobs > 1:
+        parser.error("--follow 不可與 --jobs 同時使用")
+    return args
+
+def parse_duration(value):
+    """將時間長度 (例如 30s、5m、1h、1d) 轉換為秒數。"""
+    match = DURATION_RE.match(value.strip())
+    if not match or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"無效的時間長度：{value}。範例：30s、5m、1h、1d")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+def parse_where(value):
+    """解析 FIELD=VALUE[,VALUE...] 條件，傳回 (欄位, 值集合)。"""
+    field, sep, values = value.partition("=")
+    field = field.strip()
+    if not sep or field not in VALID_FIELDS:
+        raise argparse.ArgumentTypeError(f"無效的條件：{value}。格式：FIELD=VALUE[,VALUE...]，可用欄位：{', '.join(VALID_FIELDS)}")
+    return field, {v.strip().casefold() for v in values.split(",")}
+
+def parse_stats_args(argv):
+    """解析 stats 子命令的引數。"""
+    parser = argparse.ArgumentParser(
+        prog="simplicite-log2json stats",
+        description="以單次串流掃描彙總 Simplicité 紀錄：依欄位分組、過濾、時間分桶並列出前 N 名。"
+    )
+    parser.add_argument("input", nargs="+",
+                        help="輸入的紀錄檔案路徑或萬用字元 (可指定多個，支援 .gz/.xz/.bz2 壓縮檔)")
+    parser.add_argument("--group-by", type=validate_fields, default=["level"], metavar="FIELDS",
+                        help=f"分組欄位 (以逗號分隔，預設：level)。可用欄位：{', '.join(VALID_FIELDS)}")
+    parser.add_argument("--bucket", type=parse_duration, metavar="DURATION",
+                        help="依時間戳記分桶 (例如 5m、1h、1d)，時間桶作為第一個分組欄位")
+    parser.add_argument("--level", type=lambda v: ("level", {x.strip().casefold() for x in v.split(",")}),
+                        metavar="LEVELS", help="僅彙總這些層級 (以逗號分隔，不分大小寫)，例如 ERROR,WARN")
+    parser.add_argument("--event", type=lambda v: ("event", {x.strip().casefold() for x in v.split(",")}),
+                        metavar="EVENTS", help="僅彙總這些事件 (以逗號分隔，不分大小寫)")
+    parser.add_argument("--where", type=parse_where, action="append", default=[], metavar="FIELD=VALUES",
+                        help="僅彙總欄位值為指定值之一的項目 (可重複指定)")
+    parser.add_argument("--metric", type=re.compile, metavar="REGEX",
+                        help="從 body 擷取數值的正規表示式 (第一個擷取群組)，例如 'took (\\d+) ms'；會輸出各組的總和、平均與最大值")
+    parser.add_argument("--sort", choices=["count", "sum", "avg", "max", "key"], default="count",
+                        help="排序依據；key 依分組鍵遞增排序 (搭配 --bucket 即為時間序)，sum/avg/max 需搭配 --metric (預設：count)")
+    parser.add_argument("--top", type=int, default=20, metavar="N", help="列出前 N 組 (0 表示全部，預設：20)")
+    parser.add_argument("--max-groups", type=int, default=100000, metavar="N",
+                        help="記憶體中保留的群組數上限，超過時捨棄計數較低的一半 (預設：100000)")
+    parser.add_argument("--format", choices=["table", "json"], default="table", help="輸出格式 (預設：table)")
+    args = parser.parse_args(argv)
+    if args.sort in ("sum", "avg", "max") and args.metric is None:
+        parser.error("--sort sum/avg/max 需搭配 --metric")
+    if args.metric is not None and args.metric.groups < 1:
+        parser.error("--metric 需包含一個擷取群組")
+    return args
 
 def parse_log_entry(text, log_regex):
     """根據正規表示式解析單一紀錄項目。"""
@@ -62,72 +150,503 @@ def filter_entry(entry, include, exclude):
         filtered[k] = v
     return filtered
 
+# --- 輸入檔案 ---
+def expand_inputs(patterns):
+    """展開萬用字元並去除重複的路徑；萬用字元沒有符合的檔案時引發 FileNotFoundError。"""
+    paths = []
+    for pattern in patterns:
+        if any(c in pattern for c in "*?["):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError(f"找不到符合的檔案：{pattern}")
+            paths.extend(matches)
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+def _compressed_opener(path):
+    """依檔頭判斷壓縮格式，傳回對應的 open 函式；未壓縮時傳回 None。"""
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for magic, opener in _COMPRESSED_OPENERS:
+        if head.startswith(magic):
+            return opener
+    return None
+
+def open_log(path):
+    """以文字模式開啟紀錄檔，壓縮檔以串流方式解壓縮。"""
+    opener = _compressed_opener(path) or open
+    return opener(path, "rt", encoding="utf-8")
+
+def first_timestamp(path, max_lines=1000):
+    """傳回檔案中第一個紀錄項目的時間戳記 (只讀取檔案開頭)，找不到時傳回 None。"""
+    with open_log(path) as f:
+        for i, line in enumerate(f):
+            match = TIMESTAMP_RE.match(line)
+            if match:
+                return match.group(0)
+            if i >= max_lines:
+                break
+    return None
+
+def order_inputs(paths):
+    """依第一個時間戳記排序輸入檔案，使輪替的區段 (例如 app.log.2.gz、app.log.1、app.log) 依時間串接；
+    時間戳記相同或找不到時維持原本順序，找不到時間戳記的檔案排在最後。"""
+    keys = {path: first_timestamp(path) for path in paths}
+    return sorted(paths, key=lambda path: (keys[path] is None, keys[path] or ""))
+
+def follow_lines(path, poll_interval=0.5):
+    """從頭讀取檔案並持續追蹤新增的內容 (類似 tail -F)，逐行產出。
+
+    沒有新資料時 (每次輪詢) 產出 None，讓呼叫端判斷最後一個項目是否已完成；檔案被輪替 (inode 改變) 或截斷時重新開啟。
+    收到 KeyboardInterrupt 時結束。"""
+    f = open(path, "rb")
+    pending = b""
+    try:
+        while True:
+            raw = f.readline()
+            if raw:
+                pending += raw
+                # 寫入端可能只寫了半行，等待換行字元再產出
+                if pending.endswith(b"\n"):
+                    line = pending.decode("utf-8")
+                    pending = b""
+                    yield line[:-2] + "\n" if line.endswith("\r\n") else line
+                continue
+            yield None
+            try:
+                time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                break
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # 輪替期間檔案可能暫時不存在
+                continue
+            if st.st_ino != os.fstat(f.fileno()).st_ino or st.st_size < f.tell():
+                # 舊檔案剩餘的內容已讀完 (readline 傳回空值)，改讀新檔案
+                f.close()
+                f = open(path, "rb")
+                pending = b""
+    finally:
+        f.close()
+    if pending:
+        yield pending.decode("utf-8")
+
+def iter_input_lines(paths, follow=False):
+    """依序逐行讀取多個輸入檔案；follow 為 True 時持續追蹤最後一個檔案。"""
+    for i, path in enumerate(paths):
+        if follow and i == len(paths) - 1:
+            yield from follow_lines(path)
+        else:
+            with open_log(path) as f:
+                yield from f
+
+def iter_entry_texts(lines, flush_delay=FOLLOW_FLUSH_DELAY):
+    """將逐行輸入依時間戳記組合為多行紀錄項目文字，每完成一個項目即產出。
+
+    輸入中的 None 表示暫時沒有新資料 (追蹤模式)；緩衝區中的項目在下一個時間戳記行出現，
+    或連續 flush_delay 秒沒有新增任何行時才輸出，不會在第一次閒置時就被切斷。"""
+    buffer = []
+    idle_since = None
+    for line in lines:
+        if line is None:
+            if buffer:
+                now = time.monotonic()
+                if idle_since is None:
+                    idle_since = now
+                elif now - idle_since >= flush_delay:
+                    yield '\n'.join(buffer)
+                    buffer = []
+                    idle_since = None
+            continue
+        idle_since = None
+        line_stripped = line.rstrip('\n')
+
+        # 如果該行以時間戳記開始，代表是一個新的紀錄項目
+        if TIMESTAMP_RE.match(line_stripped) and buffer:
+            yield '\n'.join(buffer)
+            buffer = []
+
+        buffer.append(line_stripped)
+
+    # 處理最後一個紀錄項目
+    if buffer:
+        yield '\n'.join(buffer)
+
+def iter_entries(lines, stats):
+    """逐一產出解析後的紀錄項目；stats 累計已處理 (processed) 與已跳過 (skipped) 的項目數。"""
+    for entry_text in iter_entry_texts(lines):
+        entry = parse_log_entry(entry_text, LOG_REGEX)
+        if entry:
+            stats["processed"] += 1
+            yield entry
+        else:
+            stats["skipped"] += 1
+
+def format_entry(entry, fmt):
+    """將單一紀錄項目格式化：ndjson 為單行；json 為 JSON 陣列中縮排兩格的元素
+    (與 json.dumps(..., indent=2) 的結果相同)。"""
+    if fmt == "ndjson":
+        return _encode(entry)
+    if not entry:
+        return "  {}"
+    fields = ",\n".join(f"    {_encode(k)}: {_encode(v)}" for k, v in entry.items())
+    return "  {\n" + fields + "\n  }"
+
+def write_entries(out, entries, fmt, flush=False):
+    """串流寫出紀錄項目，記憶體用量與項目數量無關。json 格式的輸出與 json.dumps(list, indent=2) 相同。
+
+    flush 為 True 時每個項目寫出後立即清空緩衝 (追蹤模式)。"""
+    first = True
+    for entry in entries:
+        if fmt == "ndjson":
+            out.write(format_entry(entry, fmt) + "\n")
+        else:
+            out.write(("[\n" if first else ",\n") + format_entry(entry, fmt))
+        first = False
+        if flush:
+            out.flush()
+    if fmt == "json":
+        out.write("[]" if first else "\n]")
+
+# --- 多程序解析 ---
+def split_segments(path, jobs):
+    """將檔案切分為至多 jobs 個位元組區段，切分點皆位於以時間戳記開始的行首。"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, jobs):
+            pos = max(size * i // jobs, bounds[-1])
+            f.seek(pos)
+            if pos:
+                # 略過切分點所在的不完整行
+                f.readline()
+            while True:
+                line_start = f.tell()
+                line = f.readline()
+                if not line or TIMESTAMP_RE_BYTES.match(line):
+                    break
+            if line_start > bounds[-1]:
+                bounds.append(line_start)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _read_segment_lines(path, start, end):
+    """以文字行讀取檔案的 [start, end) 位元組區段 (換行字元的處理與文字模式開檔相同)；
+    end 為 None 時讀取整個檔案 (壓縮檔無法切分)。"""
+    if end is None:
+        with open_log(path) as f:
+            yield from f
+        return
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            line = raw.decode("utf-8")
+            if line.endswith("\r\n"):
+                line = line[:-2] + "\n"
+            yield line
+
+def _format_text(text, fmt, include, exclude, stats):
+    """解析並格式化單一項目文字；無法解析時傳回 None。"""
+    entry = parse_log_entry(text, LOG_REGEX)
+    if not entry:
+        stats["skipped"] += 1
+        return None
+    stats["processed"] += 1
+    return format_entry(filter_entry(entry, include, exclude), fmt)
+
+def _convert_segment(task):
+    """子程序：解析單一區段並將格式化的項目寫入暫存檔，傳回 (暫存檔, 項目數, 統計, 開頭, 結尾)。
+
+    區段開頭不是時間戳記的行 (延續前一個檔案的項目) 與最後一個項目 (可能延續至下一個檔案)
+    不在此解析，以原始文字傳回，由主程序與相鄰區段接合。"""
+    path, start, end, out_path, fmt, include, exclude = task
+    stats = {"processed": 0, "skipped": 0}
+    count = 0
+    head = tail = None
+    with open(out_path, "w", encoding="utf-8") as out:
+        for i, text in enumerate(iter_entry_texts(_read_segment_lines(path, start, end))):
+            if i == 0 and not TIMESTAMP_RE.match(text):
+                head = text
+                continue
+            if tail is not None:
+                formatted = _format_text(tail, fmt, include, exclude, stats)
+                if formatted is not None:
+                    out.write(formatted + "\n" if fmt == "ndjson" else ("" if count == 0 else ",\n") + formatted)
+                    count += 1
+            tail = text
+    return out_path, count, stats, head, tail
+
+def convert_parallel(paths, out, fmt, include, exclude, jobs, stats):
+    """於時間戳記邊界切分檔案，以多個程序平行解析，再依原始順序合併各區段的輸出。
+
+    未壓縮的檔案切分為至多 jobs 個區段，壓縮檔整個作為一個區段；
+    跨越檔案邊界的項目由主程序接合，結果與循序解析相同。"""
+    segments = []
+    for path in paths:
+        if _compressed_opener(path):
+            segments.append((path, 0, None))
+        else:
+            segments.extend((path, start, end) for start, end in split_segments(path, jobs))
+    first = True
+
+    def separator():
+        nonlocal first
+        sep = "" if fmt == "ndjson" else ("[\n" if first else ",\n")
+        first = False
+        return sep
+
+    def emit(text):
+        formatted = _format_text(text, fmt, include, exclude, stats)
+        if formatted is not None:
+            out.write(separator() + formatted + ("\n" if fmt == "ndjson" else ""))
+
+    with tempfile.TemporaryDirectory(prefix="log2json-") as tmp:
+        tasks = [
+            (path, start, end, os.path.join(tmp, f"part{i:04d}"), fmt, include, exclude)
+            for i, (path, start, end) in enumerate(segments)
+        ]
+        # 尚未確定是否結束的項目文字 (前一個區段的最後一個項目)
+        carry = None
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # map 依提交順序傳回結果，先完成的區段會等待前面的區段寫出
+            for part_path, count, part_stats, head, tail in executor.map(_convert_segment, tasks):
+                stats["processed"] += part_stats["processed"]
+                stats["skipped"] += part_stats["skipped"]
+                if head is not None:
+                    carry = head if carry is None else carry + "\n" + head
+                # 區段中出現新的項目，代表先前的項目已結束
+                if carry is not None and (count or tail is not None):
+                    emit(carry)
+                    carry = None
+                if count:
+                    out.write(separator())
+                with open(part_path, "r", encoding="utf-8") as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(part_path)
+                if tail is not None:
+                    carry = tail
+        if carry is not None:
+            emit(carry)
+        if fmt == "json":
+            out.write("[]" if first else "\n]")
+
+# --- 彙總查詢 ---
+class TimeBucketer:
+    """將紀錄時間戳記對齊至固定長度的時間桶起點 (以秒數計，自 1970-01-01 起對齊)。"""
+
+    EPOCH = datetime.datetime(1970, 1, 1)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.last_second = None
+        self.last_label = ""
+
+    def __call__(self, timestamp):
+        second = timestamp[:19]
+        # 相鄰項目多半落在同一秒，沿用上一次的結果
+        if second != self.last_second:
+            self.last_second = second
+            try:
+                offset = int((datetime.datetime.fromisoformat(second) - self.EPOCH).total_seconds())
+            except ValueError:
+                self.last_label = ""
+            else:
+                start = self.EPOCH + datetime.timedelta(seconds=offset - offset % self.seconds)
+                self.last_label = start.strftime("%Y-%m-%d %H:%M:%S")
+        return self.last_label
+
+class GroupCounter:
+    """以有界記憶體累計各群組的項目數與數值指標 (總和、最大值)。
+
+    群組數超過 max_groups 時捨棄計數上限較低的一半 (lossy counting)，error 記錄被捨棄群組的
+    最大計數上限。之後才加入的群組以當時的 error 作為可能遺漏的計數 (delta)，因此每個保留群組的
+    實際計數介於 count 與 count + delta 之間 (delta <= error)，未保留的群組實際計數不超過 error。"""
+
+    def __init__(self, max_groups):
+        self.max_groups = max(1, max_groups)
+        self.groups = {}
+        self.error = 0
+
+    def add(self, key, value=None):
+        group = self.groups.get(key)
+        if group is None:
+            if len(self.groups) >= self.max_groups:
+                self._prune()
+            # [計數, 有數值的項目數, 總和, 最大值, 加入前可能遺漏的計數]
+            group = self.groups[key] = [0, 0, 0.0, None, self.error]
+        group[0] += 1
+        if value is not None:
+            group[1] += 1
+            group[2] += value
+            group[3] = value if group[3] is None else max(group[3], value)
+
+    def _prune(self):
+        ranked = sorted(self.groups.items(), key=lambda item: item[1][0] + item[1][4], reverse=True)
+        keep = self.max_groups // 2
+        self.error = max(self.error, max((g[0] + g[4] for _, g in ranked[keep:]), default=0))
+        self.groups = dict(ranked[:keep])
+
+    def rows(self, sort="count", top=0):
+        """依 sort 排序 (key 為分組鍵遞增，其餘為遞減)，傳回 (分組鍵, 計數, 總和, 平均, 最大值) 清單。"""
+        rows = []
+        for key, (count, n_values, total, peak, _) in self.groups.items():
+            avg = total / n_values if n_values else None
+            rows.append((key, count, total if n_values else None, avg, peak))
+        if sort == "key":
+            rows.sort(key=lambda row: row[0])
+        else:
+            index = {"count": 1, "sum": 2, "avg": 3, "max": 4}[sort]
+            rows.sort(key=lambda row: (row[index] is not None, row[index] or 0), reverse=True)
+        return rows[:top] if top > 0 else rows
+
+def aggregate(entries, group_by, filters=(), bucketer=None, metric=None, max_groups=100000):
+    """單次掃描彙總紀錄項目，傳回 (GroupCounter, 符合條件的項目數)。
+
+    filters 為 (欄位, 值集合) 清單，值以不分大小寫比較；bucketer 提供時，
+    時間桶作為第一個分組欄位；metric 為從 body 擷取數值的正規表示式。"""
+    counter = GroupCounter(max_groups)
+    matched = 0
+    for entry in entries:
+        if any(entry[field].strip().casefold() not in values for field, values in filters):
+            continue
+        matched += 1
+        key = tuple(entry[field] for field in group_by)
+        if bucketer is not None:
+            key = (bucketer(entry["timestamp"]),) + key
+        value = None
+        if metric is not None:
+            match = metric.search(entry["body"])
+            if match:
+                try:
+                    value = float(match.group(1))
+                except (TypeError, ValueError):
+                    pass
+        counter.add(key, value)
+    return counter, matched
+
+def _format_number(value):
+    if value is None:
+        return ""
+    return str(int(value)) if float(value).is_integer() else f"{value:.2f}"
+
+def print_summary(counter, columns, with_metric, fmt="table", sort="count", top=20, out=sys.stdout):
+    """輸出彙總結果：table 為對齊的精簡表格，json 為物件陣列。"""
+    rows = counter.rows(sort, top)
+    if fmt == "json":
+        records = []
+        for key, count, total, avg, peak in rows:
+            record = dict(zip(columns, key))
+            record["count"] = count
+            if with_metric:
+                record.update({"sum": total, "avg": avg, "max": peak})
+            records.append(record)
+        out.write(json.dumps(records, indent=2, ensure_ascii=False) + "\n")
+        return
+    header = list(columns) + ["count"] + (["sum", "avg", "max"] if with_metric else [])
+    table = [header]
+    for key, count, total, avg, peak in rows:
+        cells = [str(k) for k in key] + [str(count)]
+        if with_metric:
+            cells += [_format_number(total), _format_number(avg), _format_number(peak)]
+        table.append(cells)
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    for row in table:
+        out.write("  ".join(
+            cell.rjust(width) if i >= len(columns) else cell.ljust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        ).rstrip() + "\n")
+
+def run_stats(args):
+    """stats 子命令：串流解析並彙總紀錄，不產生 JSON 中間檔。"""
+    filters = [f for f in (args.level, args.event) if f] + args.where
+    bucketer = TimeBucketer(args.bucket) if args.bucket else None
+    columns = (["bucket"] if bucketer else []) + args.group_by
+    stats = {"processed": 0, "skipped": 0}
+    try:
+        paths = order_inputs(expand_inputs(args.input))
+        counter, matched = aggregate(iter_entries(iter_input_lines(paths), stats), args.group_by, filters,
+                                     bucketer, args.metric, args.max_groups)
+    except BrokenPipeError:
+        # 下游已關閉管線 (例如 | head)，不是輸入錯誤，交由 _run 結束
+        raise
+    except (OSError, EOFError, lzma.LZMAError, UnicodeDecodeError) as e:
+        sys.stderr.write(f"無法開啟輸入檔案：{e}\n")
+        sys.exit(1)
+
+    print_summary(counter, columns, args.metric is not None, args.format, args.sort, args.top)
+    sys.stderr.write(
+        f"已處理：{stats['processed']} 條項目，已跳過：{stats['skipped']} 條項目，"
+        f"符合條件：{matched} 條項目，群組數：{len(counter.groups)}\n"
+    )
+    if counter.error:
+        sys.stderr.write(
+            f"群組數超過 --max-groups，各群組的計數與指標可能低估至多 {counter.error} 條項目；"
+            f"未列出的群組計數皆不超過 {counter.error}\n"
+        )
+
 def main():
+    # stats 子命令：彙總查詢；其餘引數維持原本的轉換用法
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        run_stats(parse_stats_args(sys.argv[2:]))
+        return
+
     args = parse_args()
-    
+
     # 處理可能的多個 --include 或 --exclude 引數
     include_fields = [item for sublist in args.include for item in sublist] if args.include else None
     exclude_fields = [item for sublist in args.exclude for item in sublist] if args.exclude else None
 
-    # 用於匹配 Simplicité 紀錄格式的正規表示式
-    log_regex = re.compile(r"^(?P<timestamp>.*?)\|(?P<app>SIMPLICITE)\|(?P<level>.+?)\|\|(?P<endpoint>.*?)\|(?P<contextPath>.*?)\|(?P<event>.*?)\|(?P<user>.*?)\|(?P<class>.*?)\|(?P<function>.*?)\|(?P<rowId>.*?)\|(?P<body>.*)$", re.DOTALL)
-    # 用於識別新紀錄項目起始時間戳記的正規表示式
-    timestamp_re = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}")
-    
-    entries = []
-    buffer = []
-    processed = 0
-    skipped = 0
-    
-    try:
-        with open(args.input, "r", encoding="utf-8") as f:
-            for line in f:
-                line_stripped = line.rstrip('\n')
-                
-                # 如果該行以時間戳記開始，代表是一個新的紀錄項目
-                if timestamp_re.match(line_stripped):
-                    if buffer:
-                        # 處理緩衝區中的前一個紀錄項目
-                        entry_text = '\n'.join(buffer)
-                        entry = parse_log_entry(entry_text, log_regex)
-                        if entry:
-                            entries.append(entry)
-                            processed += 1
-                        else:
-                            skipped += 1
-                        buffer = []
-                
-                buffer.append(line_stripped)
-                
-            # 處理最後一個紀錄項目
-            if buffer:
-                entry_text = '\n'.join(buffer)
-                entry = parse_log_entry(entry_text, log_regex)
-                if entry:
-                    entries.append(entry)
-                    processed += 1
-                else:
-                    skipped += 1
-    except Exception as e:
-        sys.stderr.write(f"無法開啟輸入檔案：{e}\n")
-        sys.exit(1)
-        
-    # 套用欄位過濾
-    filtered = [filter_entry(entry, include_fields, exclude_fields) for entry in entries]
-    json_str = json.dumps(filtered, indent=2, ensure_ascii=False)
-    
-    # 輸出結果
     if args.output:
         try:
-            with open(args.output, "w", encoding="utf-8") as f:
-                f.write(json_str)
+            out = open(args.output, "w", encoding="utf-8")
         except Exception as e:
             sys.stderr.write(f"無法建立輸出檔案：{e}\n")
             sys.exit(1)
     else:
-        print(json_str)
-        
-    sys.stderr.write(f"已處理：{processed} 條項目，已跳過：{skipped} 條項目\n")
+        out = sys.stdout
+
+    stats = {"processed": 0, "skipped": 0}
+    try:
+        paths = order_inputs(expand_inputs(args.input))
+        if args.follow and _compressed_opener(paths[-1]):
+            raise OSError(f"無法追蹤壓縮檔：{paths[-1]}")
+        if args.jobs > 1:
+            convert_parallel(paths, out, args.format, include_fields, exclude_fields, args.jobs, stats)
+        else:
+            lines = iter_input_lines(paths, follow=args.follow)
+            entries = (filter_entry(entry, include_fields, exclude_fields) for entry in iter_entries(lines, stats))
+            write_entries(out, entries, args.format, flush=args.follow)
+    except BrokenPipeError:
+        # 下游已關閉管線 (例如 | head)，不是輸入錯誤，交由 _run 結束
+        raise
+    except (OSError, EOFError, lzma.LZMAError, UnicodeDecodeError) as e:
+        sys.stderr.write(f"無法開啟輸入檔案：{e}\n")
+        sys.exit(1)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if out is sys.stdout and args.format == "json":
+        print()
+
+    sys.stderr.write(f"已處理：{stats['processed']} 條項目，已跳過：{stats['skipped']} 條項目\n")
+
+def _run():
+    try:
+        main()
+    except BrokenPipeError:
+        # 下游已關閉管線：將 stdout 導向 devnull，避免結束時清空緩衝區再次失敗，
+        # 並以 SIGPIPE 慣用的結束碼 (128 + 13) 安靜結束
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(141)
 
 if __name__ == "__main__":
-    main()
+    _run()
@@ -13,22 +13,38 @@
         --tables "dbo.Orders,dbo.Items" \
         --auth entra \
         --output console \
-        --chunk-size 100000
+        --chunk-size 100000 \
+        --spill-dir reconciliation_spill \
+        --workers 4 \
+        --table-timeout 600
 
 認證所需的環境變數 (當 --auth 為 sql 時)：
     MSSQL_USER       - SQL Server 使用者名稱
     MSSQL_PASSWORD   - SQL Server 密碼
+
+本機測試 (以 SQLite 檔案代替 SQL Server，資料表以 main.<名稱> 指定)：
+    python reconcile.py --dialect sqlite \
+        --source-server src.db --source-database main \
+        --target-server tgt.db --target-database main \
+        --tables "main.*"
 """
 
 import argparse
+import bisect
+import hashlib
 import os
+import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from getpass import getpass
 
 import pandas as pd
 import pyarrow as pa
 import pyarrow.compute as pc
-from mssql_python import connect as mssql_connect
+import pyarrow.parquet as pq
 
 
 # --- 連線設定 ---
@@ -36,6 +52,8 @@ def connect(server, database, auth_mode, user=None, password=None):
     """使用 mssql-python 驅動程式進行連線。
 
     從環境變數讀取認證資訊或進行互動式提示。絕不硬編碼。"""
+    from mssql_python import connect as mssql_connect
+
     if auth_mode == "sql":
         user = user or os.environ.get("MSSQL_USER") or input("使用者名稱：")
         password = password or os.environ.get("MSSQL_PASSWORD") or getpass("密碼：")
@@ -54,6 +72,322 @@ def connect(server, database, auth_mode, user=None, password=None):
     return mssql_connect(conn_str)
 
 
+def _sqlite_row_hash(*values):
+    # repr 保留型別與字串跳脫，不同的值組合不會產生相同的輸入
+    return hashlib.sha256(repr(values).encode("utf-8")).digest()
+
+
+def connect_sqlite(path):
+    """開啟 SQLite 檔案作為本機替代連線 (見 SqliteDialect)，供不連線 SQL Server 的測試使用。"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.create_function("row_hash", -1, _sqlite_row_hash, deterministic=True)
+    return conn
+
+
+# --- SQL 方言 ---
+class SqlServerDialect:
+    """SQL Server 的方言相關 SQL：中繼資料查詢、主鍵排序、資料列雜湊、主鍵清單與查詢逾時/取消。
+
+    核對流程只透過此介面產生方言相關的 SQL；SqliteDialect 提供相同介面的本機替代實作。"""
+
+    # 字元型主鍵以二進位定序排序，使伺服器端的順序與 Arrow/Python 的字串比較一致
+    PK_ORDER_COLLATION = "Latin1_General_BIN2"
+    CHAR_TYPES = {"char", "varchar", "nchar", "nvarchar", "text", "ntext"}
+    # uniqueidentifier 依位元組群組排序 (最後 6 個位元組優先)，與字串順序不同；
+    # 以 36 字元的字串形式擷取並排序
+    GUID_TYPES = {"uniqueidentifier"}
+    # 無法在用戶端以相同順序比較的主鍵類型
+    UNORDERABLE_KEY_TYPES = {"sql_variant", "xml", "image", "geography", "geometry", "hierarchyid"}
+    # 資料列雜湊中各類型轉為字串的確定性 CONVERT 樣式 (不受語言與日期格式設定影響且不失精度)
+    HASH_CONVERT_STYLES = {
+        "float": 3, "real": 3,  # 可還原原值的 17 / 9 位有效數字
+        "date": 126, "time": 126, "datetime": 126, "datetime2": 126,
+        "smalldatetime": 126, "datetimeoffset": 126,
+        "money": 2, "smallmoney": 2,  # 4 位小數
+        "binary": 1, "varbinary": 1, "timestamp": 1, "rowversion": 1,  # 0x 十六進位
+    }
+    # 無法直接轉為字串的類型先轉為 varbinary(max)
+    HASH_BINARY_TYPES = {"image", "geography", "geometry", "hierarchyid"}
+
+    def tables_query(self, schema):
+        return """
+        SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = ? AND TABLE_TYPE = 'BASE TABLE'
+        ORDER BY TABLE_NAME
+        """, [schema]
+
+    def columns_query(self, schema, table):
+        return """
+        SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, CHARACTER_MAXIMUM_LENGTH,
+               NUMERIC_PRECISION, NUMERIC_SCALE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = ?
+          AND TABLE_NAME = ?
+        ORDER BY ORDINAL_POSITION
+        """, [schema, table]
+
+    def primary_key_query(self, schema, table):
+        return """
+        SELECT c.name
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+        JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+        WHERE i.is_primary_key = 1
+          AND OBJECT_SCHEMA_NAME(i.object_id) = ?
+          AND OBJECT_NAME(i.object_id) = ?
+        ORDER BY ic.key_ordinal
+        """, [schema, table]
+
+    def key_supported(self, data_type):
+        """主鍵資料欄的類型能否在伺服器端與用戶端以相同順序排序。"""
+        return data_type not in self.UNORDERABLE_KEY_TYPES
+
+    def key_select(self, column, data_type):
+        """主鍵資料欄在 SELECT 清單中的運算式 (不含別名)。"""
+        if data_type in self.GUID_TYPES:
+            return f"CONVERT(char(36), {column})"
+        return column
+
+    def key_order(self, column, data_type):
+        """主鍵資料欄的 ORDER BY 運算式。"""
+        if data_type in self.CHAR_TYPES or data_type in self.GUID_TYPES:
+            return f"{self.key_select(column, data_type)} COLLATE {self.PK_ORDER_COLLATION}"
+        return column
+
+    def hash_value(self, column, data_type):
+        """單一資料欄在資料列雜湊中的字串運算式。
+
+        NULL 編碼為 N'N'，其他值為 N'V' + 位元組長度 + N':' + 確定性樣式的字串，
+        因此 NULL 與空字串、以及資料欄之間的邊界都不會混淆。"""
+        if data_type in self.HASH_BINARY_TYPES:
+            text = f"CONVERT(nvarchar(max), CONVERT(varbinary(max), {column}), 1)"
+        elif data_type in self.HASH_CONVERT_STYLES:
+            text = f"CONVERT(nvarchar(max), {column}, {self.HASH_CONVERT_STYLES[data_type]})"
+        else:
+            text = f"CONVERT(nvarchar(max), {column})"
+        return (f"CASE WHEN {column} IS NULL THEN N'N' "
+                f"ELSE N'V' + CONVERT(nvarchar(20), DATALENGTH({text})) + N':' + {text} END")
+
+    def row_hash(self, columns, types=None):
+        """資料列雜湊運算式；types 為資料欄名稱 (小寫) 對應類型的 dict。"""
+        types = types or {}
+        parts = " + ".join(self.hash_value(c, types.get(c.lower(), "")) for c in columns) or "N''"
+        return f"HASHBYTES('SHA2_256', {parts})"
+
+    def keys_table(self, n_rows, n_cols):
+        """n_rows 列、資料欄為 k0..k{n_cols-1} 的參數化 VALUES 衍生資料表。"""
+        row = "(" + ", ".join("?" * n_cols) + ")"
+        names = ", ".join(f"k{i}" for i in range(n_cols))
+        return f"(VALUES {', '.join([row] * n_rows)}) AS k ({names})"
+
+    def set_timeout(self, conn, seconds):
+        """設定驅動程式的查詢逾時 (秒，0 為不限)；驅動程式不支援時忽略。"""
+        if hasattr(conn, "timeout"):
+            try:
+                conn.timeout = seconds
+            except Exception:
+                pass
+
+    def cancel(self, conn, cursor):
+        """由其他執行緒中斷執行中的查詢；驅動程式不支援取消時關閉連線。"""
+        cancel = getattr(cursor, "cancel", None)
+        if cancel is not None:
+            cancel()
+        else:
+            conn.close()
+
+
+class SqliteDialect(SqlServerDialect):
+    """以 SQLite 模擬的本機替代方言：schema 為 SQLite 資料庫名稱 (通常為 main)。"""
+
+    def tables_query(self, schema):
+        return f"""
+        SELECT name AS TABLE_NAME FROM "{schema}".sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+        """, []
+
+    def columns_query(self, schema, table):
+        return """
+        SELECT name AS COLUMN_NAME, lower(type) AS DATA_TYPE,
+               CASE "notnull" WHEN 1 THEN 'NO' ELSE 'YES' END AS IS_NULLABLE,
+               NULL AS CHARACTER_MAXIMUM_LENGTH, NULL AS NUMERIC_PRECISION, NULL AS NUMERIC_SCALE
+        FROM pragma_table_info(?, ?)
+        ORDER BY cid
+        """, [table, schema]
+
+    def primary_key_query(self, schema, table):
+        return "SELECT name FROM pragma_table_info(?, ?) WHERE pk > 0 ORDER BY pk", [table, schema]
+
+    def key_supported(self, data_type):
+        return True
+
+    def key_select(self, column, data_type):
+        return column
+
+    def key_order(self, column, data_type):
+        # SQLite 預設的 BINARY 定序即依位元組排序
+        return column
+
+    def row_hash(self, columns, types=None):
+        return f"row_hash({', '.join(columns)})"
+
+    def keys_table(self, n_rows, n_cols):
+        row = "(" + ", ".join("?" * n_cols) + ")"
+        names = ", ".join(f"column{i + 1} AS k{i}" for i in range(n_cols))
+        return f"(SELECT {names} FROM (VALUES {', '.join([row] * n_rows)})) AS k"
+
+    def set_timeout(self, conn, seconds):
+        pass
+
+    def cancel(self, conn, cursor):
+        conn.interrupt()
+
+
+SQLSERVER = SqlServerDialect()
+SQLITE = SqliteDialect()
+
+
+def dialect_for(conn):
+    """依連線類型選擇 SQL 方言。"""
+    return SQLITE if isinstance(conn, sqlite3.Connection) else SQLSERVER
+
+
+# --- 查詢執行與逾時 ---
+_local = threading.local()
+
+
+class _Watchdog:
+    """單一資料表的逾時看門狗。
+
+    期間內以 _execute 建立的資料指標都會設定驅動程式查詢逾時 (剩餘秒數)；
+    時限到達時由計時器執行緒取消這些查詢，使長時間的 execute 或停滯的擷取也會中斷。"""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.fired = False
+        self.active = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def __enter__(self):
+        if self.deadline is not None:
+            self.timer = threading.Timer(max(0.0, self.deadline - time.monotonic()), self._fire)
+            self.timer.daemon = True
+            self.timer.start()
+        _local.watchdog = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.watchdog = None
+        if self.timer is not None:
+            self.timer.cancel()
+        with self.lock:
+            for conn, _ in self.active:
+                dialect_for(conn).set_timeout(conn, 0)
+            self.active = []
+        return False
+
+    def track(self, conn, cursor):
+        if self.deadline is None:
+            return
+        with self.lock:
+            if self.fired:
+                raise TableTimeout()
+            self.active.append((conn, cursor))
+        dialect_for(conn).set_timeout(conn, max(1, int(self.deadline - time.monotonic())))
+
+    def _fire(self):
+        with self.lock:
+            self.fired = True
+            active = list(self.active)
+        for conn, cursor in active:
+            try:
+                dialect_for(conn).cancel(conn, cursor)
+            except Exception:
+                pass
+
+
+def _execute(conn, query, params=None):
+    """執行查詢並傳回資料指標；在資料表看門狗期間內會受其逾時控制。"""
+    cur = conn.cursor()
+    watchdog = getattr(_local, "watchdog", None)
+    if watchdog is not None:
+        watchdog.track(conn, cur)
+    if params:
+        cur.execute(query, params)
+    else:
+        cur.execute(query)
+    return cur
+
+
+def _fetch_frame(cur):
+    """將查詢結果讀為 DataFrame；驅動程式不支援 Arrow 時改用 fetchall。"""
+    if hasattr(cur, "arrow"):
+        return cur.arrow().to_pandas()
+    return pd.DataFrame.from_records(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+
+class ConnectionPool:
+    """單一伺服器的有界連線池。
+
+    最多建立 size 條連線 (首次需要時才建立)，超過時 acquire() 會等待其他工作釋放或捨棄連線。
+    factory 為無參數的連線函式，測試時可替換為 SQLite 等替代品 (見 connect_sqlite)。"""
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self.idle = []  # 後進先出，優先重用最近歸還的連線
+        self.created = 0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def acquire(self):
+        """借出一條連線；區塊內發生例外時關閉該連線而不放回池中 (可能留有未讀完的結果集)。"""
+        conn = self._get()
+        try:
+            yield conn
+        except BaseException:
+            self._discard(conn)
+            raise
+        else:
+            with self.cond:
+                self.idle.append(conn)
+                self.cond.notify()
+
+    def _get(self):
+        with self.cond:
+            while not self.idle and self.created >= self.size:
+                self.cond.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+        try:
+            return self.factory()
+        except BaseException:
+            self._release_slot()
+            raise
+
+    def _release_slot(self):
+        # 釋出一個名額並喚醒等待者，讓它建立新連線
+        with self.cond:
+            self.created -= 1
+            self.cond.notify()
+
+    def _discard(self, conn):
+        self._release_slot()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.cond:
+            conns, self.idle = self.idle, []
+        for conn in conns:
+            self._discard(conn)
+
+
 # --- 資料表解析 ---
 def resolve_tables(conn, table_spec):
     """將資料表規格解析為 schema.table 名稱清單。
@@ -64,14 +398,7 @@ def resolve_tables(conn, table_spec):
         spec = spec.strip()
         schema, tbl = spec.split(".")
         if tbl == "*":
-            query = """
-            SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_SCHEMA = ? AND TABLE_TYPE = 'BASE TABLE'
-            ORDER BY TABLE_NAME
-            """
-            cur = conn.cursor()
-            cur.execute(query, [schema])
-            rows = cur.arrow().to_pandas()
+            rows = _fetch_frame(_execute(conn, *dialect_for(conn).tables_query(schema)))
             tables.extend(f"{schema}.{t}" for t in rows["TABLE_NAME"])
         else:
             tables.append(spec)
@@ -79,25 +406,16 @@ def resolve_tables(conn, table_spec):
 
 
 # --- 架構比較 ---
-def compare_schema(source_conn, target_conn, table):
-    """比較資料欄名稱、類型、是否可為 NULL。傳回漂移報告與共通資料欄。"""
-    query = """
-    SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, CHARACTER_MAXIMUM_LENGTH,
-           NUMERIC_PRECISION, NUMERIC_SCALE
-    FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = ?
-      AND TABLE_NAME = ?
-    ORDER BY ORDINAL_POSITION
-    """
+def table_columns(conn, table):
+    """讀取資料表的資料欄中繼資料 (COLUMN_NAME、DATA_TYPE 等) 為 DataFrame。"""
     schema_name, table_name = table.split(".")
+    return _fetch_frame(_execute(conn, *dialect_for(conn).columns_query(schema_name, table_name)))
 
-    src_cur = source_conn.cursor()
-    src_cur.execute(query, [schema_name, table_name])
-    source_schema = src_cur.arrow().to_pandas()
 
-    tgt_cur = target_conn.cursor()
-    tgt_cur.execute(query, [schema_name, table_name])
-    target_schema = tgt_cur.arrow().to_pandas()
+def compare_schema(source_conn, target_conn, table):
+    """比較資料欄名稱、類型、是否可為 NULL。傳回漂移報告與共通資料欄。"""
+    source_schema = table_columns(source_conn, table)
+    target_schema = table_columns(target_conn, table)
 
     src_cols = set(source_schema["COLUMN_NAME"])
     tgt_cols = set(target_schema["COLUMN_NAME"])
@@ -129,87 +447,429 @@ def compare_schema(source_conn, target_conn, table):
 
 # --- 主鍵偵測 ---
 def detect_primary_key(conn, table):
-    """從 sys.index_columns 自動偵測主鍵資料欄。"""
+    """從 sys.index_columns (SQLite 為 pragma_table_info) 自動偵測主鍵資料欄。"""
     schema, tbl = table.split(".")
-    query = """
-    SELECT c.name
-    FROM sys.indexes i
-    JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-    JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
-    WHERE i.is_primary_key = 1
-      AND OBJECT_SCHEMA_NAME(i.object_id) = ?
-      AND OBJECT_NAME(i.object_id) = ?
-    ORDER BY ic.key_ordinal
-    """
-    cur = conn.cursor()
-    cur.execute(query, [schema, tbl])
-    result = cur.arrow()
-    return result.column("name").to_pylist()
+    return _fetch_frame(_execute(conn, *dialect_for(conn).primary_key_query(schema, tbl)))["name"].tolist()
 
 
 # --- 資料擷取 (Arrow) ---
-def extract_table(conn, table, pk_cols, chunk_size=100000):
-    """使用 Arrow 資料行傳輸，將資料表資料擷取為 Arrow Table。"""
-    pk_order = ", ".join(pk_cols)
-    query = f"SELECT * FROM {table} ORDER BY {pk_order}"
-    cur = conn.cursor()
-    cur.execute(query)
-    return cur.arrow()
+def pk_key_types(conn, table, pk_cols):
+    """讀取主鍵資料欄的類型 (小寫)，供 _key_sql 產生擷取與排序運算式。"""
+    columns = table_columns(conn, table)
+    types = dict(zip(columns["COLUMN_NAME"].str.lower(), columns["DATA_TYPE"].str.lower()))
+    return {c: types.get(c.lower(), "") for c in pk_cols}
+
+
+def _key_sql(conn, pk_cols, key_types=None, prefix=""):
+    """傳回主鍵的 SELECT 運算式清單與 ORDER BY 子句。
+
+    字元型主鍵以二進位定序排序；uniqueidentifier 以字串形式擷取與排序 (見 SqlServerDialect)。"""
+    dialect = dialect_for(conn)
+    key_types = key_types or {}
+    select, order = [], []
+    for c in pk_cols:
+        data_type = key_types.get(c, "")
+        expr = dialect.key_select(prefix + c, data_type)
+        select.append(expr if expr == prefix + c else f"{expr} AS {c}")
+        order.append(dialect.key_order(prefix + c, data_type))
+    return select, ", ".join(order)
+
+
+def fetch_batches(cur, chunk_size):
+    """從已執行的資料指標以每批 chunk_size 列串流讀取 Arrow RecordBatch。"""
+    if hasattr(cur, "arrow_reader"):
+        for batch in cur.arrow_reader(batch_size=chunk_size):
+            if batch.num_rows:
+                yield batch
+        return
+    # 驅動程式不支援 Arrow 串流讀取時，以 fetchmany 逐批轉換
+    names = [d[0] for d in cur.description]
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(col) for col in zip(*rows)], names=names
+        )
+
+
+def extract_table(conn, table, pk_cols, chunk_size=100000, columns=None, key_types=None):
+    """依主鍵順序擷取資料表，以 Arrow RecordBatch 逐批產出。
+
+    僅擷取主鍵與 columns 指定的資料欄 (未指定時為全部資料欄)，記憶體用量與 chunk_size 成正比。
+    key_types 為 pk_key_types 的結果，決定主鍵的擷取與排序運算式。"""
+    key_select, order_by = _key_sql(conn, pk_cols, key_types)
+    if not columns and key_select != pk_cols:
+        # 主鍵需要轉換時不能使用 *，改為列出全部資料欄
+        columns = table_columns(conn, table)["COLUMN_NAME"].tolist()
+    select = ", ".join(key_select + [c for c in columns if c not in pk_cols]) if columns else "*"
+    query = f"SELECT {select} FROM {table} ORDER BY {order_by}"
+    yield from fetch_batches(_execute(conn, query), chunk_size)
 
 
 # --- 雜湊預檢查 (適用於大型資料表) ---
-def extract_hashes(conn, table, pk_cols, compare_cols):
-    """針對大型資料表優化，擷取主鍵與資料列雜湊。"""
-    pk_select = ", ".join(pk_cols)
-    col_concat = ", ".join(compare_cols)
+# SQL Server 單一查詢最多 2100 個參數，依主鍵資料欄數決定每次查詢的主鍵數
+_MAX_QUERY_PARAMS = 2000
+
+
+def extract_hashes(conn, table, pk_cols, compare_cols, chunk_size=100000, key_types=None):
+    """針對大型資料表優化，依主鍵順序以 Arrow RecordBatch 逐批擷取主鍵與資料列雜湊。
+
+    雜湊依本端的資料欄類型選擇確定性的字串轉換 (見 SqlServerDialect.hash_value)。"""
+    key_select, order_by = _key_sql(conn, pk_cols, key_types)
+    columns = table_columns(conn, table)
+    types = dict(zip(columns["COLUMN_NAME"].str.lower(), columns["DATA_TYPE"].str.lower()))
     query = f"""
-    SELECT {pk_select},
-           HASHBYTES('SHA2_256', CONCAT_WS('|', {col_concat})) AS row_hash
+    SELECT {", ".join(key_select)},
+           {dialect_for(conn).row_hash(compare_cols, types)} AS row_hash
     FROM {table}
-    ORDER BY {pk_select}
+    ORDER BY {order_by}
     """
-    cur = conn.cursor()
-    cur.execute(query)
-    return cur.arrow()
+    yield from fetch_batches(_execute(conn, query), chunk_size)
+
+
+def extract_rows_by_keys(conn, table, pk_cols, columns, key_batches, key_types=None):
+    """僅擷取指定主鍵的資料列，依主鍵順序逐批產出。
+
+    主鍵以參數化的 VALUES 衍生資料表分批傳入並與資料表連接 (複合主鍵亦適用)；
+    key_batches 為依主鍵排序的 Arrow 批次串流，只需包含主鍵資料欄。"""
+    key_select, order_by = _key_sql(conn, pk_cols, key_types, prefix="t.")
+    select = ", ".join(key_select + [f"t.{c}" for c in columns if c not in pk_cols])
+    join_on = " AND ".join(f"t.{c} = k.k{i}" for i, c in enumerate(pk_cols))
+    per_query = max(1, _MAX_QUERY_PARAMS // len(pk_cols))
+    dialect = dialect_for(conn)
+
+    for batch in key_batches:
+        keys = list(zip(*(batch.column(c).to_pylist() for c in pk_cols)))
+        for start in range(0, len(keys), per_query):
+            part = keys[start:start + per_query]
+            query = f"""
+            SELECT {select}
+            FROM {table} AS t
+            JOIN {dialect.keys_table(len(part), len(pk_cols))} ON {join_on}
+            ORDER BY {order_by}
+            """
+            yield from fetch_batches(_execute(conn, query, [v for key in part for v in key]), per_query)
 
 
 # --- 核對邏輯 ---
-def reconcile(source_table, target_table, pk_cols, compare_cols):
-    """比較兩個 Arrow 資料表。
+class _KeyView:
+    """以主鍵 tuple 檢視已排序的 Arrow Table，供 bisect 二分搜尋。"""
+
+    def __init__(self, table, pk_cols):
+        self.columns = [table.column(c) for c in pk_cols]
+        self.num_rows = table.num_rows
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, i):
+        return tuple(col[i].as_py() for col in self.columns)
+
+
+class TableTimeout(Exception):
+    """單一資料表的核對超過時限。"""
+
+
+class _SortedStream:
+    """依主鍵排序的批次串流，緩衝區中保留尚未能判定的資料列。
+
+    指定 deadline (time.monotonic() 時間點) 時，超過時限後讀取下一批會引發 TableTimeout。"""
+
+    def __init__(self, batches, pk_cols, deadline=None):
+        self.batches = iter(batches.to_batches() if isinstance(batches, pa.Table) else batches)
+        self.pk_cols = pk_cols
+        self.deadline = deadline
+        self.buffer = None
+        self.done = False
+        self.total = 0
+
+    def fill(self):
+        """緩衝區為空時讀取下一個非空批次。"""
+        while not self.done and (self.buffer is None or self.buffer.num_rows == 0):
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise TableTimeout()
+            batch = next(self.batches, None)
+            if batch is None:
+                self.done = True
+            elif batch.num_rows:
+                self.total += batch.num_rows
+                self.buffer = pa.Table.from_batches([batch])
+
+    def last_key(self):
+        if self.done or self.buffer is None or self.buffer.num_rows == 0:
+            return None
+        return _KeyView(self.buffer, self.pk_cols)[self.buffer.num_rows - 1]
+
+    def take_until(self, frontier):
+        """取出主鍵 <= frontier 的資料列 (frontier 為 None 時取出全部)。"""
+        if self.buffer is None:
+            return None
+        n = self.buffer.num_rows if frontier is None else bisect.bisect_right(
+            _KeyView(self.buffer, self.pk_cols), frontier
+        )
+        part, self.buffer = self.buffer.slice(0, n), self.buffer.slice(n)
+        return part
+
+
+def _window_tables(src_part, tgt_part, cols, pk_cols):
+    """選取比較所需的資料欄並對齊兩側類型。
+
+    一側無資料時以另一側的結構建立空表；目標主鍵轉為來源主鍵類型；
+    整批皆為 NULL 而無法推斷類型的資料欄 (null 類型) 轉為另一側的類型。"""
+    src_part = src_part.select(cols) if src_part is not None else None
+    tgt_part = tgt_part.select(cols) if tgt_part is not None else None
+    if src_part is None:
+        src_part = tgt_part.schema.empty_table()
+    if tgt_part is None:
+        tgt_part = src_part.schema.empty_table()
+    for i, c in enumerate(cols):
+        src_type, tgt_type = src_part.schema.field(c).type, tgt_part.schema.field(c).type
+        if src_type == tgt_type and not pa.types.is_null(src_type):
+            continue
+        if pa.types.is_null(src_type):
+            src_type = tgt_type if not pa.types.is_null(tgt_type) else pa.string()
+            src_part = src_part.set_column(i, c, pc.cast(src_part.column(c), src_type))
+        if c in pk_cols or pa.types.is_null(tgt_type):
+            tgt_part = tgt_part.set_column(i, c, pc.cast(tgt_part.column(c), src_type))
+    return src_part, tgt_part
+
+
+def _mismatch_mask(src, tgt):
+    """逐列比較兩個資料行；NULL == NULL 與 NaN == NaN 視為匹配。"""
+    try:
+        ne = pc.not_equal(src, tgt)
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+        src, tgt = pc.cast(src, pa.string()), pc.cast(tgt, pa.string())
+        ne = pc.not_equal(src, tgt)
+    ne = pc.fill_null(ne, False)
+    if pa.types.is_floating(src.type) and pa.types.is_floating(tgt.type):
+        both_nan = pc.fill_null(pc.and_(pc.is_nan(src), pc.is_nan(tgt)), False)
+        ne = pc.and_(ne, pc.invert(both_nan))
+    return pc.or_(ne, pc.xor(pc.is_null(src), pc.is_null(tgt)))
+
+
+def _as_string(values):
+    try:
+        return pc.cast(values, pa.string())
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+        return pa.array([None if v is None else str(v) for v in values.to_pylist()], pa.string())
+
+
+class _SpillWriter:
+    """將差異資料列寫入 Parquet 檔案，第一次寫入時才建立檔案。"""
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        # 清除先前執行留下的檔案
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, table):
+        if table.num_rows == 0:
+            return
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def _merge_windows(src, tgt, pk_cols, cols):
+    """以主鍵合併連接兩個 _SortedStream，逐輪產出 (缺失, 多餘, 匹配) 三個 Arrow Table。
+
+    每輪只處理雙方緩衝區中主鍵 <= 較小的「最後主鍵」的資料列，其餘留待下一輪；
+    匹配表中兩側的 cols 分別以 __s / __t 為後綴。"""
+    while True:
+        src.fill()
+        tgt.fill()
+        src_last, tgt_last = src.last_key(), tgt.last_key()
+        if src.done and tgt.done:
+            frontier = None
+        elif src_last is None or tgt_last is None:
+            frontier = src_last if tgt_last is None else tgt_last
+        else:
+            frontier = min(src_last, tgt_last)
+        src_part = src.take_until(frontier)
+        tgt_part = tgt.take_until(frontier)
+        # 未結束的一側緩衝區必不為空，且至少一側會被取盡，因此雙方皆無資料列即代表兩側都已讀完
+        if not (src_part and src_part.num_rows) and not (tgt_part and tgt_part.num_rows):
+            return
+
+        left, right = _window_tables(src_part, tgt_part, pk_cols + cols, pk_cols)
+        # 標記欄位：外部連接後為 NULL 的一側即為缺少該主鍵
+        left = left.append_column("__src", pc.is_valid(left.column(pk_cols[0])))
+        right = right.append_column("__tgt", pc.is_valid(right.column(pk_cols[0])))
+        joined = left.join(right, keys=pk_cols, join_type="full outer",
+                           left_suffix="__s", right_suffix="__t", coalesce_keys=True)
+
+        in_src = pc.is_valid(joined.column("__src"))
+        in_tgt = pc.is_valid(joined.column("__tgt"))
+        yield (joined.filter(pc.invert(in_tgt)).select(pk_cols),
+               joined.filter(pc.invert(in_src)).select(pk_cols),
+               joined.filter(pc.and_(in_src, in_tgt)))
+
+
+class _DiffSpill:
+    """累計差異數量，並將缺失、多餘與不匹配的資料列寫入 spill_dir 下的 Parquet 檔案。"""
+
+    NAMES = ("missing_in_target", "extra_in_target", "mismatches")
+
+    def __init__(self, spill_dir, pk_cols, compare_cols):
+        self.pk_cols = pk_cols
+        self.compare_cols = compare_cols
+        self.writers = {
+            name: _SpillWriter(os.path.join(spill_dir, f"{name}.parquet")) for name in self.NAMES
+        }
+        self.counts = {name: 0 for name in self.NAMES}
+        self.column_counts = {c: 0 for c in compare_cols}
+
+    def add_keys(self, name, keys):
+        self.writers[name].write(keys)
+        self.counts[name] += keys.num_rows
+
+    def compare(self, matched):
+        """逐欄比較匹配的資料列，不匹配者以長格式 (主鍵, 資料欄, 來源值, 目標值) 寫出。"""
+        any_mismatch = None
+        for col in self.compare_cols:
+            mask = _mismatch_mask(matched.column(f"{col}__s"), matched.column(f"{col}__t"))
+            n_bad = pc.sum(mask).as_py() or 0
+            if not n_bad:
+                continue
+            self.column_counts[col] += n_bad
+            any_mismatch = mask if any_mismatch is None else pc.or_(any_mismatch, mask)
+            bad = matched.filter(mask)
+            self.writers["mismatches"].write(pa.table(
+                [bad.column(c) for c in self.pk_cols] + [
+                    pa.array([col] * bad.num_rows, pa.string()),
+                    _as_string(bad.column(f"{col}__s")),
+                    _as_string(bad.column(f"{col}__t")),
+                ],
+                names=self.pk_cols + ["column", "source_value", "target_value"],
+            ))
+        if any_mismatch is not None:
+            self.counts["mismatches"] += pc.sum(any_mismatch).as_py()
 
-    1. 轉換為以主鍵為索引的 pandas DataFrame
-    2. 識別缺失/多餘的資料列
-    3. 針對匹配的資料列比較資料欄位值
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+    def result(self, total_source, total_target):
+        return {
+            **self.counts,
+            "column_mismatches": {c: n for c, n in self.column_counts.items() if n},
+            "spill_files": {
+                name: w.path for name, w in self.writers.items() if os.path.exists(w.path)
+            },
+            "total_source": total_source,
+            "total_target": total_target,
+        }
+
+
+def reconcile(source_batches, target_batches, pk_cols, compare_cols, spill_dir=None, deadline=None):
+    """以主鍵合併連接 (merge join) 逐批比較兩個依主鍵排序的 Arrow 批次串流。
+
+    1. 每輪只處理雙方緩衝區中主鍵 <= 較小的「最後主鍵」的資料列，其餘留待下一輪
+    2. 以 Arrow 完整外部連接識別缺失/多餘的資料列
+    3. 針對匹配的資料列以 Arrow compute 比較資料欄位值
     4. 處理 NULL 對比非 NULL (NULL == NULL 視為匹配)
+
+    缺失、多餘與不匹配的資料列寫入 spill_dir 下的 Parquet 檔案，記憶體用量與資料表大小無關。
     """
-    src_df = source_table.to_pandas().set_index(pk_cols)
-    tgt_df = target_table.to_pandas().set_index(pk_cols)
-
-    # 缺失/多餘資料列
-    src_keys = set(src_df.index.tolist() if len(pk_cols) > 1 else src_df.index)
-    tgt_keys = set(tgt_df.index.tolist() if len(pk_cols) > 1 else tgt_df.index)
-    missing_in_target = src_keys - tgt_keys
-    extra_in_target = tgt_keys - src_keys
-    common_keys = src_keys & tgt_keys
-
-    # 針對共通資料列進行資料欄層級的不匹配檢查
-    common_src = src_df.loc[src_df.index.isin(common_keys), compare_cols]
-    common_tgt = tgt_df.loc[tgt_df.index.isin(common_keys), compare_cols]
-    diff = common_src.compare(common_tgt, keep_shape=False)
-
-    return {
-        "missing_in_target": missing_in_target,
-        "extra_in_target": extra_in_target,
-        "mismatches": diff,
-        "total_source": len(src_df),
-        "total_target": len(tgt_df),
-    }
+    src = _SortedStream(source_batches, pk_cols, deadline)
+    tgt = _SortedStream(target_batches, pk_cols, deadline)
+    spill = _DiffSpill(spill_dir or "reconciliation_spill", pk_cols, compare_cols)
+    try:
+        for missing, extra, matched in _merge_windows(src, tgt, pk_cols, compare_cols):
+            spill.add_keys("missing_in_target", missing)
+            spill.add_keys("extra_in_target", extra)
+            spill.compare(matched)
+    finally:
+        spill.close()
+    return spill.result(src.total, tgt.total)
+
+
+def reconcile_hashed(source_conn, target_conn, table, pk_cols, compare_cols,
+                     chunk_size=100000, key_types=None, spill_dir=None, deadline=None):
+    """雜湊優先的兩階段核對。
+
+    1. 串流比較雙方的 (主鍵, row_hash)，找出缺失、多餘與雜湊不同的主鍵
+       (雜湊不同的主鍵依主鍵排序後暫存於 spill_dir/hash_mismatch_keys.parquet)
+    2. 僅針對雜湊不同的主鍵擷取雙方完整資料列，逐欄比較
+
+    對於大部分相同的資料表，網路傳輸量約等於雜湊串流的大小。
+    """
+    spill_dir = spill_dir or "reconciliation_spill"
+    src = _SortedStream(
+        extract_hashes(source_conn, table, pk_cols, compare_cols, chunk_size, key_types), pk_cols, deadline)
+    tgt = _SortedStream(
+        extract_hashes(target_conn, table, pk_cols, compare_cols, chunk_size, key_types), pk_cols, deadline)
+    spill = _DiffSpill(spill_dir, pk_cols, compare_cols)
+    keys_writer = _SpillWriter(os.path.join(spill_dir, "hash_mismatch_keys.parquet"))
+    sort_keys = [(c, "ascending") for c in pk_cols]
+    try:
+        # 第一階段：比較雜湊串流
+        for missing, extra, matched in _merge_windows(src, tgt, pk_cols, ["row_hash"]):
+            spill.add_keys("missing_in_target", missing)
+            spill.add_keys("extra_in_target", extra)
+            mask = _mismatch_mask(matched.column("row_hash__s"), matched.column("row_hash__t"))
+            # 連接結果不保證順序，排序後寫出，使暫存檔整體依主鍵排序
+            keys_writer.write(matched.filter(mask).select(pk_cols).sort_by(sort_keys))
+        keys_writer.close()
+        print(f"  {table} 雜湊比較：{src.total:,} / {tgt.total:,} 列，"
+              f"{spill.counts['missing_in_target'] + spill.counts['extra_in_target']} 個主鍵僅存在於單側")
+
+        # 第二階段：僅擷取雜湊不同的資料列
+        if os.path.exists(keys_writer.path):
+            def key_batches():
+                yield from pq.ParquetFile(keys_writer.path).iter_batches(batch_size=chunk_size)
+
+            src_rows = _SortedStream(
+                extract_rows_by_keys(source_conn, table, pk_cols, compare_cols, key_batches(), key_types),
+                pk_cols, deadline)
+            tgt_rows = _SortedStream(
+                extract_rows_by_keys(target_conn, table, pk_cols, compare_cols, key_batches(), key_types),
+                pk_cols, deadline)
+            for missing, extra, matched in _merge_windows(src_rows, tgt_rows, pk_cols, compare_cols):
+                # 兩階段之間被新增或刪除的資料列
+                spill.add_keys("missing_in_target", missing)
+                spill.add_keys("extra_in_target", extra)
+                spill.compare(matched)
+            print(f"  {table} 完整比較：{src_rows.total:,} 列雜湊不同的資料列")
+    finally:
+        keys_writer.close()
+        spill.close()
+    return spill.result(src.total, tgt.total)
 
 
 # --- 個別資料表管線 ---
 def reconcile_table(source_conn, target_conn, table, pk_override=None, columns=None,
-                    chunk_size=100000):
-    """執行單一資料表的完整核對流程。傳回結果字典。"""
+                    chunk_size=100000, spill_dir="reconciliation_spill", mode="full", timeout=None):
+    """執行單一資料表的完整核對流程。傳回結果字典。
+
+    雙方依主鍵順序以每批 chunk_size 列串流擷取並逐批比較，差異寫入 spill_dir/<table>/。
+    mode 為 "hash" 時先比較資料列雜湊，僅擷取雜湊不同的資料列 (見 reconcile_hashed)。
+    指定 timeout (秒) 時，查詢設有驅動程式逾時並由看門狗在時限到達時取消，
+    批次之間亦會檢查時限；逾時引發 TableTimeout。"""
+    deadline = time.monotonic() + timeout if timeout else None
+    with _Watchdog(deadline) as watchdog:
+        try:
+            return _reconcile_table(source_conn, target_conn, table, pk_override, columns,
+                                    chunk_size, spill_dir, mode, deadline)
+        except Exception as e:
+            if watchdog.fired and not isinstance(e, TableTimeout):
+                # 被看門狗取消的查詢會以驅動程式的錯誤結束
+                raise TableTimeout() from e
+            raise
+
+
+def _reconcile_table(source_conn, target_conn, table, pk_override, columns,
+                     chunk_size, spill_dir, mode, deadline):
     schema_drift, common_cols = compare_schema(source_conn, target_conn, table)
 
     pk_cols = pk_override
@@ -222,20 +882,63 @@ def reconcile_table(source_conn, target_conn, table, pk_override=None, columns=N
 
     compare_cols = columns if columns else [c for c in common_cols if c not in pk_cols]
 
-    source_data = extract_table(source_conn, table, pk_cols, chunk_size)
-    target_data = extract_table(target_conn, table, pk_cols, chunk_size)
+    key_types = pk_key_types(source_conn, table, pk_cols)
+    dialect = dialect_for(source_conn)
+    unsupported = [f"{c} ({t})" for c, t in key_types.items() if not dialect.key_supported(t)]
+    if unsupported:
+        return {"table": table, "error": f"主鍵類型無法一致排序：{', '.join(unsupported)}",
+                "status": "SKIPPED"}
 
-    result = reconcile(source_data, target_data, pk_cols, compare_cols)
+    table_spill_dir = os.path.join(spill_dir, table)
+    if mode == "hash":
+        result = reconcile_hashed(source_conn, target_conn, table, pk_cols, compare_cols,
+                                  chunk_size, key_types, spill_dir=table_spill_dir, deadline=deadline)
+    else:
+        source_data = extract_table(source_conn, table, pk_cols, chunk_size, compare_cols, key_types)
+        target_data = extract_table(target_conn, table, pk_cols, chunk_size, compare_cols, key_types)
+        result = reconcile(source_data, target_data, pk_cols, compare_cols,
+                           spill_dir=table_spill_dir, deadline=deadline)
     result["table"] = table
     result["schema_drift"] = schema_drift
     result["status"] = (
         "PASS"
-        if not (result["missing_in_target"] or result["extra_in_target"] or len(result["mismatches"]))
+        if not (result["missing_in_target"] or result["extra_in_target"] or result["mismatches"])
         else "FAIL"
     )
     return result
 
 
+# --- 平行核對 ---
+def reconcile_tables(source_pool, target_pool, tables, workers=4, timeout=None, **table_kwargs):
+    """以 workers 個執行緒平行核對多個資料表，依完成順序串流輸出進度。
+
+    每個資料表各向來源與目標連線池借用一條連線 (一律先來源後目標，避免互相等待)；
+    逾時或發生錯誤的資料表標記為 SKIPPED，不影響其他資料表。
+    傳回與 tables 順序相同的結果清單。table_kwargs 傳給 reconcile_table。"""
+
+    def run(table):
+        start = time.monotonic()
+        try:
+            with source_pool.acquire() as source_conn, target_pool.acquire() as target_conn:
+                result = reconcile_table(source_conn, target_conn, table, timeout=timeout, **table_kwargs)
+        except TableTimeout:
+            result = {"table": table, "error": f"核對逾時 (超過 {timeout} 秒)", "status": "SKIPPED"}
+        except Exception as e:
+            result = {"table": table, "error": f"{type(e).__name__}: {e}", "status": "SKIPPED"}
+        result["elapsed"] = time.monotonic() - start
+        return result
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run, table): table for table in tables}
+        for done, future in enumerate(as_completed(futures), 1):
+            r = future.result()
+            results[futures[future]] = r
+            print(f"[{done}/{len(tables)}] {r['table']}：{r['status']} ({r['elapsed']:.1f} 秒)"
+                  + (f" - {r['error']}" if r.get("error") else ""), flush=True)
+    return [results[table] for table in tables]
+
+
 # --- 報告產生 ---
 def generate_report(all_results, output_format="console"):
     """輸出個別資料表詳細資訊與整合摘要。"""
@@ -246,9 +949,9 @@ def generate_report(all_results, output_format="console"):
             continue
         print(f"  來源：{r['total_source']:,}  目標：{r['total_target']:,}")
         print(
-            f"  缺失：{len(r['missing_in_target'])}  "
-            f"多餘：{len(r['extra_in_target'])}  "
-            f"不匹配：{len(r['mismatches'])}"
+            f"  缺失：{r['missing_in_target']}  "
+            f"多餘：{r['extra_in_target']}  "
+            f"不匹配：{r['mismatches']}"
         )
         print(
             f"  結果：{'✓ 內容一致' if r['status'] == 'PASS' else '✗ 發現差異'}"
@@ -257,6 +960,14 @@ def generate_report(all_results, output_format="console"):
             print("  架構漂移：")
             for d in r["schema_drift"]:
                 print(f"    {d}")
+        if r.get("column_mismatches"):
+            print("  不匹配資料欄：")
+            for col, n in r["column_mismatches"].items():
+                print(f"    {col}：{n}")
+        if r.get("spill_files"):
+            print("  差異明細：")
+            for name, path in r["spill_files"].items():
+                print(f"    {name}：{path}")
 
     # 摘要
     passed = sum(1 for r in all_results if r["status"] == "PASS")
@@ -275,9 +986,9 @@ def generate_report(all_results, output_format="console"):
                 "status": r["status"],
                 "source_rows": r.get("total_source", 0),
                 "target_rows": r.get("total_target", 0),
-                "missing": len(r.get("missing_in_target", [])),
-                "extra": len(r.get("extra_in_target", [])),
-                "mismatches": len(r.get("mismatches", [])),
+                "missing": r.get("missing_in_target", 0),
+                "extra": r.get("extra_in_target", 0),
+                "mismatches": r.get("mismatches", 0),
             }
             for r in all_results
         ]
@@ -293,9 +1004,9 @@ def generate_report(all_results, output_format="console"):
                 "status": r["status"],
                 "source_rows": r.get("total_source", 0),
                 "target_rows": r.get("total_target", 0),
-                "missing": len(r.get("missing_in_target", [])),
-                "extra": len(r.get("extra_in_target", [])),
-                "mismatches": len(r.get("mismatches", [])),
+                "missing": r.get("missing_in_target", 0),
+                "extra": r.get("extra_in_target", 0),
+                "mismatches": r.get("mismatches", 0),
             }
             for r in all_results
         ]
@@ -340,6 +1051,41 @@ def main():
         default=100000,
         help="大型資料表的每批處理列數 (預設：100000)",
     )
+    parser.add_argument(
+        "--mode",
+        choices=["full", "hash"],
+        default="full",
+        help="full：擷取完整資料列比較；hash：先比較資料列雜湊，僅擷取雜湊不同的資料列 (預設：full)",
+    )
+    parser.add_argument(
+        "--spill-dir",
+        default="reconciliation_spill",
+        help="缺失/多餘/不匹配資料列的 Parquet 輸出目錄 (預設：reconciliation_spill)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="平行核對的資料表數 (預設：4)",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=None,
+        help="每個伺服器的連線數上限 (預設：與 --workers 相同)",
+    )
+    parser.add_argument(
+        "--table-timeout",
+        type=float,
+        default=None,
+        help="單一資料表的核對時限 (秒)，逾時的資料表標記為跳過 (預設：不限)",
+    )
+    parser.add_argument(
+        "--dialect",
+        choices=["mssql", "sqlite"],
+        default="mssql",
+        help="mssql：SQL Server (預設)；sqlite：以 --source-server/--target-server 指定的 SQLite 檔案作為本機替代品",
+    )
     parser.add_argument(
         "--output",
         choices=["console", "csv", "json"],
@@ -351,26 +1097,43 @@ def main():
     pk_override = [c.strip() for c in args.primary_key.split(",")] if args.primary_key else None
     columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
 
-    print(f"正在連線至來源：{args.source_server}/{args.source_database}")
-    source_conn = connect(args.source_server, args.source_database, args.auth)
-
-    print(f"正在連線至目標：{args.target_server}/{args.target_database}")
-    target_conn = connect(args.target_server, args.target_database, args.auth)
-
-    tables = resolve_tables(source_conn, args.tables)
-    print(f"欲核對的資料表：{tables}")
-
-    results = []
-    for table in tables:
-        print(f"正在核對 {table}...")
-        results.append(
-            reconcile_table(
-                source_conn, target_conn, table,
-                pk_override=pk_override,
-                columns=columns,
-                chunk_size=args.chunk_size,
-            )
+    pool_size = args.max_connections or args.workers
+    if args.dialect == "sqlite":
+        source_pool = ConnectionPool(lambda: connect_sqlite(args.source_server), pool_size)
+        target_pool = ConnectionPool(lambda: connect_sqlite(args.target_server), pool_size)
+    else:
+        # 認證資訊只讀取一次，供連線池中的每條連線使用
+        user = password = None
+        if args.auth == "sql":
+            user = os.environ.get("MSSQL_USER") or input("使用者名稱：")
+            password = os.environ.get("MSSQL_PASSWORD") or getpass("密碼：")
+        source_pool = ConnectionPool(
+            lambda: connect(args.source_server, args.source_database, args.auth, user, password), pool_size
+        )
+        target_pool = ConnectionPool(
+            lambda: connect(args.target_server, args.target_database, args.auth, user, password), pool_size
+        )
+
+    try:
+        print(f"正在連線至來源：{args.source_server}/{args.source_database}")
+        with source_pool.acquire() as source_conn:
+            tables = resolve_tables(source_conn, args.tables)
+        print(f"欲核對的資料表：{tables}")
+        print(f"正在以 {args.workers} 個工作執行緒核對 (每個伺服器最多 {pool_size} 條連線)...")
+
+        results = reconcile_tables(
+            source_pool, target_pool, tables,
+            workers=args.workers,
+            timeout=args.table_timeout,
+            pk_override=pk_override,
+            columns=columns,
+            chunk_size=args.chunk_size,
+            spill_dir=args.spill_dir,
+            mode=args.mode,
         )
+    finally:
+        source_pool.close()
+        target_pool.close()
 
     generate_report(results, output_format=args.output)
 
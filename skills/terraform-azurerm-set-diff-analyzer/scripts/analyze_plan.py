@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
-# -*- coding: utf-8 -*-"""
+# -*- coding: utf-8 -*-
+"""
 用於 AzureRM Set 類型屬性的 Terraform 計畫分析器
 
 分析 terraform 計畫 (plan) JSON 輸出，以區分：
@@ -10,6 +11,7 @@
     terraform show -json plan.tfplan | python analyze_plan.py
     python analyze_plan.py plan.json
     python analyze_plan.py plan.json --format json --exit-code
+    python analyze_plan.py plan.json --jobs 8
 
 有關 CI/CD 管道用法，請參閱此目錄中的 README.md。
 """
@@ -18,10 +20,18 @@ from __future__ import annotations
 
 import argparse
 import json
+import re
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Set, Union
+
+try:
+    import ijson  # 選用：以 C 後端串流剖析大型計畫
+except ImportError:
+    ijson = None
 
 # --exit-code 選項的結束代碼
 EXIT_NO_CHANGES = 0
@@ -143,16 +153,6 @@ class AnalysisResult:
     warnings: List[str] = field(default_factory=list)
 
 
-def get_element_key(element: Dict[str, Any], key_attr: Optional[str]) -> str:
-    """從 Set 元素中提取鍵值 (key value)。"""
-    if key_attr and key_attr in element:
-        val = element[key_attr]
-        if CONFIG.ignore_case and isinstance(val, str):
-            return val.lower()
-        return str(val)
-    # 對於沒有鍵值屬性的元素，回傳排序後項目的雜湊值
-    return str(hash(json.dumps(element, sort_keys=True)))
-
 def normalize_value(val: Any) -> Any:
     """將值正規化以進行比較 (將空字串與 None 視為等價)。"""
     if val == "" or val is None:
@@ -171,12 +171,119 @@ def normalize_for_comparison(val: Any) -> Any:
         return val.lower()
     return val
 
-def values_equivalent(before_val: Any, after_val: Any) -> bool:
-    """檢查兩個值是否實際上等價。"""
-    return normalize_for_comparison(before_val) == normalize_for_comparison(after_val)
+def normalize_deep(val: Any) -> Any:
+    """遞迴套用 normalize_for_comparison；物件中正規化為 None 的屬性視為未設定而省略。"""
+    # 計畫 JSON 的值只有少數幾種型別，常見型別直接處理以省去逐值的函式呼叫
+    t = type(val)
+    if t is dict:
+        result = {}
+        for k, v in val.items():
+            v = normalize_deep(v)
+            if v is not None:
+                result[k] = v
+        return result
+    if t is list:
+        return [normalize_deep(v) for v in val] if val else None
+    if t is str:
+        if not val:
+            return None
+        return val.lower() if CONFIG.ignore_case else val
+    if t is int or t is bool or val is None:
+        return val
+    return normalize_for_comparison(val)
+
+# 與 json.dumps(..., sort_keys=True) 輸出相同；重複使用同一個編碼器以省去每次建立的成本
+_CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True)
+
+class CanonicalForms:
+    """
+    Set 元素正規形式的快取。
+
+    正規形式為 normalize_deep 結果的排序鍵 JSON 文字，可雜湊且相等即代表實際上等價；
+    原始形式為未正規化的排序鍵 JSON 文字 (由 C 編碼器產生)，相等時正規形式必定相等。
+    兩者對每個物件或陣列各只計算一次，並在同一屬性的分析 (包括嵌套 Set 的遞迴) 中
+    重複用於元素鍵值與等價比較；大部分元素以原始形式即可配對，只有未配對或
+    內容不同的元素才需要計算正規形式。
+    """
+
+    def __init__(self):
+        # id(物件) -> 文字；_refs 保留物件參照，確保 id 在快取存續期間不被重用
+        self._raw: Dict[int, str] = {}
+        self._normal: Dict[int, str] = {}
+        self._refs: Dict[int, Any] = {}
+
+    def raw(self, val: Any) -> str:
+        """回傳值的原始形式。"""
+        text = self._raw.get(id(val))
+        if text is None:
+            text = self._raw[id(val)] = _CANONICAL_ENCODER.encode(val)
+            self._refs[id(val)] = val
+        return text
+
+    def text(self, val: Any) -> str:
+        """回傳值的正規形式。"""
+        if not isinstance(val, (dict, list)):
+            return _CANONICAL_ENCODER.encode(normalize_for_comparison(val))
+        text = self._normal.get(id(val))
+        if text is None:
+            text = self._normal[id(val)] = _CANONICAL_ENCODER.encode(normalize_deep(val))
+            self._refs[id(val)] = val
+        return text
+
+    def same(self, a: Any, b: Any) -> bool:
+        """檢查兩個值正規化後是否相同。"""
+        if a is b:
+            return True
+        a_nested = isinstance(a, (dict, list))
+        b_nested = isinstance(b, (dict, list))
+        if not a_nested and not b_nested:
+            return normalize_for_comparison(a) == normalize_for_comparison(b)
+        if a_nested and b_nested and self.raw(a) == self.raw(b):
+            return True
+        return self.text(a) == self.text(b)
+
+def get_element_key(
+    element: Dict[str, Any],
+    key_attr: Optional[str],
+    forms: Optional[CanonicalForms] = None,
+) -> str:
+    """從 Set 元素中提取鍵值 (key value)。"""
+    if key_attr and key_attr in element:
+        val = element[key_attr]
+        if CONFIG.ignore_case and isinstance(val, str):
+            return val.lower()
+        return str(val)
+    # 對於沒有鍵值屬性的元素，回傳排序後項目的雜湊值
+    # (正規化後才相同的元素由 pair_equivalent_elements 配對)
+    forms = forms if forms is not None else CanonicalForms()
+    return str(hash(forms.raw(element)))
+
+def values_equivalent(
+    before_val: Any, after_val: Any, forms: Optional[CanonicalForms] = None
+) -> bool:
+    """檢查兩個值是否實際上等價 (遞迴正規化後相同)。"""
+    forms = forms if forms is not None else CanonicalForms()
+    return forms.same(before_val, after_val)
+
+def pair_equivalent_elements(
+    before_map: Dict[str, Dict[str, Any]],
+    after_map: Dict[str, Dict[str, Any]],
+    forms: CanonicalForms,
+) -> None:
+    """將原始形式不同但正規化後相同的未配對元素 (例如 2.0 與 2) 移至相同的鍵。"""
+    unmatched = {}
+    for key in before_map.keys() - after_map.keys():
+        unmatched.setdefault(forms.text(before_map[key]), key)
+    for key in after_map.keys() - before_map.keys():
+        before_key = unmatched.pop(forms.text(after_map[key]), None)
+        if before_key is not None:
+            after_map[before_key] = after_map.pop(key)
 
 def compare_elements(
-    before: Dict[str, Any], after: Dict[str, Any], nested_attrs: Dict[str, Any] = None
+    before: Dict[str, Any],
+    after: Dict[str, Any],
+    nested_attrs: Dict[str, Any] = None,
+    forms: Optional[CanonicalForms] = None,
 ) -> tuple:
     """
     比較兩個元素並回傳 (simple_diffs, nested_set_attrs)。
@@ -185,6 +292,7 @@ def compare_elements(
     nested_set_attrs：嵌套 Set 的 (attr_name, before_val, after_val, attr_def) 清單
     """
     nested_attrs = nested_attrs or {}
+    forms = forms if forms is not None else CanonicalForms()
     simple_diffs = {}
     nested_set_attrs = []
 
@@ -194,11 +302,11 @@ def compare_elements(
         before_val = before.get(key)
         after_val = after.get(key)
 
-        # 檢查這是否為嵌套 Set 屬性
+        # 檢查這是否為嵌套 Set 屬性 (正規化後仍不同時才遞迴分析)
         if key in nested_attrs:
-            if before_val != after_val:
+            if not forms.same(before_val, after_val):
                 nested_set_attrs.append((key, before_val, after_val, nested_attrs[key]))
-        elif not values_equivalent(before_val, after_val):
+        elif not values_equivalent(before_val, after_val, forms):
             simple_diffs[key] = {"before": before_val, "after": after_val}
 
     return (simple_diffs, nested_set_attrs)
@@ -249,11 +357,17 @@ def analyze_set_attribute(
     nested_attrs: Dict[str, Any] = None,
     path: str = "",
     after_unknown: Optional[Dict[str, Any]] = None,
+    forms: Optional[CanonicalForms] = None,
 ) -> SetAttributeChange:
-    """分析 Set 類型屬性中的變更，包括嵌套的 Set。"""
+    """
+    分析 Set 類型屬性中的變更，包括嵌套的 Set。
+
+    forms 為正規形式快取；未提供時建立新的快取，並傳遞給嵌套 Set 的遞迴呼叫。
+    """
     full_path = f"{path}.{attr_name}" if path else attr_name
     change = SetAttributeChange(attribute_name=attr_name, path=full_path)
     nested_attrs = nested_attrs or {}
+    forms = forms if forms is not None else CanonicalForms()
 
     before_list = before_list or []
     after_list = after_list or []
@@ -283,18 +397,21 @@ def analyze_set_attribute(
     # 偵測重複的鍵
     for e in before_list:
         if isinstance(e, dict):
-            key = get_element_key(e, key_attr)
+            key = get_element_key(e, key_attr, forms)
             if key in before_map:
                 warn(f"{full_path} 的 before 狀態中存在重複的鍵 '{key}'")
             before_map[key] = e
 
     for e in after_list:
         if isinstance(e, dict):
-            key = get_element_key(e, key_attr)
+            key = get_element_key(e, key_attr, forms)
             if key in after_map:
                 warn(f"{full_path} 的 after 狀態中存在重複的鍵 '{key}'")
             after_map[key] = e
 
+    if not key_attr:
+        pair_equivalent_elements(before_map, after_map, forms)
+
     before_keys = set(before_map.keys())
     after_keys = set(after_map.keys())
 
@@ -313,13 +430,13 @@ def analyze_set_attribute(
         before_elem = before_map[key]
         after_elem = after_map[key]
 
-        if before_elem == after_elem:
-            # 完全符合 - 僅順序變更
+        if forms.same(before_elem, after_elem):
+            # 正規化後相同 - 僅順序變更 (或僅有 null/空值差異)
             change.order_only_count += 1
         else:
             # 內容已變更 - 檢查是否有意義的差異
             simple_diffs, nested_set_list = compare_elements(
-                before_elem, after_elem, nested_attrs
+                before_elem, after_elem, nested_attrs, forms
             )
 
             # 遞迴處理嵌套的 Set 屬性
@@ -332,6 +449,7 @@ def analyze_set_attribute(
                     nested_name,
                     sub_nested,
                     full_path,
+                    forms=forms,
                 )
                 if (
                     nested_change.order_only_count > 0
@@ -718,42 +836,328 @@ def format_summary_output(result: AnalysisResult) -> str:
 
     return " | ".join(parts)
 
-def analyze_plan(
-    plan_json: Dict[str, Any],
-    include_filter: Optional[List[str]] = None,
-    exclude_filter: Optional[List[str]] = None,
-) -> AnalysisResult:
-    """分析 terraform 計畫 JSON 並回傳結果。"""
-    result = AnalysisResult()
+# 串流剖析器每次讀取的字元數
+STREAM_CHUNK_SIZE = 1 << 20
+# 平行分析時每批傳送給子程序的資源 JSON 文字大小上限 (單一資源超過時自成一批)
+PARALLEL_BATCH_CHARS = 4 << 20
+PARALLEL_BATCH_ITEMS = 256
 
-    resource_changes = plan_json.get("resource_changes", [])
 
-    for rc in resource_changes:
+
+def _nested_skip_pattern(levels: int) -> str:
+    """
+    產生略過文字、字串及至多 levels 層完整容器的正規表示式。
+
+    每個替代項目由第一個字元決定 (無歧義)，比對失敗時不會產生指數級回溯；
+    更深的容器與跨越區塊邊界的內容由掃描器逐一處理括號。
+    """
+    text = r'[^"{}\[\]]'
+    string = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+    item = f"{text}|{string}"
+    for _ in range(levels):
+        item = f"{text}|{string}|[\\[{{](?:{item})*[\\]}}]"
+    return f"(?:{item})*"
+
+
+# 一次略過文字、字串與淺層的完整容器，使迴圈只在較深容器的括號處執行
+_CONTAINER_SKIP_RE = re.compile(_nested_skip_pattern(3))
+_STRING_END_RE = re.compile(r'["\\]')
+_SCALAR_RE = re.compile(r'[^,}\]\s]*')
+_WHITESPACE_RE = re.compile(r"\s*")
+
+
+class _JsonStreamScanner:
+    """
+    以固定大小的區塊讀取 JSON 文字，只定位值的邊界而不解碼。
+
+    略過的值 (例如 planned_values、prior_state) 不會建立任何物件；
+    擷取的值以原始文字回傳，記憶體用量與最大的單一值成正比。
+    """
+
+    def __init__(self, stream: IO[str], chunk_size: int = STREAM_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0  # buf[0] 在整個輸入中的位置 (用於錯誤訊息)
+        self.keep: Optional[int] = None  # 擷取中的值起點，讀取更多資料時需保留
+        self.eof = False
+
+    def _read_more(self) -> bool:
+        if self.eof:
+            return False
+        start = self.pos if self.keep is None else self.keep
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[start:] + chunk
+        self.offset += start
+        self.pos -= start
+        if self.keep is not None:
+            self.keep -= start
+        return True
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        error = json.JSONDecodeError(message, self.buf, self.pos)
+        # 預設訊息的行列位置相對於目前的區塊，改以整個輸入中的字元位置表示
+        error.pos = self.offset + self.pos
+        error.args = (f"{message}：字元位置 {error.pos}",)
+        return error
+
+    def _require_more(self) -> None:
+        if not self._read_more():
+            raise self._error("JSON 意外結束")
+
+    def peek(self) -> str:
+        """略過空白並回傳下一個字元 (輸入結束時回傳空字串)。"""
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self._error(f"預期 '{char}'")
+        self.pos += 1
+
+    def _skip_string(self) -> None:
+        """self.pos 位於開頭引號之後；前進至結尾引號之後。"""
+        while True:
+            m = _STRING_END_RE.search(self.buf, self.pos)
+            if m is None or m.end() >= len(self.buf) and m.group() == "\\":
+                self.pos = len(self.buf) if m is None else m.start()
+                self._require_more()
+                continue
+            if m.group() == '"':
+                self.pos = m.end()
+                return
+            self.pos = m.end() + 1  # 略過跳脫字元
+
+    def skip_value(self) -> None:
+        """前進至目前值的結尾。"""
+        first = self.peek()
+        if first == "":
+            raise self._error("JSON 意外結束")
+        if first == '"':
+            self.pos += 1
+            self._skip_string()
+            return
+        if first not in "{[":
+            while True:
+                end = _SCALAR_RE.match(self.buf, self.pos).end()
+                if end < len(self.buf) or not self._read_more():
+                    if end == self.pos:
+                        raise self._error("預期 JSON 值")
+                    self.pos = end
+                    return
+        # 先消耗開頭括號，使比對停在本容器的結尾括號前
+        self.pos += 1
+        depth = 1
+        while True:
+            self.pos = _CONTAINER_SKIP_RE.match(self.buf, self.pos).end()
+            if self.pos >= len(self.buf):
+                self._require_more()
+                continue
+            token = self.buf[self.pos]
+            if token == '"':
+                # 字串跨越區塊邊界：讀取更多資料後從字串開頭重新比對
+                self._require_more()
+                continue
+            self.pos += 1
+            if token in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def read_value_text(self) -> str:
+        """回傳目前值的原始 JSON 文字並前進至其結尾。"""
+        self.peek()
+        self.keep = self.pos
+        try:
+            self.skip_value()
+            return self.buf[self.keep:self.pos]
+        finally:
+            self.keep = None
+
+    def iter_array(self, key: str) -> Iterator[str]:
+        """
+        逐一產出頂層物件中 key 陣列各元素的原始 JSON 文字；找不到 key 時不產出任何元素。
+
+        產出陣列後仍會略過其餘成員直到輸入結尾，使截斷或損毀的計畫照樣引發 JSONDecodeError。
+        """
+        self.expect("{")
+        found = False
+        while True:
+            char = self.peek()
+            if char == "}":
+                self.pos += 1
+                if self.peek() != "":
+                    raise self._error("JSON 結尾有多餘的資料")
+                return
+            if char == ",":
+                self.pos += 1
+                continue
+            if char != '"':
+                raise self._error("預期物件鍵值")
+            name = json.loads(self.read_value_text())
+            self.expect(":")
+            if name != key or found or self.peek() == "n":  # 其他成員、重複的鍵或 null
+                self.skip_value()
+                continue
+            found = True
+            self.expect("[")
+            while True:
+                char = self.peek()
+                if char == "]":
+                    self.pos += 1
+                    break
+                if char == ",":
+                    self.pos += 1
+                    continue
+                yield self.read_value_text()
+
+
+def iter_resource_changes(stream: IO) -> Iterator[Union[str, Dict[str, Any]]]:
+    """
+    從計畫 JSON 串流逐一產出 resource_changes 的元素，不載入整份計畫。
+
+    已安裝 ijson 時產出剖析後的 dict (stream 需為二進位串流)；
+    否則以標準函式庫掃描器產出各元素的原始 JSON 文字 (stream 為文字串流)，
+    由 analyze_resource_changes 在 (子) 程序中解碼。
+    """
+    if ijson is not None:
+        yield from ijson.items(stream, "resource_changes.item", use_float=True)
+    else:
+        yield from _JsonStreamScanner(stream).iter_array("resource_changes")
+
+
+def _add_resource(result: AnalysisResult, res: ResourceChange) -> None:
+    """將單個資源的分析結果併入整體結果並更新計數。"""
+    result.resources.append(res)
+
+    # 計數統計
+    if res.is_replace:
+        result.replace_count += 1
+    elif res.is_create:
+        result.create_count += 1
+    elif res.is_delete:
+        result.delete_count += 1
+
+    if res.other_changes:
+        result.other_changes_count += len(res.other_changes)
+
+    for set_change in res.set_changes:
+        order_only, actual = collect_all_changes(set_change)
+        result.order_only_count += len(order_only)
+        result.actual_set_changes_count += len(actual)
+
+
+def _init_worker(set_attributes: Dict[str, Any], ignore_case: bool, verbose: bool) -> None:
+    """子程序初始化：複製主程序的屬性定義與配置 (spawn 啟動方式不會繼承全域變數)。"""
+    global AZURERM_SET_ATTRIBUTES
+    AZURERM_SET_ATTRIBUTES = set_attributes
+    CONFIG.ignore_case = ignore_case
+    CONFIG.verbose = verbose
+
+
+def _analyze_batch(
+    batch: List[Union[str, Dict[str, Any]]],
+    include_filter: Optional[List[str]],
+    exclude_filter: Optional[List[str]],
+) -> tuple:
+    """分析一批資源變更 (JSON 文字或 dict)，回傳 (結果清單, 此批產生的警告)。"""
+    warnings_start = len(CONFIG.warnings)
+    results = []
+    for rc in batch:
+        if isinstance(rc, str):
+            rc = json.loads(rc)
         res = analyze_resource_change(rc, include_filter, exclude_filter)
         if res:
-            result.resources.append(res)
-
-            # 計數統計
-            if res.is_replace:
-                result.replace_count += 1
-            elif res.is_create:
-                result.create_count += 1
-            elif res.is_delete:
-                result.delete_count += 1
+            results.append(res)
+    warnings = CONFIG.warnings[warnings_start:]
+    del CONFIG.warnings[warnings_start:]
+    return results, warnings
+
+
+def _batched(items: Iterable[Union[str, Dict[str, Any]]]) -> Iterator[list]:
+    """依 JSON 文字大小與數量將資源分批。"""
+    batch: list = []
+    size = 0
+    for item in items:
+        batch.append(item)
+        size += len(item) if isinstance(item, str) else 0
+        if size >= PARALLEL_BATCH_CHARS or len(batch) >= PARALLEL_BATCH_ITEMS:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def analyze_resource_changes(
+    resource_changes: Iterable[Union[str, Dict[str, Any]]],
+    include_filter: Optional[List[str]] = None,
+    exclude_filter: Optional[List[str]] = None,
+    jobs: int = 1,
+) -> AnalysisResult:
+    """
+    分析 resource_changes 的元素 (dict 或 JSON 文字) 並回傳結果。
 
-            if res.other_changes:
-                result.other_changes_count += len(res.other_changes)
+    jobs 大於 1 時分批交給程序池平行分析，同時執行中的批次數有上限，
+    結果依原始順序併入 AnalysisResult。
+    """
+    result = AnalysisResult()
 
-            for set_change in res.set_changes:
-                order_only, actual = collect_all_changes(set_change)
-                result.order_only_count += len(order_only)
-                result.actual_set_changes_count += len(actual)
+    if jobs <= 1:
+        for rc in resource_changes:
+            if isinstance(rc, str):
+                rc = json.loads(rc)
+            res = analyze_resource_change(rc, include_filter, exclude_filter)
+            if res:
+                _add_resource(result, res)
+    else:
+        pending: deque = deque()
+
+        def merge_oldest() -> None:
+            results, warnings = pending.popleft().result()
+            for res in results:
+                _add_resource(result, res)
+            CONFIG.warnings.extend(warnings)
+
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(AZURERM_SET_ATTRIBUTES, CONFIG.ignore_case, CONFIG.verbose),
+        ) as executor:
+            for batch in _batched(resource_changes):
+                pending.append(
+                    executor.submit(_analyze_batch, batch, include_filter, exclude_filter)
+                )
+                if len(pending) >= jobs * 2:
+                    merge_oldest()
+            while pending:
+                merge_oldest()
 
     # 從全域配置中新增警告
     result.warnings = CONFIG.warnings.copy()
 
     return result
 
+
+def analyze_plan(
+    plan_json: Dict[str, Any],
+    include_filter: Optional[List[str]] = None,
+    exclude_filter: Optional[List[str]] = None,
+) -> AnalysisResult:
+    """分析 terraform 計畫 JSON 並回傳結果。"""
+    return analyze_resource_changes(
+        plan_json.get("resource_changes", []), include_filter, exclude_filter
+    )
+
 def determine_exit_code(result: AnalysisResult) -> int:
     """根據分析結果決定結束代碼。"""
     if result.replace_count > 0:
@@ -844,6 +1248,13 @@ def parse_args() -> argparse.Namespace:
         action="append",
         help="排除符合此模式的資源 (可重複使用)",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="平行分析資源的程序數 (預設值：1)",
+    )
 
     return parser.parse_args()
 
@@ -862,27 +1273,40 @@ def main():
     # 從外部 JSON 載入 Set 屬性
     AZURERM_SET_ATTRIBUTES = load_set_attributes(args.attributes)
 
-    # 讀取計畫輸入
-    if args.plan_file:
-        try:
-            with open(args.plan_file, "r") as f:
-                plan_json = json.load(f)
-        except FileNotFoundError:
-            print(f"錯誤：找不到檔案：{args.plan_file}", file=sys.stderr)
-            sys.exit(EXIT_ERROR)
-        except json.JSONDecodeError as e:
-            print(f"錯誤：JSON 無效：{e}", file=sys.stderr)
-            sys.exit(EXIT_ERROR)
-    else:
-        try:
-            plan_json = json.load(sys.stdin)
-        except json.JSONDecodeError as e:
-            print(f"錯誤：來自 stdin 的 JSON 無效：{e}", file=sys.stderr)
-            sys.exit(EXIT_ERROR)
+    # 串流讀取計畫輸入：逐一剖析 resource_changes，不載入整份計畫
+    json_errors: tuple = (json.JSONDecodeError,)
+    if ijson is not None:
+        json_errors += (ijson.JSONError,)
+    resource_count = 0
+
+    def counted(items: Iterable[Any]) -> Iterator[Any]:
+        nonlocal resource_count
+        for item in items:
+            resource_count += 1
+            yield item
+
+    try:
+        if args.plan_file:
+            mode = "rb" if ijson is not None else "r"
+            with open(args.plan_file, mode, **({} if ijson else {"encoding": "utf-8"})) as f:
+                result = analyze_resource_changes(
+                    counted(iter_resource_changes(f)), args.include, args.exclude, args.jobs
+                )
+        else:
+            stdin = sys.stdin.buffer if ijson is not None else sys.stdin
+            result = analyze_resource_changes(
+                counted(iter_resource_changes(stdin)), args.include, args.exclude, args.jobs
+            )
+    except FileNotFoundError:
+        print(f"錯誤：找不到檔案：{args.plan_file}", file=sys.stderr)
+        sys.exit(EXIT_ERROR)
+    except json_errors as e:
+        source = "來自 stdin 的 " if not args.plan_file else ""
+        print(f"錯誤：{source}JSON 無效：{e}", file=sys.stderr)
+        sys.exit(EXIT_ERROR)
 
     # 檢查是否有空白計畫
-    resource_changes = plan_json.get("resource_changes", [])
-    if not resource_changes:
+    if not resource_count:
         if args.format == "json":
             print(
                 json.dumps(
@@ -901,9 +1325,6 @@ def main():
             print("未偵測到資源變更。")
         sys.exit(EXIT_NO_CHANGES)
 
-    # 分析計畫
-    result = analyze_plan(plan_json, args.include, args.exclude)
-
     # 格式化輸出
     if args.format == "json":
         output = format_json_output(result)